@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends
+from datetime import datetime
+from app.core.auth import get_current_admin
+from app.models.models import User
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.response_cache import get_response_cache
+from app.services.plan_cache import get_plan_cache
+from app.services import structured_completion
+
+router = APIRouter()
+
+@router.get("/llm/providers")
+def get_llm_provider_health(
+    current_user: User = Depends(get_current_admin),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Provider health: EWMA latency, error rate and circuit state, plus the current order
+    and per-provider admission metrics (in flight, queue depth, wait times), quota usage
+    and structured (JSON) completion parse/repair counts
+    """
+    return {
+        "primary_provider": llm_service.primary_provider,
+        "provider_order": llm_service.provider_order(),
+        "providers": llm_service.health.snapshot(),
+        "hedging": llm_service.hedge_snapshot(),
+        "single_flight": llm_service.single_flight.snapshot(),
+        "admission": llm_service.admission_snapshot(),
+        "quotas": llm_service.quota_snapshot(),
+        "structured": dict(structured_completion.stats),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@router.post("/llm/reload")
+async def reload_llm_service(
+    current_user: User = Depends(get_current_admin),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Hot-reload LLM settings from the environment and rebuild provider clients
+    """
+    await llm_service.reload()
+    return {
+        "status": "reloaded",
+        "primary_provider": llm_service.primary_provider,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@router.get("/llm/cache")
+def get_llm_cache_stats(current_user: User = Depends(get_current_admin)):
+    """
+    Response cache hit/miss metrics and size
+    """
+    return get_response_cache().snapshot()
+
+@router.delete("/llm/cache")
+def clear_llm_cache(current_user: User = Depends(get_current_admin)):
+    """
+    Drop all cached completions
+    """
+    get_response_cache().clear()
+    return {"status": "cleared"}
+
+@router.get("/llm/plan-cache")
+def get_plan_cache_stats(current_user: User = Depends(get_current_admin)):
+    """
+    Health plan cache hit rate, warm-up counts and the most requested risk profiles
+    """
+    return get_plan_cache().snapshot()
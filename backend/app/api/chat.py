@@ -1,12 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
+import json
 from sqlalchemy.orm import Session
-from app.core.config import settings
-from app. core.database import get_db
+from app. core.database import get_db, SessionLocal
 from app. core.auth import get_current_user
 from app.models.models import User, Conversation, Message
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.context_builder import build_context, get_context_budget
+from app.services.errors import LLMUnavailableError
+from app.services.emergency_detector import get_emergency_detector
 
 router = APIRouter()
 
@@ -19,57 +23,11 @@ class ChatResponse(BaseModel):
     timestamp: str
     conversation_id: str
     provider: str  # Which LLM was used
+    context_tokens: int  # Estimated prompt tokens sent (system + history + message)
+    emergency: bool = False  # Emergency phrases detected in the user's message
+    emergency_guidance: str | None = None
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Chat with AI - saves conversation history and uses LLM service
-    """
-    try:
-        if not request.message. strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        
-        # Get or create conversation
-        if request.conversation_id:
-            conversation = db.query(Conversation).filter(
-                Conversation. id == request.conversation_id,
-                Conversation.user_id == current_user.id
-            ).first()
-            if not conversation:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-        else:
-            # Create new conversation
-            conversation = Conversation(
-                user_id=current_user.id,
-                title=request.message[:50]  # Use first 50 chars as title
-            )
-            db. add(conversation)
-            db.commit()
-            db.refresh(conversation)
-        
-        # Save user message
-        user_message = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.message
-        )
-        db.add(user_message)
-        db.commit()
-        
-        # 🔥 NEW: Load conversation history (last 10 messages for context)
-        previous_messages = db.query(Message).filter(
-            Message.conversation_id == conversation.id
-        ).order_by(Message. created_at.desc()).limit(10).all()
-        
-        # Reverse to get chronological order
-        previous_messages = list(reversed(previous_messages))
-        
-        # Build message history for AI
-        system_prompt = """You are MediAI, a helpful medical AI assistant. 
+SYSTEM_PROMPT = """You are MediAI, a helpful medical AI assistant. 
 
 Guidelines:
 1. Provide accurate health information and guidance
@@ -82,27 +40,101 @@ Guidelines:
 
 IMPORTANT: You are not a replacement for professional medical advice."""
 
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history
-        for msg in previous_messages[:-1]:  # Exclude the last message (current one)
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Add current message
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
+def _start_turn(request: ChatRequest, current_user: User, db: Session) -> Conversation:
+    """
+    Validate the message, get or create the conversation and save the user message
+    """
+    if not request.message. strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    # Get or create conversation
+    if request.conversation_id:
+        conversation = db.query(Conversation).filter(
+            Conversation. id == request.conversation_id,
+            Conversation.user_id == current_user.id
+        ).first()
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    else:
+        # Create new conversation
+        conversation = Conversation(
+            user_id=current_user.id,
+            title=request.message[:50]  # Use first 50 chars as title
+        )
+        db. add(conversation)
+        db.commit()
+        db.refresh(conversation)
+    
+    # Save user message
+    user_message = Message(
+        conversation_id=conversation.id,
+        role="user",
+        content=request.message
+    )
+    db.add(user_message)
+    db.commit()
+    
+    return conversation
+
+def _emergency_guidance(message: str) -> str | None:
+    """
+    Screen the user's message for emergencies - guidance to show, or None
+    """
+    matches = get_emergency_detector().scan(message)
+    if not matches:
+        return None
+    
+    guidelines = " ".join(match.flag.guideline for match in matches if match.flag.guideline)
+    return f"🚨 This may be a medical emergency. Call 1122 (emergency services) now. {guidelines}".strip()
+
+def _build_llm_messages(
+    conversation: Conversation,
+    current_message: str,
+    db: Session,
+    llm_service: LLMService
+) -> tuple[list[dict], int]:
+    """
+    Build the system prompt + conversation history + current message for the LLM
+    
+    History fills the token budget of the provider that will be tried first.
+    Returns the messages and the estimated prompt tokens.
+    """
+    providers = llm_service.provider_order()
+    provider = providers[0] if providers else llm_service.primary_provider
+    
+    return build_context(
+        db,
+        conversation_id=conversation.id,
+        system_prompt=SYSTEM_PROMPT,
+        current_message=current_message,
+        budget=get_context_budget(provider)
+    )
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Chat with AI - saves conversation history and uses LLM service
+    """
+    try:
+        conversation = _start_turn(request, current_user, db)
+        guidance = _emergency_guidance(request.message)
+        messages, context_tokens = _build_llm_messages(conversation, request.message, db, llm_service)
         
-        # 🔥 NEW: Use LLM Service with fallback
-        llm_service = LLMService()
+        # 🔥 NEW: Use shared LLM Service with fallback
         result = await llm_service.generate_response(
             messages=messages,
             temperature=0.7,
-            max_tokens=1500
+            max_tokens=1500,
+            conversation_id=conversation.id
         )
         
         ai_response = result["content"]
@@ -121,15 +153,98 @@ IMPORTANT: You are not a replacement for professional medical advice."""
             response=ai_response,
             timestamp=datetime.utcnow().isoformat(),
             conversation_id=conversation. id,
-            provider=provider_used  # Show which LLM was used
+            provider=provider_used,  # Show which LLM was used
+            context_tokens=context_tokens,
+            emergency=guidance is not None,
+            emergency_guidance=guidance
         )
         
+    except LLMUnavailableError:
+        # Busy, not broken - answered with 503 + Retry-After (see main.py)
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Chat with AI, streaming the reply as Server-Sent Events
+    
+    Events:
+    - start: {"conversation_id"}
+    - emergency: {"guidance"} right after start if the message looks like an emergency
+    - token: {"content", "provider"} for each chunk as it arrives
+    - done: {"conversation_id", "message_id", "provider", "context_tokens", "timestamp"} once the
+      full assistant message is saved
+    - error: {"detail"} if generation fails, plus "retry_after" (seconds)
+      when every provider is at capacity
+    """
+    conversation = _start_turn(request, current_user, db)
+    guidance = _emergency_guidance(request.message)
+    messages, context_tokens = _build_llm_messages(conversation, request.message, db, llm_service)
+    conversation_id = conversation.id
+    
+    async def event_stream():
+        yield _sse("start", {"conversation_id": conversation_id})
+        if guidance:
+            yield _sse("emergency", {"guidance": guidance})
+        
+        chunks = []
+        provider_used = None
+        try:
+            async for chunk in llm_service.stream_response(
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1500,
+                conversation_id=conversation_id
+            ):
+                chunks.append(chunk["content"])
+                provider_used = chunk["provider"]
+                yield _sse("token", chunk)
+        except LLMUnavailableError as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": f"Internal server error: {str(e)}"})
+            return
+        
+        # Save the full AI response once the stream has finished. The request's
+        # session may already be closed by now, so use a dedicated one.
+        stream_db = SessionLocal()
+        try:
+            assistant_message = Message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content="".join(chunks)
+            )
+            stream_db.add(assistant_message)
+            stream_db.commit()
+            message_id = assistant_message.id
+        finally:
+            stream_db.close()
+        
+        yield _sse("done", {
+            "conversation_id": conversation_id,
+            "message_id": message_id,
+            "provider": provider_used,
+            "context_tokens": context_tokens,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router. get("/conversations")
 def get_conversations(
     current_user: User = Depends(get_current_user),
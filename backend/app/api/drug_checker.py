@@ -1,13 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
-import httpx
-import json
 from sqlalchemy.orm import Session
-from app.core.config import settings
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.models import User
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.errors import LLMUnavailableError
+from app.services.structured_completion import complete_structured, StructuredCompletionError
+from app.services import provider_policy
+from app.services.drug_interactions import (
+    OVERALL_RISK, get_interaction_index, pair_key, worse_risk, worst_severity
+)
+from app.services.drug_normalizer import clean_drug_name, get_drug_normalizer
 
 router = APIRouter()
 
@@ -35,11 +40,26 @@ class DrugCheckResponse(BaseModel):
     alcohol_warning: Optional[str] = None
     general_advice: str
 
-@router.post("/check-interactions", response_model=DrugCheckResponse)
+class DrugCheckResult(DrugCheckResponse):
+    dataset_version: str = ""  # Version of the local interaction dataset
+    known_pairs: int = 0  # Pairs answered from the local dataset
+    ai_pairs: int = 0  # Pairs sent to the AI
+
+def drug_id(name: str) -> str:
+    """Canonical ID for an exact name match, otherwise the cleaned name itself
+
+    Typo corrections are not trusted for the local dataset - a near miss
+    could be a different drug, so it goes to the AI as typed.
+    """
+    match = get_drug_normalizer().normalize(name)
+    return match.canonical_id if match.exact else clean_drug_name(name) or name.strip().lower()
+
+@router.post("/check-interactions", response_model=DrugCheckResult)
 async def check_drug_interactions(
     request: DrugCheckRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     if len(request.medications) < 2:
         raise HTTPException(
@@ -47,17 +67,98 @@ async def check_drug_interactions(
             detail="Please provide at least 2 medications to check interactions"
         )
     
+    # Canonical drug IDs: "Tylenol" and "acetaminophen 500mg" are the same drug
+    index = get_interaction_index()
+    names = [drug_id(med.name) for med in request.medications]
+    display_names = {}
+    for name, med in zip(names, request.medications):
+        display_names.setdefault(name, med.name)
+    
+    # Known pairs are answered from the local dataset, the rest go to the AI
+    known_interactions: List[Interaction] = []
+    known_severities: List[str] = []
+    unknown_pairs = []
+    seen = set()
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            key = pair_key(names[i], names[j])
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            # The same drug listed twice (duplicate therapy) is left to the AI
+            known = index.lookup(*key) if names[i] != names[j] else None
+            if known is None:
+                unknown_pairs.append(key)
+                continue
+            known_severities.append(known.severity)
+            if known.severity != "none":
+                known_interactions.append(Interaction(
+                    drug1=request.medications[i].name,
+                    drug2=request.medications[j].name,
+                    severity=known.severity,
+                    description=known.description,
+                    recommendation=known.recommendation
+                ))
+    
+    food_warnings: List[str] = []
+    alcohol_warnings: List[str] = []
+    for name in dict.fromkeys(names):
+        info = index.drug_info(name)
+        if info:
+            food_warnings.extend(warning for warning in info.food_warnings if warning not in food_warnings)
+            if info.alcohol_warning and info.alcohol_warning not in alcohol_warnings:
+                alcohol_warnings.append(info.alcohol_warning)
+    
+    local = DrugCheckResult(
+        interactions=known_interactions,
+        overall_risk=OVERALL_RISK[worst_severity(known_severities)],
+        food_warnings=food_warnings if request.include_food_interactions else [],
+        alcohol_warning=" ".join(alcohol_warnings) if request.include_alcohol_interactions and alcohol_warnings else None,
+        general_advice="These interactions were checked against MediAI's interaction reference. "
+                       "Always confirm with your pharmacist or doctor before starting, stopping or "
+                       "combining medications.",
+        dataset_version=index.version,
+        known_pairs=len(known_severities),
+        ai_pairs=len(unknown_pairs)
+    )
+    
+    # Every pair is known - no AI call needed
+    if not unknown_pairs:
+        return local
+    
+    # The prompt uses the names as the user typed them; the cache key uses the
+    # canonical IDs so "Tylenol" and "acetaminophen" share one entry
     med_list = []
     for med in request.medications:
-        med_str = med.name
+        med_str = med.name.strip()
         if med.dosage:
             med_str += f" ({med.dosage})"
         if med.frequency:
             med_str += f" - {med.frequency}"
         med_list.append(med_str)
+    med_list.sort(key=str.lower)
+    
+    cache_key_data = {
+        "medications": sorted(
+            [name, (med.dosage or "").strip().lower(), (med.frequency or "").strip().lower()]
+            for name, med in zip(names, request.medications)
+        ),
+        "pairs": sorted(unknown_pairs) if known_severities else None,
+        "food": request.include_food_interactions,
+        "alcohol": request.include_alcohol_interactions
+    }
     
     medications_text = "\n".join([f"- {med}" for med in med_list])
     
+    pairs_text = ""
+    if known_severities:
+        # Only ask about the pairs the local dataset doesn't cover
+        pairs_text = "\nOther pairs have already been checked. Only report interactions between these pairs:\n" + \
+            "\n".join(sorted(
+                f"- {display_names[drug1]} + {display_names[drug2]}" for drug1, drug2 in unknown_pairs
+            )) + "\n"
+    
     system_prompt = """You are an expert clinical pharmacist specializing in drug interactions.
 
 CRITICAL RULES:
@@ -90,46 +191,50 @@ MEDICATIONS:
 
 Include food interactions: {request.include_food_interactions}
 Include alcohol interactions: {request.include_alcohol_interactions}
-
+{pairs_text}
 Output ONLY valid JSON."""
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:5173",
-                    "X-Title": "MediAI-DrugChecker"
-                },
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.2,
-                    "max_tokens": 2500
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            ai_response = data["choices"][0]["message"]["content"]
-            
-            ai_response = ai_response.strip()
-            if ai_response.startswith("```json"):
-                ai_response = ai_response[7:]
-            if ai_response.startswith("```"):
-                ai_response = ai_response[3:]
-            if ai_response.endswith("```"):
-                ai_response = ai_response[:-3]
-            ai_response = ai_response.strip()
-            
-            result = json.loads(ai_response)
-            return DrugCheckResponse(**result)
-            
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        # Cached, coalesced, JSON-mode completion validated against the response model
+        structured = await complete_structured(
+            llm_service, messages, DrugCheckResponse,
+            temperature=0.2,
+            max_tokens=2500,
+            policy=provider_policy.DRUG_INTERACTIONS,
+            cache_key_data=cache_key_data
+        )
+        
+        analysis = structured.data
+        
+        # Merge: the local dataset wins for pairs it knows; the AI's names are
+        # shown as the user typed them
+        interactions = list(known_interactions)
+        for interaction in analysis.interactions:
+            drug1, drug2 = drug_id(interaction.drug1), drug_id(interaction.drug2)
+            if drug1 != drug2 and index.lookup(drug1, drug2) is not None:
+                continue
+            interactions.append(interaction.model_copy(update={
+                "drug1": display_names.get(drug1, interaction.drug1),
+                "drug2": display_names.get(drug2, interaction.drug2)
+            }))
+        return local.model_copy(update={
+            "interactions": interactions,
+            "overall_risk": worse_risk(local.overall_risk, analysis.overall_risk) if known_severities else analysis.overall_risk,
+            "food_warnings": list(dict.fromkeys(local.food_warnings + (analysis.food_warnings or []))),
+            "alcohol_warning": analysis.alcohol_warning or local.alcohol_warning,
+            "general_advice": analysis.general_advice
+        })
+        
+    except StructuredCompletionError as e:
+        print(f"JSON Parse Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to parse AI response. Please try again.")
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Drug check failed: {str(e)}")
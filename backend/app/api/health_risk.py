@@ -1,15 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
 from datetime import datetime
-import math
-import httpx
+import asyncio
 import json
+import csv
+import io
 from sqlalchemy.orm import Session
-from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
 from app.core.auth import get_current_user
-from app.models.models import User
+from app.models.models import HealthPlan, User
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.background_jobs import PENDING, COMPLETE, FAILED, get_job_registry
+from app.services.plan_cache import RiskProfile, get_plan_cache
+from app.services.cohort_ingest import CohortIngestor, validate_columns
+from app.services.cohort_scoring import COLUMNS, CohortValidationError, score_cohort, to_columns
+from app.services.risk_guidelines import GUIDELINES, sex_key
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -37,6 +47,27 @@ class HealthData(BaseModel):
     has_diabetes: bool = False
     on_bp_medication: bool = False
 
+class HealthDataColumns(BaseModel):
+    # Columnar HealthData for batch scoring: one list per field, same length
+    id: Optional[List[Optional[str]]] = None  # Echoed back to match results to people
+    age: List[int]
+    gender: List[str]
+    height_cm: List[float]
+    weight_kg: List[float]
+    waist_cm: Optional[List[Optional[float]]] = None
+    hip_cm: Optional[List[Optional[float]]] = None
+    family_diabetes: Optional[List[Optional[bool]]] = None
+    physical_activity: Optional[List[Optional[str]]] = None
+    daily_vegetables: Optional[List[Optional[bool]]] = None
+    blood_pressure_medication: Optional[List[Optional[bool]]] = None
+    high_blood_glucose_history: Optional[List[Optional[bool]]] = None
+    total_cholesterol: Optional[List[Optional[float]]] = None
+    hdl_cholesterol: Optional[List[Optional[float]]] = None
+    systolic_bp: Optional[List[Optional[int]]] = None
+    currently_smoking: Optional[List[Optional[bool]]] = None
+    has_diabetes: Optional[List[Optional[bool]]] = None
+    on_bp_medication: Optional[List[Optional[bool]]] = None
+
 class RiskScore(BaseModel):
     score: float
     risk_level: str
@@ -52,76 +83,47 @@ class HealthRiskResponse(BaseModel):
     overall_health_score: int
     personalized_plan: str
     priority_actions: list[str]
+    plan_status: str = "complete"  # "pending" while the plan is generated in the background, "skipped" without a plan
+    plan_id: Optional[str] = None  # Poll GET /health-plans/{plan_id} (or stream it) when pending
+
+class HealthPlanStatus(BaseModel):
+    plan_id: str
+    status: str  # "pending", "complete", "failed"
+    personalized_plan: Optional[str] = None
+    overall_health_score: Optional[int] = None
+    error: Optional[str] = None
+    created_at: str
+    completed_at: Optional[str] = None
+
+DEFAULT_PLAN = "Focus on maintaining a healthy lifestyle with regular exercise, balanced nutrition, and preventive screenings."
+
+PLAN_STREAM_HEARTBEAT_SECONDS = 15  # SSE keep-alive comment while the plan is pending
+PLAN_STREAM_POLL_SECONDS = 2  # Plans generated by another worker are re-read this often
+PLAN_STREAM_TIMEOUT_SECONDS = 120
 
 def calculate_bmi(height_cm: float, weight_kg: float) -> dict:
     """Calculate BMI and classify according to WHO standards"""
     height_m = height_cm / 100
-    bmi = weight_kg / (height_m ** 2)
-    
-    # WHO BMI Classification
-    if bmi < 18.5:
-        category = "Underweight"
-        risk = "Increased health risks"
-        color = "#3b82f6"
-    elif 18.5 <= bmi < 25:
-        category = "Normal weight"
-        risk = "Minimal health risk"
-        color = "#10b981"
-    elif 25 <= bmi < 30:
-        category = "Overweight"
-        risk = "Increased risk of cardiovascular disease, diabetes"
-        color = "#f59e0b"
-    elif 30 <= bmi < 35:
-        category = "Obese (Class I)"
-        risk = "Moderate health risk"
-        color = "#ea580c"
-    elif 35 <= bmi < 40:
-        category = "Obese (Class II)"
-        risk = "High health risk"
-        color = "#dc2626"
-    else:
-        category = "Obese (Class III)"
-        risk = "Very high health risk"
-        color = "#991b1b"
+    bmi = weight_kg / (height_m * height_m)  # Same arithmetic as cohort_scoring
+    band = GUIDELINES.bmi.lookup(bmi)
     
     return {
         "value": round(bmi, 1),
-        "category": category,
-        "risk": risk,
-        "color": color,
-        "healthy_range": "18.5 - 24.9"
+        "category": band["category"],
+        "risk": band["risk"],
+        "color": band["color"],
+        "healthy_range": GUIDELINES.bmi_healthy_range
     }
 
 def calculate_waist_to_hip_ratio(waist_cm: float, hip_cm: float, gender: str) -> dict:
     """Calculate waist-to-hip ratio for metabolic syndrome risk"""
     ratio = waist_cm / hip_cm
-    
-    # WHO Standards
-    if gender == "male":
-        if ratio < 0.90:
-            risk = "Low risk"
-            color = "#10b981"
-        elif 0.90 <= ratio < 1.0:
-            risk = "Moderate risk"
-            color = "#f59e0b"
-        else:
-            risk = "High risk - metabolic syndrome"
-            color = "#dc2626"
-    else:  # female
-        if ratio < 0.80:
-            risk = "Low risk"
-            color = "#10b981"
-        elif 0.80 <= ratio < 0.85:
-            risk = "Moderate risk"
-            color = "#f59e0b"
-        else:
-            risk = "High risk - metabolic syndrome"
-            color = "#dc2626"
+    band = GUIDELINES.waist_hip_ratio[sex_key(gender)].lookup(ratio)
     
     return {
         "value": round(ratio, 2),
-        "risk": risk,
-        "color": color
+        "risk": band["risk"],
+        "color": band["color"]
     }
 
 def calculate_diabetes_risk_findrisc(data: HealthData) -> RiskScore:
@@ -129,85 +131,31 @@ def calculate_diabetes_risk_findrisc(data: HealthData) -> RiskScore:
     FINDRISC - Finnish Diabetes Risk Score
     Validated international diabetes risk assessment tool
     """
-    score = 0
-    
-    # Age
-    if data.age < 45:
-        score += 0
-    elif 45 <= data.age < 54:
-        score += 2
-    elif 54 <= data.age < 64:
-        score += 3
-    else:  # >= 64
-        score += 4
-    
-    # BMI
-    bmi = data.weight_kg / ((data.height_cm / 100) ** 2)
-    if bmi < 25:
-        score += 0
-    elif 25 <= bmi < 30:
-        score += 1
-    else:  # >= 30
-        score += 3
+    g = GUIDELINES
+    score = g.findrisc_age.lookup(data.age)
+    
+    height_m = data.height_cm / 100
+    bmi = data.weight_kg / (height_m * height_m)
+    score += g.findrisc_bmi.lookup(bmi)
     
     # Waist circumference (if available)
     if data.waist_cm:
-        if data.gender == "male":
-            if data.waist_cm < 94:
-                score += 0
-            elif 94 <= data.waist_cm < 102:
-                score += 3
-            else:
-                score += 4
-        else:  # female
-            if data.waist_cm < 80:
-                score += 0
-            elif 80 <= data.waist_cm < 88:
-                score += 3
-            else:
-                score += 4
-    
-    # Physical activity
-    if data.physical_activity == "high":
-        score += 0
-    else:
-        score += 2
-    
-    # Daily vegetables/fruits
-    if data.daily_vegetables:
-        score += 0
-    else:
-        score += 1
+        score += g.findrisc_waist[sex_key(data.gender)].lookup(data.waist_cm)
     
-    # Blood pressure medication
+    score += g.findrisc_activity_points(data.physical_activity)
+    if not data.daily_vegetables:
+        score += g.findrisc_no_vegetables
     if data.blood_pressure_medication:
-        score += 2
-    
-    # History of high blood glucose
+        score += g.findrisc_bp_medication
     if data.high_blood_glucose_history:
-        score += 5
-    
-    # Family history of diabetes
+        score += g.findrisc_glucose_history
     if data.family_diabetes:
-        score += 5
-    
-    # Calculate 10-year diabetes risk percentage
-    # Based on FINDRISC validation studies
-    if score < 7:
-        risk_percentage = 1
-        risk_level = "Low"
-    elif 7 <= score < 12:
-        risk_percentage = 4
-        risk_level = "Slightly Elevated"
-    elif 12 <= score < 15:
-        risk_percentage = 17
-        risk_level = "Moderate"
-    elif 15 <= score < 20:
-        risk_percentage = 33
-        risk_level = "High"
-    else:
-        risk_percentage = 50
-        risk_level = "Very High"
+        score += g.findrisc_family
+    
+    # 10-year diabetes risk, based on FINDRISC validation studies
+    band = g.findrisc_risk.lookup(score)
+    risk_percentage = band["percentage"]
+    risk_level = band["level"]
     
     recommendations = []
     if score >= 12:
@@ -226,7 +174,7 @@ def calculate_diabetes_risk_findrisc(data: HealthData) -> RiskScore:
         score=score,
         risk_level=risk_level,
         percentage=risk_percentage,
-        explanation=f"Your FINDRISC score is {score}/26. This indicates a {risk_percentage}% chance of developing type 2 diabetes within 10 years.",
+        explanation=f"Your FINDRISC score is {score}/{GUIDELINES.findrisc_max_score}. This indicates a {risk_percentage}% chance of developing type 2 diabetes within 10 years.",
         recommendations=recommendations if recommendations else ["Maintain healthy lifestyle habits"]
     )
 
@@ -238,163 +186,20 @@ def calculate_framingham_heart_risk(data: HealthData) -> Optional[RiskScore]:
     if not all([data.total_cholesterol, data.hdl_cholesterol, data.systolic_bp]):
         return None
     
-    # Framingham coefficients differ by gender
-    if data.gender == "male":
-        # Male coefficients
-        points = 0
-        
-        # Age
-        if data.age < 35:
-            points += -9
-        elif 35 <= data.age < 40:
-            points += -4
-        elif 40 <= data.age < 45:
-            points += 0
-        elif 45 <= data.age < 50:
-            points += 3
-        elif 50 <= data.age < 55:
-            points += 6
-        elif 55 <= data.age < 60:
-            points += 8
-        elif 60 <= data.age < 65:
-            points += 10
-        elif 65 <= data.age < 70:
-            points += 11
-        else:
-            points += 12
-        
-        # Total Cholesterol
-        if data.total_cholesterol < 160:
-            points += 0
-        elif 160 <= data.total_cholesterol < 200:
-            points += 4
-        elif 200 <= data.total_cholesterol < 240:
-            points += 7
-        elif 240 <= data.total_cholesterol < 280:
-            points += 9
-        else:
-            points += 11
-        
-        # HDL Cholesterol
-        if data.hdl_cholesterol >= 60:
-            points += -1
-        elif 50 <= data.hdl_cholesterol < 60:
-            points += 0
-        elif 40 <= data.hdl_cholesterol < 50:
-            points += 1
-        else:
-            points += 2
-        
-        # Blood Pressure
-        if data.systolic_bp < 120:
-            points += 0
-        elif 120 <= data.systolic_bp < 130:
-            points += 0 if not data.on_bp_medication else 1
-        elif 130 <= data.systolic_bp < 140:
-            points += 1 if not data.on_bp_medication else 2
-        elif 140 <= data.systolic_bp < 160:
-            points += 1 if not data.on_bp_medication else 2
-        else:
-            points += 2 if not data.on_bp_medication else 3
-        
-        # Smoking
-        if data.currently_smoking:
-            points += 4
-        
-        # Diabetes
-        if data.has_diabetes:
-            points += 2
-        
-        # Convert points to risk percentage (Framingham table)
-        risk_map = {
-            -3: 1, -2: 1, -1: 1, 0: 1, 1: 1, 2: 1, 3: 2, 4: 2,
-            5: 3, 6: 4, 7: 5, 8: 6, 9: 8, 10: 10, 11: 12, 12: 16,
-            13: 20, 14: 25, 15: 30, 16: 30
-        }
-        
-        risk_percentage = risk_map.get(points, 30 if points > 16 else 1)
-        
-    else:  # female
-        points = 0
-        
-        # Age
-        if data.age < 35:
-            points += -7
-        elif 35 <= data.age < 40:
-            points += -3
-        elif 40 <= data.age < 45:
-            points += 0
-        elif 45 <= data.age < 50:
-            points += 3
-        elif 50 <= data.age < 55:
-            points += 6
-        elif 55 <= data.age < 60:
-            points += 8
-        elif 60 <= data.age < 65:
-            points += 10
-        elif 65 <= data.age < 70:
-            points += 12
-        else:
-            points += 14
-        
-        # Total Cholesterol
-        if data.total_cholesterol < 160:
-            points += 0
-        elif 160 <= data.total_cholesterol < 200:
-            points += 4
-        elif 200 <= data.total_cholesterol < 240:
-            points += 8
-        elif 240 <= data.total_cholesterol < 280:
-            points += 11
-        else:
-            points += 13
-        
-        # HDL Cholesterol
-        if data.hdl_cholesterol >= 60:
-            points += -1
-        elif 50 <= data.hdl_cholesterol < 60:
-            points += 0
-        elif 40 <= data.hdl_cholesterol < 50:
-            points += 1
-        else:
-            points += 2
-        
-        # Blood Pressure
-        if data.systolic_bp < 120:
-            points += 0
-        elif 120 <= data.systolic_bp < 130:
-            points += 1 if not data.on_bp_medication else 3
-        elif 130 <= data.systolic_bp < 140:
-            points += 2 if not data.on_bp_medication else 4
-        elif 140 <= data.systolic_bp < 160:
-            points += 3 if not data.on_bp_medication else 5
-        else:
-            points += 4 if not data.on_bp_medication else 6
-        
-        # Smoking
-        if data.currently_smoking:
-            points += 3
-        
-        # Diabetes
-        if data.has_diabetes:
-            points += 3
-        
-        # Convert points to risk percentage (Framingham table)
-        risk_map = {
-            -2: 1, -1: 1, 0: 1, 1: 1, 2: 1, 3: 2, 4: 2, 5: 3,
-            6: 4, 7: 5, 8: 6, 9: 8, 10: 11, 11: 14, 12: 17,
-            13: 22, 14: 27, 15: 30, 16: 30
-        }
-        
-        risk_percentage = risk_map.get(points, 30 if points > 16 else 1)
+    # Framingham point tables differ by gender
+    tables = GUIDELINES.framingham[sex_key(data.gender)]
+    points = tables.age.lookup(data.age)
+    points += tables.total_cholesterol.lookup(data.total_cholesterol)
+    points += tables.hdl_cholesterol.lookup(data.hdl_cholesterol)
+    bp_table = tables.bp_treated if data.on_bp_medication else tables.bp_untreated
+    points += bp_table.lookup(data.systolic_bp)
+    if data.currently_smoking:
+        points += tables.smoking
+    if data.has_diabetes:
+        points += tables.diabetes
     
-    # Risk level classification
-    if risk_percentage < 10:
-        risk_level = "Low"
-    elif 10 <= risk_percentage < 20:
-        risk_level = "Intermediate"
-    else:
-        risk_level = "High"
+    risk_percentage = tables.risk_percentage.lookup(points)
+    risk_level = GUIDELINES.framingham_level.lookup(risk_percentage)
     
     recommendations = []
     if data.total_cholesterol >= 200:
@@ -426,97 +231,71 @@ def get_cancer_screening_recommendations(age: int, gender: str) -> dict:
     Cancer screening recommendations based on USPSTF guidelines
     United States Preventive Services Task Force - evidence-based
     """
-    screenings = []
-    
-    # Colorectal Cancer (both genders)
-    if 45 <= age <= 75:
-        screenings.append({
-            "cancer_type": "Colorectal Cancer",
-            "recommendation": "Colonoscopy every 10 years OR FIT test annually",
-            "urgency": "Recommended",
-            "evidence": "Grade A - USPSTF"
-        })
-    elif age > 75:
-        screenings.append({
-            "cancer_type": "Colorectal Cancer",
-            "recommendation": "Discuss with doctor (individualized decision)",
-            "urgency": "Optional",
-            "evidence": "Grade C - USPSTF"
-        })
-    
-    # Breast Cancer (female)
-    if gender == "female":
-        if 40 <= age < 50:
-            screenings.append({
-                "cancer_type": "Breast Cancer",
-                "recommendation": "Consider biennial mammography (discuss with doctor)",
-                "urgency": "Optional",
-                "evidence": "Grade C - USPSTF"
-            })
-        elif 50 <= age <= 74:
-            screenings.append({
-                "cancer_type": "Breast Cancer",
-                "recommendation": "Mammography every 2 years",
-                "urgency": "Recommended",
-                "evidence": "Grade B - USPSTF"
-            })
-    
-    # Cervical Cancer (female)
-    if gender == "female" and 21 <= age <= 65:
-        if age < 30:
-            screenings.append({
-                "cancer_type": "Cervical Cancer",
-                "recommendation": "Pap smear every 3 years",
-                "urgency": "Recommended",
-                "evidence": "Grade A - USPSTF"
-            })
-        else:
-            screenings.append({
-                "cancer_type": "Cervical Cancer",
-                "recommendation": "Pap smear + HPV test every 5 years OR Pap alone every 3 years",
-                "urgency": "Recommended",
-                "evidence": "Grade A - USPSTF"
-            })
-    
-    # Lung Cancer (smokers)
-    if 50 <= age <= 80:
-        screenings.append({
-            "cancer_type": "Lung Cancer",
-            "recommendation": "Low-dose CT scan annually IF you smoke or quit within 15 years",
-            "urgency": "Recommended for smokers",
-            "evidence": "Grade B - USPSTF"
-        })
-    
-    # Prostate Cancer (male)
-    if gender == "male" and 55 <= age <= 69:
-        screenings.append({
-            "cancer_type": "Prostate Cancer",
-            "recommendation": "Discuss PSA screening with doctor (individualized decision)",
-            "urgency": "Optional",
-            "evidence": "Grade C - USPSTF"
-        })
-    
-    # Skin Cancer (all)
-    screenings.append({
-        "cancer_type": "Skin Cancer",
-        "recommendation": "Annual skin examination by dermatologist (especially if fair-skinned)",
-        "urgency": "Consider",
-        "evidence": "Clinical recommendation"
-    })
+    screenings = GUIDELINES.cancer_screenings(age, gender)
     
     return {
         "screenings": screenings,
         "total_recommended": len([s for s in screenings if s["urgency"] == "Recommended"])
     }
 
+async def generate_personalized_plan(llm_service: LLMService, profile: RiskProfile) -> str:
+    """AI plan for a risk profile (cached per profile); generic advice if no provider answers"""
+    try:
+        return await get_plan_cache().generate(llm_service, profile)
+    except Exception:
+        return DEFAULT_PLAN
+
+def finish_health_plan(plan_id: str, content: Optional[str] = None, error: Optional[str] = None) -> None:
+    """Save a background plan's outcome (with its own session - the request's is closed)
+
+    Blocking - call through run_in_threadpool from coroutines.
+    """
+    db = SessionLocal()
+    try:
+        plan = db.query(HealthPlan).filter(HealthPlan.id == plan_id).first()
+        if plan is None:
+            return
+        plan.status = FAILED if error else COMPLETE
+        plan.content = content
+        plan.error = error
+        plan.completed_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+def health_plan_status(plan: HealthPlan) -> HealthPlanStatus:
+    return HealthPlanStatus(
+        plan_id=plan.id,
+        status=plan.status,
+        personalized_plan=plan.content,
+        overall_health_score=plan.overall_health_score,
+        error=plan.error,
+        created_at=plan.created_at.isoformat(),
+        completed_at=plan.completed_at.isoformat() if plan.completed_at else None
+    )
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/calculate-health-risks", response_model=HealthRiskResponse)
 async def calculate_health_risks(
     data: HealthData,
+    include_plan: bool = True,
+    async_plan: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Calculate comprehensive health risks using validated medical formulas
+    
+    include_plan=false skips the AI-generated personalized plan (returned empty).
+    async_plan=true returns the scores immediately with plan_status "pending"
+    and a plan_id; the plan is generated in the background, saved, and
+    delivered at GET /health-plans/{plan_id} or its /stream (SSE).
+    Plans are cached per quantized risk profile (see plan_cache); a cached
+    plan is returned right away in either mode.
     """
     
     try:
@@ -567,46 +346,53 @@ async def calculate_health_risks(
         
         health_score = max(0, health_score)
         
-        # Get AI-generated personalized plan
-        context = f"""
-Patient Profile:
-- Age: {data.age}, Gender: {data.gender}
-- BMI: {bmi_data['value']} ({bmi_data['category']})
-- Diabetes Risk: {diabetes_risk.risk_level} ({diabetes_risk.percentage}% in 10 years)
-- Heart Disease Risk: {heart_risk.risk_level if heart_risk else 'Not calculated'} ({heart_risk.percentage if heart_risk else 'N/A'}% in 10 years)
-- Overall Health Score: {health_score}/100
-
-Key Risk Factors:
-- Smoking: {'Yes' if data.currently_smoking else 'No'}
-- Physical Activity: {data.physical_activity}
-- Family diabetes history: {'Yes' if data.family_diabetes else 'No'}
-"""
-        
-        system_prompt = "You are a preventive medicine specialist. Create a personalized, actionable health improvement plan based on the patient's risk profile. Be specific, encouraging, and evidence-based. Keep it under 200 words."
+        # AI-generated personalized plan, shared by everyone with the same quantized risk profile
+        profile = RiskProfile.from_assessment(
+            age=data.age,
+            gender=data.gender,
+            bmi_category=bmi_data["category"],
+            diabetes_risk=diabetes_risk.risk_level,
+            heart_risk=heart_risk.risk_level if heart_risk else None,
+            smoking=data.currently_smoking,
+            physical_activity=data.physical_activity,
+            family_diabetes=data.family_diabetes
+        )
         
-        try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.post(
-                    f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": settings.OPENROUTER_MODEL,
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": context}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 300
-                    }
-                )
-                response.raise_for_status()
-                ai_data = response.json()
-                personalized_plan = ai_data["choices"][0]["message"]["content"]
-        except:
-            personalized_plan = "Focus on maintaining a healthy lifestyle with regular exercise, balanced nutrition, and preventive screenings."
+        personalized_plan = ""
+        plan_status = "complete" if include_plan else "skipped"
+        plan_id = None
+        if include_plan:
+            personalized_plan = await get_plan_cache().get(profile) or ""
+        
+        if include_plan and async_plan:
+            plan = HealthPlan(user_id=current_user.id, overall_health_score=health_score, profile_key=profile.key)
+            if personalized_plan:
+                # Cached - nothing to wait for
+                plan.status = COMPLETE
+                plan.content = personalized_plan
+                plan.completed_at = datetime.utcnow()
+            
+            def save_plan() -> str:
+                db.add(plan)
+                db.commit()
+                return plan.id
+            
+            plan_id = await run_in_threadpool(save_plan)
+            
+            if not personalized_plan:
+                async def plan_in_background() -> dict:
+                    try:
+                        content = await generate_personalized_plan(llm_service, profile)
+                    except asyncio.CancelledError:
+                        await run_in_threadpool(finish_health_plan, plan_id, error="Cancelled")
+                        raise
+                    await run_in_threadpool(finish_health_plan, plan_id, content=content)
+                    return {"personalized_plan": content}
+                
+                get_job_registry().submit("health_plan", current_user.id, plan_in_background, job_id=plan_id)
+                plan_status = PENDING
+        elif include_plan and not personalized_plan:
+            personalized_plan = await generate_personalized_plan(llm_service, profile)
         
         # Priority actions
         priority_actions = []
@@ -631,9 +417,256 @@ Key Risk Factors:
             cancer_screening=cancer_screening,
             overall_health_score=health_score,
             personalized_plan=personalized_plan,
-            priority_actions=priority_actions
+            priority_actions=priority_actions,
+            plan_status=plan_status,
+            plan_id=plan_id
         )
         
     except Exception as e:
         print(f"Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Risk calculation failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Risk calculation failed: {str(e)}")
+
+
+@router.get("/health-plans", response_model=List[HealthPlanStatus])
+def list_health_plans(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Saved personalized plans for the current user, newest first
+    """
+    plans = db.query(HealthPlan).filter(
+        HealthPlan.user_id == current_user.id
+    ).order_by(HealthPlan.created_at.desc()).limit(50).all()
+    
+    return [health_plan_status(plan) for plan in plans]
+
+
+@router.get("/health-plans/{plan_id}", response_model=HealthPlanStatus)
+def get_health_plan(
+    plan_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Poll a personalized plan that is generated in the background
+    """
+    plan = db.query(HealthPlan).filter(
+        HealthPlan.id == plan_id,
+        HealthPlan.user_id == current_user.id
+    ).first()
+    if not plan:
+        raise HTTPException(status_code=404, detail="Health plan not found")
+    
+    return health_plan_status(plan)
+
+
+@router.get("/health-plans/{plan_id}/stream")
+async def stream_health_plan(
+    plan_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Wait for a personalized plan as Server-Sent Events
+    
+    Events:
+    - pending: {"plan_id"} while the plan is being generated (keep-alive comments follow)
+    - plan: HealthPlanStatus once the plan is saved
+    - error: {"plan_id", "detail"} if generation failed or took too long
+    """
+    exists = await run_in_threadpool(
+        lambda: db.query(HealthPlan.id).filter(
+            HealthPlan.id == plan_id,
+            HealthPlan.user_id == current_user.id
+        ).first()
+    )
+    if not exists:
+        raise HTTPException(status_code=404, detail="Health plan not found")
+    user_id = current_user.id
+    
+    def read_status() -> HealthPlanStatus:
+        stream_db = SessionLocal()
+        try:
+            return health_plan_status(stream_db.query(HealthPlan).filter(HealthPlan.id == plan_id).first())
+        finally:
+            stream_db.close()
+    
+    async def load() -> HealthPlanStatus:
+        # Database reads run in the threadpool, not on the event loop
+        return await run_in_threadpool(read_status)
+    
+    async def event_stream():
+        status = await load()
+        if status.status == PENDING:
+            yield _sse("pending", {"plan_id": plan_id})
+            deadline = asyncio.get_running_loop().time() + PLAN_STREAM_TIMEOUT_SECONDS
+            job = get_job_registry().get(plan_id, user_id)
+            while status.status == PENDING and asyncio.get_running_loop().time() < deadline:
+                if job is not None:
+                    # Generated in this process - wake up as soon as it's done
+                    try:
+                        await asyncio.wait_for(job.done.wait(), timeout=PLAN_STREAM_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                else:
+                    await asyncio.sleep(PLAN_STREAM_POLL_SECONDS)
+                status = await load()
+        
+        if status.status == COMPLETE:
+            yield _sse("plan", status.model_dump())
+        elif status.status == FAILED:
+            yield _sse("error", {"plan_id": plan_id, "detail": status.error or "Plan generation failed"})
+        else:
+            yield _sse("error", {"plan_id": plan_id, "detail": f"Plan not ready yet - poll GET /api/health-plans/{plan_id}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def parse_cohort_csv(text: str) -> dict:
+    """CSV with a header row of HealthData field names -> columns (empty cells = missing)"""
+    reader = csv.DictReader(io.StringIO(text))
+    fields = [name for name in reader.fieldnames or [] if name == "id" or name in COLUMNS]
+    columns = {name: [] for name in fields}
+    for row in reader:
+        for name in fields:
+            value = (row.get(name) or "").strip()
+            columns[name].append(value or None)
+    return columns
+
+
+@router.post("/calculate-health-risks/batch")
+async def calculate_health_risks_batch(
+    request: Request,
+    format: str = "json",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Score a cohort: BMI, FINDRISC, Framingham and overall health score per person
+    
+    Input is columnar JSON (HealthDataColumns: one list per HealthData field)
+    or CSV with a header row (Content-Type: text/csv). Output is columnar JSON
+    or CSV (format=csv), rows in input order. Scores are identical to
+    /calculate-health-risks; no AI plan is generated.
+    """
+    if format not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'csv'")
+    
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            raw_columns = parse_cohort_csv(body.decode("utf-8-sig"))
+        else:
+            raw_columns = json.loads(body)
+        columns = HealthDataColumns.model_validate(raw_columns)
+    except ValidationError as e:
+        errors = [
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()[:20]
+        ]
+        raise HTTPException(status_code=400, detail=f"Invalid cohort data: {'; '.join(errors)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cohort data: {str(e)}")
+    
+    rows = len(columns.age)
+    if rows > settings.HEALTH_RISK_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many rows ({rows}); the limit is {settings.HEALTH_RISK_BATCH_MAX_ROWS} - use /calculate-health-risks/ingest for larger cohorts"
+        )
+    if columns.id is not None and len(columns.id) != rows:
+        raise HTTPException(status_code=400, detail=f"Column id has {len(columns.id)} values, expected {rows}")
+    
+    # Same checks as the ingest path: int64 range, finite numbers, positive height/weight
+    try:
+        chunk = validate_columns(columns.model_dump(exclude={"id"}), rows)
+        if chunk.errors:
+            errors = [
+                f"index {index}: {message}"
+                for index, messages in sorted(chunk.errors.items())[:20] for message in messages
+            ]
+            raise HTTPException(status_code=400, detail=f"Invalid cohort data: {'; '.join(errors)}")
+        scores = score_cohort(chunk.columns)
+    except CohortValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    results = to_columns(scores)
+    if columns.id is not None:
+        results = {"id": columns.id, **results}
+    
+    if format == "csv":
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(results.keys())
+        writer.writerows(zip(*results.values()))
+        return Response(content=output.getvalue(), media_type="text/csv")
+    
+    return {"rows": rows, "columns": results}
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request body is still being read
+
+    StreamingResponse listens for client disconnects by calling receive(),
+    which would swallow upload chunks; reading the body already reports a
+    disconnect, so this response only sends.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+@router.post("/calculate-health-risks/ingest")
+async def ingest_health_risk_cohort(
+    request: Request,
+    format: str = "ndjson",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream a cohort of any size through the batch scorer
+    
+    Upload CSV with a header row of HealthData field names (Content-Type:
+    text/csv) or NDJSON, one HealthData object per line (application/x-ndjson).
+    The body is read in chunks of COHORT_INGEST_CHUNK_ROWS rows; each chunk
+    is validated, scored and streamed back before the next is read, so
+    memory stays flat. Output is NDJSON (one line per input row plus a final
+    {"summary": ...}) or CSV (format=csv) in input order. Invalid rows get
+    their validation errors instead of scores; they never abort the upload.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("text/csv"):
+        input_format = "csv"
+    elif content_type.startswith(("application/x-ndjson", "application/jsonl", "application/json")):
+        input_format = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail="Upload text/csv or application/x-ndjson")
+    try:
+        ingestor = CohortIngestor(input_format, format)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    
+    async def scored_rows():
+        try:
+            async for data in request.stream():
+                output = ingestor.feed(data)
+                if output:
+                    yield output
+            yield ingestor.finish()
+        except ClientDisconnect:
+            return
+        except CohortValidationError as e:
+            # Output has already started - report the failure in-band
+            if format == "csv":
+                yield f"# Ingest failed: {str(e)}\n"
+            else:
+                yield json.dumps({"error": str(e), "summary": ingestor.stats}) + "\n"
+    
+    return UploadStreamingResponse(
+        scored_rows(),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson"
+    )
+
@@ -2,13 +2,16 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-import httpx
-import json
 from sqlalchemy.orm import Session
-from app.core.config import settings
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.models import User
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.errors import LLMUnavailableError
+from app.services.structured_completion import complete_structured, StructuredCompletionError
+from app.services import provider_policy
+from app.services.lab_ranges import LabClassification, get_reference_ranges, normalize_sex, normalize_test_name
+from app.services.lab_units import NormalizedLabValue, get_lab_units
 
 router = APIRouter()
 
@@ -38,14 +41,97 @@ class LabInterpretResponse(BaseModel):
     priority_concerns: List[str]
     recommended_actions: List[str]
 
-@router.post("/interpret-labs", response_model=LabInterpretResponse)
+class LabInterpretResult(LabInterpretResponse):
+    critical_values: List[str] = []  # Critical results flagged by the reference table
+    reference_version: str = ""  # Version of the reference range table
+
+class LabNarrative(BaseModel):
+    # What the LLM writes: status/reference_range only for tests the table doesn't cover
+    test_name: str
+    status: Optional[str] = None
+    reference_range: Optional[str] = None
+    explanation: str
+    clinical_significance: str
+    recommendation: str
+
+class LabNarrativeResponse(BaseModel):
+    results: List[LabNarrative]
+    overall_assessment: str
+    priority_concerns: List[str]
+    recommended_actions: List[str]
+
+class LabClassificationResult(BaseModel):
+    test_name: str
+    value: str
+    unit: str
+    status: Optional[str] = None  # None when the test/unit isn't in the reference table
+    reference_range: Optional[str] = None
+    critical: bool = False
+
+class LabClassifyResponse(BaseModel):
+    results: List[LabClassificationResult]
+    critical_values: List[str]
+    reference_version: str
+
+def normalize_panel(request: LabInterpretRequest) -> List[NormalizedLabValue]:
+    """Parse values ("<5", "1,200") and convert them to the reference table's units"""
+    return get_lab_units().normalize_panel(
+        [(lab.test_name, lab.value, lab.unit) for lab in request.lab_values]
+    )
+
+def classify_panel(labs: List[NormalizedLabValue], request: LabInterpretRequest) -> List[Optional[LabClassification]]:
+    """Table-driven status and reference range for every value the table covers"""
+    # Unitless values whose magnitude doesn't fit the table unit are not classified
+    return get_reference_ranges().classify_panel(
+        [(lab.test_name, None if lab.unit_mismatch else lab.value, lab.unit, lab.qualifier) for lab in labs],
+        age=request.patient_age,
+        sex=normalize_sex(request.patient_gender)
+    )
+
+def describe_critical(lab: NormalizedLabValue, classification: LabClassification) -> str:
+    return (
+        f"CRITICAL: {lab.test_name} {lab.display_value} {classification.unit} "
+        f"(reference {classification.reference_range}) - contact your doctor or seek urgent care now"
+    )
+
+@router.post("/classify-labs", response_model=LabClassifyResponse)
+def classify_lab_results(
+    request: LabInterpretRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Status and reference range for each value from the reference table - no AI, returns immediately
+    """
+    labs = normalize_panel(request)
+    classifications = classify_panel(labs, request)
+    return LabClassifyResponse(
+        results=[
+            LabClassificationResult(
+                test_name=lab.test_name,
+                value=lab.display_value,
+                unit=lab.unit or "",
+                status=classification.status if classification else None,
+                reference_range=classification.reference_range if classification else None,
+                critical=classification.critical if classification else False
+            )
+            for lab, classification in zip(labs, classifications)
+        ],
+        critical_values=[describe_critical(lab, c) for lab, c in zip(labs, classifications) if c and c.critical],
+        reference_version=get_reference_ranges().version
+    )
+
+@router.post("/interpret-labs", response_model=LabInterpretResult)
 async def interpret_lab_results(
     request: LabInterpretRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Interpret lab results and explain in plain English
+    
+    Status and reference range come from the reference table; the AI only
+    writes the explanations (and classifies tests the table doesn't cover).
     """
     
     if len(request.lab_values) == 0:
@@ -54,12 +140,22 @@ async def interpret_lab_results(
             detail="Please provide at least one lab value"
         )
     
-    # Build lab values text
+    # Canonical units first, so equivalent panels classify and cache the same way
+    labs = normalize_panel(request)
+    classifications = classify_panel(labs, request)
+    
+    # Build lab values text (with the table's classification where available)
     lab_values_text = []
-    for lab in request.lab_values:
-        lab_str = f"- {lab.test_name}: {lab.value}"
+    for lab, classification in zip(labs, classifications):
+        lab_str = f"- {lab.test_name}: {lab.display_value}"
         if lab.unit:
             lab_str += f" {lab.unit}"
+        if classification:
+            lab_str += f" [status: {classification.status}, reference: {classification.reference_range}]"
+        elif lab.unit_mismatch:
+            lab_str += " [status: not classified - no unit given and the value doesn't fit the usual unit]"
+        else:
+            lab_str += " [status: not classified]"
         lab_values_text.append(lab_str)
     
     labs_text = "\n".join(lab_values_text)
@@ -78,44 +174,20 @@ async def interpret_lab_results(
 
 CRITICAL RULES:
 1. Explain EVERY lab value in simple, clear language
-2. Classify each result: NORMAL, HIGH, LOW, or CRITICAL
-3. Provide standard reference ranges
+2. Status and reference range are already given for most values - use them, do not re-classify
+3. Only for values marked "not classified": classify as NORMAL, HIGH, LOW, or CRITICAL and give the standard reference range
 4. Explain clinical significance (what it means for health)
 5. Give actionable recommendations
 6. Prioritize critical/abnormal findings
 7. Consider patient age and gender when relevant
 
-COMMON LAB TESTS & REFERENCE RANGES:
-- Glucose (fasting): 70-100 mg/dL
-- HbA1c: <5.7% (normal), 5.7-6.4% (prediabetes), ≥6.5% (diabetes)
-- Total Cholesterol: <200 mg/dL (desirable)
-- LDL Cholesterol: <100 mg/dL (optimal)
-- HDL Cholesterol: >60 mg/dL (good)
-- Triglycerides: <150 mg/dL
-- Hemoglobin: 13.5-17.5 g/dL (male), 12-15.5 g/dL (female)
-- White Blood Cell Count: 4,000-11,000 cells/μL
-- Platelets: 150,000-400,000/μL
-- Creatinine: 0.7-1.3 mg/dL (male), 0.6-1.1 mg/dL (female)
-- ALT: 7-56 U/L
-- AST: 10-40 U/L
-- TSH: 0.4-4.0 mU/L
-- Vitamin D: 30-100 ng/mL
-
-STATUS DEFINITIONS:
-- NORMAL: Within reference range
-- HIGH: Above normal, needs attention
-- LOW: Below normal, needs attention
-- CRITICAL: Dangerously high/low, urgent care needed
-
-OUTPUT FORMAT (JSON):
+OUTPUT FORMAT (JSON), one result per lab value in the same order:
 {
     "results": [
         {
             "test_name": "name of test",
-            "value": "value as string",
-            "unit": "measurement unit",
-            "status": "normal|high|low|critical",
-            "reference_range": "normal range for this test",
+            "status": "normal|high|low|critical (only if not classified)",
+            "reference_range": "normal range (only if not classified)",
             "explanation": "what this test measures in simple terms",
             "clinical_significance": "what this result means for health",
             "recommendation": "what to do about this result"
@@ -136,55 +208,62 @@ LAB VALUES:
 PATIENT CONTEXT:
 {context_text}
 
-Provide detailed interpretation with status, reference ranges, explanations, and recommendations.
+Provide explanations and recommendations for each value.
 Output ONLY valid JSON, no additional text."""
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:5173",
-                    "X-Title": "MediAI-LabInterpreter"
-                },
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.2,
-                    "max_tokens": 3000
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            ai_response = data["choices"][0]["message"]["content"]
-            
-            # Parse JSON response
-            ai_response = ai_response.strip()
-            if ai_response.startswith("```json"):
-                ai_response = ai_response[7:]
-            if ai_response.startswith("```"):
-                ai_response = ai_response[3:]
-            if ai_response.endswith("```"):
-                ai_response = ai_response[:-3]
-            ai_response = ai_response.strip()
-            
-            result = json.loads(ai_response)
-            
-            return LabInterpretResponse(**result)
-            
-    except json.JSONDecodeError as e:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        # Cached, coalesced, JSON-mode completion validated against the response model
+        structured = await complete_structured(
+            llm_service, messages, LabNarrativeResponse,
+            temperature=0.2,
+            max_tokens=3000,
+            policy=provider_policy.LAB_INTERPRETATION
+        )
+        narrative = structured.data
+        
+        # Match narratives to values by name, falling back to position when
+        # the model returned exactly one result per value
+        by_name = {normalize_test_name(item.test_name): item for item in narrative.results}
+        aligned = len(narrative.results) == len(labs)
+        results = []
+        for i, (lab, classification) in enumerate(zip(labs, classifications)):
+            item = by_name.get(normalize_test_name(lab.test_name))
+            if item is None and aligned:
+                item = narrative.results[i]
+            results.append(LabResult(
+                test_name=lab.test_name,
+                value=lab.display_value,
+                unit=lab.unit or "",
+                status=classification.status if classification else (item.status if item and item.status else "unknown"),
+                reference_range=classification.reference_range if classification else (item.reference_range if item and item.reference_range else ""),
+                explanation=item.explanation if item else "",
+                clinical_significance=item.clinical_significance if item else "",
+                recommendation=item.recommendation if item else "Discuss this result with your healthcare provider."
+            ))
+        
+        critical_values = [describe_critical(lab, c) for lab, c in zip(labs, classifications) if c and c.critical]
+        return LabInterpretResult(
+            results=results,
+            overall_assessment=narrative.overall_assessment,
+            priority_concerns=critical_values + narrative.priority_concerns,
+            recommended_actions=narrative.recommended_actions,
+            critical_values=critical_values,
+            reference_version=get_reference_ranges().version
+        )
+        
+    except StructuredCompletionError as e:
         print(f"JSON Parse Error: {e}")
-        print(f"AI Response: {ai_response}")
         raise HTTPException(
             status_code=500,
             detail="Failed to parse AI response. Please try again."
         )
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(
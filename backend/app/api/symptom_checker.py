@@ -2,13 +2,16 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-import httpx
-import json
 from sqlalchemy.orm import Session
-from app.core.config import settings
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.models import User
+from app.services.llm_service import LLMService, get_llm_service
+from app.services.errors import LLMUnavailableError
+from app.services.structured_completion import complete_structured, StructuredCompletionError
+from app.services import provider_policy
+from app.services.background_jobs import get_job_registry
+from app.services.emergency_detector import EmergencyMatch, get_emergency_detector
 
 router = APIRouter()
 
@@ -35,29 +38,53 @@ class SymptomCheckResponse(BaseModel):
     recommendation: str
     next_steps: List[str]
 
-@router.post("/check-symptoms", response_model=SymptomCheckResponse)
+class SymptomCheckResult(SymptomCheckResponse):
+    analysis_status: str = "complete"  # "pending" while the differential is computed in the background
+    analysis_id: Optional[str] = None  # Poll GET /check-symptoms/{analysis_id} when pending
+    emergency_flags: List[str] = []  # Emergency symptoms found by the detector
+
+class SymptomAnalysisStatus(BaseModel):
+    analysis_id: str
+    status: str  # "pending", "complete", "failed"
+    result: Optional[SymptomCheckResult] = None
+    error: Optional[str] = None
+
+def emergency_guidance(matches: List[EmergencyMatch]) -> dict:
+    """Guidance returned as soon as an emergency is detected"""
+    guidelines = [match.flag.guideline for match in matches if match.flag.guideline]
+    return {
+        "emergency": True,
+        "urgency_level": "emergency",
+        "recommendation": "🚨 CALL 1122 IMMEDIATELY - This may be a medical emergency!",
+        "next_steps": [
+            "Call emergency services (1122) right now",
+            "Do not drive yourself - wait for ambulance",
+            "Stay calm and follow dispatcher instructions",
+            *guidelines
+        ],
+        "emergency_flags": [match.flag.symptom for match in matches]
+    }
+
+@router.post("/check-symptoms", response_model=SymptomCheckResult)
 async def check_symptoms(
     request: SymptomCheckRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     """
     Analyze symptoms and provide differential diagnosis
-    """
     
-    # Emergency keywords detection
-    emergency_keywords = [
-        "chest pain", "can't breathe", "difficulty breathing", "severe bleeding",
-        "loss of consciousness", "stroke", "heart attack", "suicide", "overdose",
-        "severe head injury", "paralysis", "seizure", "can't speak"
-    ]
+    When emergency symptoms are detected, the emergency guidance is returned
+    immediately with analysis_status "pending". The differential diagnosis is
+    computed in the background - poll GET /check-symptoms/{analysis_id}.
+    """
     
-    # Check for emergency symptoms
-    emergency_detected = False
-    for symptom in request.symptoms:
-        if any(keyword in symptom.name.lower() for keyword in emergency_keywords):
-            emergency_detected = True
-            break
+    # Emergency screening (compiled detector) over symptom names and existing conditions
+    emergency_matches = get_emergency_detector().detect(
+        [symptom.name for symptom in request.symptoms] + list(request.existing_conditions or [])
+    )
+    emergency_detected = bool(emergency_matches)
     
     # Build symptom description
     symptom_list = []
@@ -124,71 +151,52 @@ PATIENT CONTEXT:
 Provide a differential diagnosis with possible conditions, urgency assessment, and recommendations.
 Remember: Output ONLY valid JSON, no additional text."""
 
+    # Call AI with structured prompt
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    
+    async def analyze() -> SymptomCheckResult:
+        # Cached, coalesced, JSON-mode completion validated against the response model
+        structured = await complete_structured(
+            llm_service, messages, SymptomCheckResponse,
+            temperature=0.3,  # Lower temperature for more consistent medical analysis
+            max_tokens=2000,
+            policy=provider_policy.SYMPTOM_CHECK
+        )
+        analysis = structured.data.model_dump()
+        
+        # Override with emergency detection if keywords found
+        if emergency_detected:
+            analysis.update(emergency_guidance(emergency_matches))
+        
+        return SymptomCheckResult(**analysis)
+    
+    if emergency_detected:
+        # Emergencies never wait on a model - guidance now, differential afterwards
+        async def analyze_in_background() -> dict:
+            return (await analyze()).model_dump()
+        
+        job = get_job_registry().submit("symptom_analysis", current_user.id, analyze_in_background)
+        return SymptomCheckResult(
+            conditions=[],
+            **emergency_guidance(emergency_matches),
+            analysis_status="pending",
+            analysis_id=job.id
+        )
+    
     try:
-        # Call AI with structured prompt
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:5173",
-                    "X-Title": "MediAI-SymptomChecker"
-                },
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.3,  # Lower temperature for more consistent medical analysis
-                    "max_tokens": 2000
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            ai_response = data["choices"][0]["message"]["content"]
-            
-            # Parse JSON response
-            # Remove markdown code blocks if present
-            ai_response = ai_response.strip()
-            if ai_response.startswith("```json"):
-                ai_response = ai_response[7:]
-            if ai_response.startswith("```"):
-                ai_response = ai_response[3:]
-            if ai_response.endswith("```"):
-                ai_response = ai_response[:-3]
-            ai_response = ai_response.strip()
-            
-            result = json.loads(ai_response)
-            
-            # Override with emergency detection if keywords found
-            if emergency_detected:
-                result["emergency"] = True
-                result["urgency_level"] = "emergency"
-                result["recommendation"] = "🚨 CALL 1122 IMMEDIATELY - This may be a medical emergency!"
-                result["next_steps"] = [
-                    "Call emergency services (1122) right now",
-                    "Do not drive yourself - wait for ambulance",
-                    "Stay calm and follow dispatcher instructions"
-                ]
-            
-            return SymptomCheckResponse(**result)
-            
-    except json.JSONDecodeError as e:
+        return await analyze()
+        
+    except StructuredCompletionError as e:
         print(f"JSON Parse Error: {e}")
-        print(f"AI Response: {ai_response}")
         raise HTTPException(
             status_code=500,
             detail="Failed to parse AI response. Please try again."
         )
-    except httpx.HTTPStatusError as e:
-        print(f"HTTP Error: {e.response.status_code} - {e.response.text}")
-        raise HTTPException(
-            status_code=e.response.status_code,
-            detail=f"AI API error: {e.response.text}"
-        )
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(
@@ -197,6 +205,26 @@ Remember: Output ONLY valid JSON, no additional text."""
         )
 
 
+@router.get("/check-symptoms/{analysis_id}", response_model=SymptomAnalysisStatus)
+def get_symptom_analysis(
+    analysis_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Poll a differential diagnosis that is computed in the background
+    """
+    job = get_job_registry().get(analysis_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    return SymptomAnalysisStatus(
+        analysis_id=job.id,
+        status=job.status,
+        result=job.result,
+        error=job.error
+    )
+
+
 @router.get("/common-symptoms")
 def get_common_symptoms():
     """
@@ -70,6 +70,24 @@ def get_current_user(
     
     return user
 
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """
+    Require the current user to be an admin (listed in ADMIN_EMAILS)
+    """
+    admin_emails = {
+        email.strip().lower()
+        for email in settings.ADMIN_EMAILS.split(",")
+        if email.strip()
+    }
+    
+    if current_user.email.lower() not in admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return current_user
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """
     Authenticate a user with email and password
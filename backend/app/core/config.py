@@ -21,18 +21,114 @@ class Settings(BaseSettings):
     # Ollama Configuration (Local - FREE)
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.2"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # Keep the model loaded between requests
+    OLLAMA_CONTEXT_REUSE: bool = True  # Reuse KV context per conversation
+    OLLAMA_CONTEXT_MAX_CONVERSATIONS: int = 200
+    OLLAMA_CONTEXT_MAX_TOTAL_TOKENS: int = 1_000_000  # Across all stored contexts
     
     # Google Gemini Configuration (Free tier: 1,500 req/day)
     GEMINI_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-pro"
+    GEMINI_MAX_CONCURRENCY: int = 8  # Simultaneous in-flight Gemini calls per worker (admission control)
+    GEMINI_TIMEOUT: float = 60.0  # seconds - the call, or a stream waiting for its next chunk, is cancelled after this
     
     # OpenRouter (Fallback - Paid)
     OPENROUTER_API_KEY: str = ""
     OPENROUTER_MODEL: str = "deepseek/deepseek-chat"
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     
+    # LLM Provider Health (adaptive ordering + circuit breakers)
+    LLM_HEALTH_EWMA_ALPHA: float = 0.3  # Weight of the newest sample
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 3  # Consecutive failures before opening
+    LLM_CIRCUIT_OPEN_SECONDS: float = 30.0  # Cool-down before a half-open trial
+    LLM_HEALTH_ERROR_HALF_LIFE: float = 60.0  # seconds; the error rate halves this often, so demoted providers recover without traffic
+    LLM_SLOW_PROVIDER_FACTOR: float = 3.0  # Demote providers this many times slower than the fastest
+    LLM_HEALTH_PROBE_INTERVAL: float = 15.0  # seconds, 0 disables background probes
+    LLM_LATENCY_SAMPLE_SIZE: int = 200  # Recent latencies kept per provider
+    
+    # LLM Hedged Requests (backup provider when the first one is slow)
+    LLM_HEDGING_ENABLED: bool = False  # Default for generate_response(hedge=None)
+    LLM_HEDGE_PERCENTILE: float = 95.0  # Hedge after this latency percentile
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Samples needed before using the percentile
+    LLM_HEDGE_DEFAULT_DELAY: float = 5.0  # seconds, until enough samples exist
+    LLM_HEDGE_MIN_DELAY: float = 0.5  # seconds, floor for the hedge delay
+    
+    # Conversation Context (prompt token budget per provider)
+    CONTEXT_TOKEN_BUDGET_OLLAMA: int = 2048
+    CONTEXT_TOKEN_BUDGET_GEMINI: int = 8000
+    CONTEXT_TOKEN_BUDGET_OPENROUTER: int = 6000
+    CONTEXT_MAX_HISTORY_MESSAGES: int = 100  # Hard cap regardless of budget
+    CONTEXT_TOKEN_CACHE_SIZE: int = 10000  # Cached per-message token counts
+    
+    # LLM Response Cache (low-temperature analysis endpoints)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1000
+    LLM_CACHE_MAX_BYTES: int = 50_000_000  # Memory tier size limit
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    LLM_CACHE_DISK_PATH: str = ""  # SQLite file for a restart-proof tier, empty disables
+    LLM_CACHE_FLUSH_INTERVAL: float = 1.0  # seconds between batched disk-tier writes, 0 writes only at shutdown
+    
+    # LLM Single-Flight (coalesce identical in-flight requests)
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+    
+    # LLM Admission Control (per-provider concurrency + bounded wait queue)
+    OLLAMA_MAX_CONCURRENT_REQUESTS: int = 2  # A single Ollama box serves few generations well
+    OLLAMA_MAX_QUEUE: int = 8
+    GEMINI_MAX_QUEUE: int = 32  # Concurrency is GEMINI_MAX_CONCURRENCY
+    OPENROUTER_MAX_CONCURRENT_REQUESTS: int = 32
+    OPENROUTER_MAX_QUEUE: int = 64
+    LLM_QUEUE_TIMEOUT: float = 5.0  # seconds a request may wait for a slot
+    
+    # LLM Provider Quotas (persisted in the database, 0 disables a limit)
+    LLM_QUOTA_ENABLED: bool = True
+    GEMINI_DAILY_QUOTA: int = 1500  # Free tier requests per (UTC) day
+    GEMINI_REQUESTS_PER_MINUTE: int = 15
+    OPENROUTER_DAILY_QUOTA: int = 0
+    OPENROUTER_REQUESTS_PER_MINUTE: int = 0
+    LLM_QUOTA_PACING: bool = True  # Try providers ahead of their daily budget last
+    LLM_QUOTA_PACING_MARGIN: float = 0.1  # Share of the quota allowed ahead of the clock
+    LLM_RATE_LIMIT_DEFAULT_RETRY: float = 60.0  # seconds, for a 429 without Retry-After
+    LLM_QUOTA_FLUSH_INTERVAL: float = 5.0  # seconds between batched writes of quota state, 0 writes only at shutdown
+    
+    # Background Jobs (slow LLM work finished after the response, e.g. differentials)
+    BACKGROUND_JOB_MAX: int = 1000
+    BACKGROUND_JOB_TTL_SECONDS: int = 3600  # Finished jobs are kept this long for polling
+    
+    # Personalized health plan cache (plans shared per quantized risk profile)
+    HEALTH_PLAN_CACHE_ENABLED: bool = True
+    HEALTH_PLAN_CACHE_MAX_ENTRIES: int = 5000
+    HEALTH_PLAN_CACHE_MAX_BYTES: int = 20_000_000
+    HEALTH_PLAN_CACHE_TTL_SECONDS: int = 604800  # Plans are regenerated weekly
+    HEALTH_PLAN_CACHE_DISK_PATH: str = ""  # SQLite file for a restart-proof tier, empty disables
+    HEALTH_PLAN_WARM_TOP_N: int = 20  # Most requested profiles kept warm
+    HEALTH_PLAN_WARM_INTERVAL_SECONDS: int = 3600  # Warm-up at startup and then this often, 0 disables
+    
+    # Batch health-risk scoring
+    HEALTH_RISK_BATCH_MAX_ROWS: int = 100000
+    COHORT_INGEST_CHUNK_ROWS: int = 5000  # Rows validated and scored at a time by the streaming ingest
+    
+    # Admin (comma-separated emails allowed to use /api/admin endpoints)
+    ADMIN_EMAILS: str = ""
+    
+    # HTTP Connection Pool (shared per-provider clients)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP2_ENABLED: bool = True  # Used when the 'h2' package is installed
+    OLLAMA_TIMEOUT: float = 60.0  # seconds
+    OPENROUTER_TIMEOUT: float = 30.0  # seconds
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
+
+def reload_settings() -> Settings:
+    """Re-read environment variables and .env into the shared settings object
+
+    Updates the existing instance in place so modules holding a reference
+    to `settings` see the new values.
+    """
+    settings.__init__()
+    return settings
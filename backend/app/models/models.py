@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -21,6 +21,7 @@ class User(Base):
     
     # Relationships
     conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
+    health_plans = relationship("HealthPlan", back_populates="user", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<User {self.username}>"
@@ -58,4 +59,41 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
     
     def __repr__(self):
-        return f"<Message {self.role}: {self.content[:30]}...>"
\ No newline at end of file
+        return f"<Message {self.role}: {self.content[:30]}...>"
+
+
+class HealthPlan(Base):
+    """Health plan model - AI personalized plan for a health-risk assessment"""
+    __tablename__ = "health_plans"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, default="pending", nullable=False)  # 'pending', 'complete' or 'failed'
+    overall_health_score = Column(Integer, nullable=True)
+    profile_key = Column(String, nullable=True, index=True)  # Quantized risk profile (plan cache bucket)
+    content = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="health_plans")
+    
+    def __repr__(self):
+        return f"<HealthPlan {self.id}: {self.status}>"
+
+
+class ProviderQuota(Base):
+    """Provider quota state - rate-limit bucket and daily usage per LLM provider"""
+    __tablename__ = "provider_quotas"
+    
+    provider = Column(String, primary_key=True)
+    quota_date = Column(String, nullable=False)  # UTC day (YYYY-MM-DD) of requests_today
+    requests_today = Column(Integer, default=0, nullable=False)
+    bucket_tokens = Column(Float, nullable=True)  # None = full bucket
+    bucket_updated_at = Column(DateTime, default=datetime.utcnow)
+    blocked_until = Column(DateTime, nullable=True)  # From 429 / Retry-After
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ProviderQuota {self.provider}: {self.requests_today} on {self.quota_date}>"
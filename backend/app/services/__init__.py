@@ -8,6 +8,6 @@ This module contains service classes for various functionalities:
 - Query routing
 """
 
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, get_llm_service
 
-__all__ = ['LLMService']
+__all__ = ['LLMService', 'get_llm_service']
@@ -0,0 +1,94 @@
+"""
+Admission Control - Per-provider concurrency limits with bounded queues
+
+Each provider admits at most `max_concurrency` generations at once. Extra
+requests wait in a bounded queue for at most `queue_timeout` seconds. When
+the queue is full or the deadline passes, ProviderOverloaded is raised so
+LLMService can spill to the next provider or answer fast with 503 and
+Retry-After, instead of overloading a single Ollama box.
+"""
+
+from typing import AsyncIterator, Deque
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+from app.services.errors import ProviderOverloaded
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """Concurrency semaphore + bounded wait queue for one provider"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    @asynccontextmanager
+    async def slot(self, retry_after: int = 5) -> AsyncIterator[None]:
+        """Hold one concurrency slot for the duration of a generation
+
+        Args:
+            retry_after: Seconds to suggest to clients if overloaded
+
+        Raises:
+            ProviderOverloaded: Queue full or queue-time deadline passed
+        """
+        await self._acquire(retry_after)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _acquire(self, retry_after: int) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self._admit(0.0)
+            return
+
+        if self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise ProviderOverloaded(self.name, "queue full", retry_after)
+
+        self.waiting += 1
+        self.stats["queued"] += 1
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            self._wait_times.append(time.perf_counter() - started_at)
+            raise ProviderOverloaded(self.name, f"queued over {self.queue_timeout}s", retry_after)
+        finally:
+            self.waiting -= 1
+
+        self._admit(time.perf_counter() - started_at)
+
+    def _admit(self, wait_time: float) -> None:
+        self.stats["admitted"] += 1
+        self._wait_times.append(wait_time)
+
+    def snapshot(self) -> dict:
+        """Queue depth and wait-time metrics for the admin endpoint"""
+        waits = sorted(self._wait_times)
+        p95 = waits[max(0, int(len(waits) * 0.95) - 1)] if waits else 0.0
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "p95_wait_ms": round(p95 * 1000, 1)
+        }
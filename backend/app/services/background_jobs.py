@@ -0,0 +1,152 @@
+"""
+Background Jobs - Run slow LLM work after the response has been sent
+
+An endpoint answers right away with a job id. The slow part (e.g. a
+differential diagnosis) runs as an asyncio task. Clients poll the job by
+id. Finished jobs are kept for BACKGROUND_JOB_TTL_SECONDS and only their
+owner can read them.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+import asyncio
+import logging
+import time
+import uuid
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+COMPLETE = "complete"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    owner_id: str
+    status: str = PENDING
+    result: Any = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    expires_at: float = 0.0  # monotonic, set when finished
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobRegistry:
+    """In-process registry of background jobs, bounded by count and TTL"""
+
+    def __init__(self, max_jobs: int = 1000, ttl_seconds: float = 3600):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "evicted": 0}
+
+    def submit(
+        self,
+        kind: str,
+        owner_id: str,
+        fn: Callable[[], Awaitable[Any]],
+        job_id: Optional[str] = None
+    ) -> Job:
+        """Start fn() in the background and return its job
+
+        Args:
+            kind: Job type, e.g. "symptom_analysis"
+            owner_id: User allowed to read the job
+            fn: Zero-argument coroutine function; its result must be JSON-serializable
+            job_id: Id to use (e.g. of a database row the job fills in); a new UUID by default
+        """
+        self._evict()
+        job = Job(id=job_id or str(uuid.uuid4()), kind=kind, owner_id=owner_id)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, fn))
+        self.stats["submitted"] += 1
+        return job
+
+    def get(self, job_id: str, owner_id: str) -> Optional[Job]:
+        """A job by id, or None if unknown, expired or owned by someone else"""
+        self._evict()
+        job = self._jobs.get(job_id)
+        if job is None or job.owner_id != owner_id:
+            return None
+        return job
+
+    async def shutdown(self) -> None:
+        """Cancel jobs that are still running"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "jobs": len(self._jobs), "running": len(self._tasks)}
+
+    async def _run(self, job: Job, fn: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            job.result = await fn()
+            job.status = COMPLETE
+            self.stats["completed"] += 1
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = "Cancelled"
+            raise
+        except Exception as e:
+            logger.warning(f"Background job {job.kind} failed: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+            self.stats["failed"] += 1
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.expires_at = time.monotonic() + self.ttl_seconds
+            job.done.set()
+            self._tasks.pop(job.id, None)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status != PENDING and job.expires_at <= now
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        # Over the limit - drop the oldest finished jobs (running ones are kept)
+        while len(self._jobs) >= self.max_jobs:
+            oldest = next((job_id for job_id, job in self._jobs.items() if job.status != PENDING), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+            self.stats["evicted"] += 1
+
+
+_job_registry: Optional[JobRegistry] = None
+
+
+def get_job_registry() -> JobRegistry:
+    """Shared job registry, built from settings on first use"""
+    global _job_registry
+    if _job_registry is None:
+        _job_registry = JobRegistry(
+            max_jobs=settings.BACKGROUND_JOB_MAX,
+            ttl_seconds=settings.BACKGROUND_JOB_TTL_SECONDS
+        )
+    return _job_registry
@@ -0,0 +1,388 @@
+"""
+Cohort Ingest - Stream large CSV/NDJSON cohorts through the vectorized scorer
+
+Population screening exports can be gigabytes. Input is fed in arbitrary
+byte pieces; complete records are collected into chunks of
+COHORT_INGEST_CHUNK_ROWS, each chunk is validated column by column (HealthData
+types and requirements, without a pydantic object per row), scored with
+cohort_scoring and written out as NDJSON or CSV before the next chunk is
+read. Memory stays flat however large the file is.
+
+Invalid rows are reported in the output, in input order, and never abort
+the job:
+
+    {"row": 7, "id": "p-7", "errors": ["age: Input should be a valid integer"]}
+
+CLI:
+
+    python -m app.services.cohort_ingest cohort.csv -o scores.ndjson
+    python -m app.services.cohort_ingest cohort.ndjson --format csv < ... > ...
+"""
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import codecs
+import csv
+import io
+import json
+import math
+from app.core.config import settings
+from app.services.cohort_scoring import COLUMNS, OUTPUT_COLUMNS, REQUIRED_COLUMNS, CohortValidationError, score_cohort, to_columns
+
+INPUT_FORMATS = ("csv", "ndjson")
+OUTPUT_FORMATS = ("ndjson", "csv")
+MAX_RECORD_CHARS = 1_000_000  # A single record (line) longer than this aborts the job
+
+# HealthData field types (COLUMNS keeps systolic_bp as float so it can hold NaN)
+FIELD_TYPES = {name: kind for name, (kind, _) in COLUMNS.items()}
+FIELD_TYPES["systolic_bp"] = "int"
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1  # Integer columns are scored as int64
+POSITIVE_COLUMNS = ("height_cm", "weight_kg")  # BMI divides by height; 0 weight isn't a measurement
+
+_BOOLS = {
+    **{text: True for text in ("1", "true", "t", "yes", "y", "on")},
+    **{text: False for text in ("0", "false", "f", "no", "n", "off")}
+}
+
+
+# Converters receive stripped, non-empty strings (CSV) or JSON values (NDJSON)
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, str):
+        try:
+            result = int(value)
+        except ValueError:
+            raise ValueError("Input should be a valid integer")
+    elif isinstance(value, bool):
+        raise ValueError("Input should be a valid integer")
+    elif isinstance(value, int):
+        result = value
+    elif isinstance(value, float) and value.is_integer():
+        result = int(value)
+    else:
+        raise ValueError("Input should be a valid integer")
+    if not INT64_MIN <= result <= INT64_MAX:
+        raise ValueError("Input should be a 64-bit integer")
+    return result
+
+
+def _to_float(value: Any) -> float:
+    if isinstance(value, str):
+        try:
+            result = float(value)
+        except ValueError:
+            raise ValueError("Input should be a valid number")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            result = float(value)
+        except OverflowError:
+            raise ValueError("Input should be a finite number")
+    else:
+        raise ValueError("Input should be a valid number")
+    if not math.isfinite(result):
+        raise ValueError("Input should be a finite number")
+    return result
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        result = _BOOLS.get(value.lower())
+        if result is not None:
+            return result
+    elif isinstance(value, bool):
+        return value
+    elif isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise ValueError("Input should be a valid boolean")
+
+
+def _to_str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError("Input should be a valid string")
+    return value
+
+
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {"int": _to_int, "float": _to_float, "bool": _to_bool, "str": _to_str}
+
+
+def _missing(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+@dataclass
+class ValidatedChunk:
+    columns: Dict[str, List[Any]]  # Valid rows only, ready for score_cohort
+    valid: List[bool]  # Per input row
+    errors: Dict[int, List[str]] = field(default_factory=dict)  # Input index -> messages
+
+
+def validate_records(records: List[Dict[str, Any]]) -> ValidatedChunk:
+    """Validate a chunk of records against HealthData (see validate_columns)"""
+    return validate_columns(
+        {name: [record.get(name) for record in records] for name in FIELD_TYPES}, len(records)
+    )
+
+
+def validate_columns(columns: Mapping[str, Optional[Sequence[Any]]], count: int) -> ValidatedChunk:
+    """Validate columnar HealthData, one column at a time
+
+    Beyond HealthData's types: integers must fit int64, numbers must be
+    finite and height/weight positive, so every valid row can be scored.
+    Each column is converted with a single list comprehension; only a column
+    that fails is re-checked cell by cell to collect the row errors.
+
+    Raises:
+        CohortValidationError: A column doesn't have `count` values
+    """
+    errors: Dict[int, List[str]] = {}
+    converted: Dict[str, List[Any]] = {}
+
+    for name, kind in FIELD_TYPES.items():
+        cells = columns.get(name)
+        if cells is None:
+            cells = [None] * count
+        elif len(cells) != count:
+            raise CohortValidationError(f"Column {name} has {len(cells)} values, expected {count}")
+        # Empty/blank cells are missing (None)
+        cells = [(cell.strip() or None) if isinstance(cell, str) else cell for cell in cells]
+        convert = CONVERTERS[kind]
+        try:
+            values = [None if cell is None else convert(cell) for cell in cells]
+        except ValueError:
+            values = []
+            for i, cell in enumerate(cells):
+                try:
+                    values.append(None if cell is None else convert(cell))
+                except ValueError as e:
+                    values.append(None)
+                    errors.setdefault(i, []).append(f"{name}: {str(e)}")
+
+        if name in REQUIRED_COLUMNS:
+            for i, cell in enumerate(cells):
+                if cell is None:
+                    errors.setdefault(i, []).append(f"{name}: Field required")
+        if name in POSITIVE_COLUMNS:
+            for i, value in enumerate(values):
+                if value is not None and not value > 0:
+                    errors.setdefault(i, []).append(f"{name}: must be greater than 0")
+        converted[name] = values
+
+    valid = [i not in errors for i in range(count)]
+    columns = {name: [v for v, ok in zip(values, valid) if ok] for name, values in converted.items()}
+    return ValidatedChunk(columns=columns, valid=valid, errors=errors)
+
+
+def _json_value(value: float) -> Optional[float]:
+    """NaN/inf aren't valid JSON - report them as null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class CohortIngestor:
+    """Push parser: feed() bytes as they arrive, get formatted output back per chunk
+
+    Output is produced only when a chunk of complete records is ready, so
+    at most chunk_rows records (plus one partial line) are held in memory.
+    """
+
+    def __init__(
+        self,
+        input_format: str = "csv",
+        output_format: str = "ndjson",
+        chunk_rows: Optional[int] = None
+    ):
+        if input_format not in INPUT_FORMATS:
+            raise ValueError(f"input format must be one of {', '.join(INPUT_FORMATS)}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"output format must be one of {', '.join(OUTPUT_FORMATS)}")
+        self.input_format = input_format
+        self.output_format = output_format
+        self.chunk_rows = max(1, chunk_rows or settings.COHORT_INGEST_CHUNK_ROWS)
+        self.stats = {"rows": 0, "scored": 0, "invalid": 0, "chunks": 0}
+
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._tail = ""  # Text after the last newline
+        self._record: List[str] = []  # Lines of a CSV record with an open quoted field
+        self._quote_open = False
+        self._records: List[str] = []  # Complete records waiting for a full chunk
+        self._header: Optional[List[str]] = None
+        self._header_written = False
+
+    def feed(self, data: bytes) -> str:
+        """Consume a piece of input; returns output for any chunks completed by it"""
+        text = self._decoder.decode(data)
+        if "\n" not in text:
+            self._tail += text
+            self._check_size(self._tail)
+            return ""
+
+        lines = (self._tail + text).split("\n")
+        self._tail = lines.pop()
+        self._check_size(self._tail)
+        output = []
+        for line in lines:
+            self._add_line(line + "\n")
+            if len(self._records) >= self.chunk_rows:
+                output.append(self._flush())
+        return "".join(output)
+
+    def finish(self) -> str:
+        """Consume the end of input; returns the remaining output (and NDJSON summary)"""
+        text = self._tail + self._decoder.decode(b"", final=True)
+        self._tail = ""
+        if text:
+            self._add_line(text)
+        if self._record:
+            # Unterminated quoted field - let the CSV parser report what it can
+            self._records.append("".join(self._record))
+            self._record = []
+        output = self._flush() if self._records else ""
+        if self.output_format == "csv" and not self._header_written:
+            output += self._csv_header()
+        if self.output_format == "ndjson":
+            output += json.dumps({"summary": self.stats}) + "\n"
+        return output
+
+    def _check_size(self, text: str) -> None:
+        if len(text) + sum(len(line) for line in self._record) > MAX_RECORD_CHARS:
+            raise CohortValidationError(f"Record {self.stats['rows'] + 1} is longer than {MAX_RECORD_CHARS} characters")
+
+    def _add_line(self, line: str) -> None:
+        if self.input_format == "ndjson":
+            if line.strip():
+                self._records.append(line)
+            return
+
+        # CSV: a record ends at a newline outside quotes ("" escapes keep the parity)
+        self._record.append(line)
+        if line.count('"') % 2:
+            self._quote_open = not self._quote_open
+        if self._quote_open:
+            self._check_size("")
+            return
+        record = "".join(self._record)
+        self._record = []
+        if self._header is None:
+            header = next(csv.reader([record]), [])
+            if header:
+                self._header = [name.strip() for name in header]
+            return
+        if record.strip():
+            self._records.append(record)
+
+    def _parse(self, records: List[str]) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+        parsed: List[Dict[str, Any]] = []
+        errors: Dict[int, List[str]] = {}
+        if self.input_format == "csv":
+            header = self._header or []
+            parsed = [dict(zip(header, values)) for values in csv.reader(records)]
+            return parsed, errors
+
+        for i, record in enumerate(records):
+            try:
+                value = json.loads(record)
+            except ValueError as e:
+                value, message = None, f"Invalid JSON: {str(e)}"
+            else:
+                message = None if isinstance(value, dict) else "Each line must be a JSON object"
+            if message:
+                errors[i] = [message]
+                parsed.append({})
+            else:
+                parsed.append(value)
+        return parsed, errors
+
+    def _flush(self) -> str:
+        records, self._records = self._records, []
+        parsed, parse_errors = self._parse(records)
+        first_row = self.stats["rows"] + 1
+
+        chunk = validate_records(parsed)
+        for i, messages in parse_errors.items():
+            chunk.errors[i] = messages
+
+        scores: Dict[str, List[Any]] = {}
+        if any(chunk.valid):
+            scores = to_columns(score_cohort(chunk.columns))
+            scores["bmi"] = [_json_value(value) for value in scores["bmi"]]
+
+        self.stats["rows"] += len(parsed)
+        self.stats["chunks"] += 1
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n") if self.output_format == "csv" else None
+        if writer and not self._header_written:
+            output.write(self._csv_header())
+
+        scored = 0
+        for i, record in enumerate(parsed):
+            row = first_row + i
+            row_id = record.get("id")
+            row_id = None if _missing(row_id) else str(row_id)
+            if chunk.valid[i]:
+                values = [scores[name][scored] for name in OUTPUT_COLUMNS]
+                scored += 1
+                if writer:
+                    writer.writerow([row, row_id or "", *["" if v is None else v for v in values], ""])
+                else:
+                    output.write(json.dumps({"row": row, "id": row_id, **dict(zip(OUTPUT_COLUMNS, values))}) + "\n")
+            else:
+                messages = chunk.errors.get(i, [])
+                if writer:
+                    writer.writerow([row, row_id or "", *[""] * len(OUTPUT_COLUMNS), "; ".join(messages)])
+                else:
+                    output.write(json.dumps({"row": row, "id": row_id, "errors": messages}) + "\n")
+
+        self.stats["scored"] += scored
+        self.stats["invalid"] += len(parsed) - scored
+        return output.getvalue()
+
+    def _csv_header(self) -> str:
+        self._header_written = True
+        return ",".join(["row", "id", *OUTPUT_COLUMNS, "errors"]) + "\n"
+
+
+def ingest_file(source, sink, input_format: str, output_format: str, chunk_rows: Optional[int] = None, read_size: int = 1 << 20) -> dict:
+    """Stream a binary file object through a CohortIngestor into a text sink; returns the stats"""
+    ingestor = CohortIngestor(input_format, output_format, chunk_rows)
+    while True:
+        data = source.read(read_size)
+        if not data:
+            break
+        sink.write(ingestor.feed(data))
+    sink.write(ingestor.finish())
+    return ingestor.stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Score a CSV/NDJSON cohort with bounded memory")
+    parser.add_argument("input", help="CSV or NDJSON file, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output file, - for stdout (default)")
+    parser.add_argument("--input-format", choices=INPUT_FORMATS, help="Default: from the file extension, else csv")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="ndjson", help="Output format")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="Rows scored per chunk")
+    args = parser.parse_args()
+
+    input_format = args.input_format or (
+        "ndjson" if args.input.lower().endswith((".ndjson", ".jsonl")) else "csv"
+    )
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        stats = ingest_file(source, sink, input_format, args.format, args.chunk_rows)
+    except CohortValidationError as e:
+        print(f"Ingest failed: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    print(
+        f"{stats['rows']} rows: {stats['scored']} scored, {stats['invalid']} invalid ({stats['chunks']} chunks)",
+        file=sys.stderr
+    )
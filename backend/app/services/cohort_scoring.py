@@ -0,0 +1,230 @@
+"""
+Cohort Scoring - Vectorized health-risk scores for many people at once
+
+Scores the same deterministic measures as /calculate-health-risks (BMI,
+FINDRISC, Framingham, overall health score) for columnar input: one array
+per HealthData field. The breakpoint tables from risk_guidelines are
+looked up a whole column at a time with np.searchsorted, so a cohort of
+tens of thousands of rows is scored in a few milliseconds.
+
+Results match the scalar functions in app/api/health_risk.py exactly,
+including their quirks (FINDRISC gives age 54 three points, a 0 waist or
+cholesterol value counts as missing, the overall score uses BMI rounded
+to one decimal). No LLM is involved.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+import numpy as np
+from app.services.risk_guidelines import GUIDELINES, Guidelines
+
+# Columns of HealthData: (dtype, default when the column or value is missing)
+COLUMNS = {
+    "age": ("int", None),
+    "gender": ("str", None),
+    "height_cm": ("float", None),
+    "weight_kg": ("float", None),
+    "waist_cm": ("float", None),
+    "hip_cm": ("float", None),
+    "family_diabetes": ("bool", False),
+    "physical_activity": ("str", "moderate"),
+    "daily_vegetables": ("bool", True),
+    "blood_pressure_medication": ("bool", False),
+    "high_blood_glucose_history": ("bool", False),
+    "total_cholesterol": ("float", None),
+    "hdl_cholesterol": ("float", None),
+    "systolic_bp": ("float", None),
+    "currently_smoking": ("bool", False),
+    "has_diabetes": ("bool", False),
+    "on_bp_medication": ("bool", False)
+}
+REQUIRED_COLUMNS = ("age", "gender", "height_cm", "weight_kg")
+
+class CohortValidationError(ValueError):
+    """Columnar input is missing columns or has mismatched lengths"""
+
+
+def prepare_columns(columns: Mapping[str, Optional[Sequence[Any]]]) -> Dict[str, np.ndarray]:
+    """Arrays for every HealthData field, with HealthData's defaults filled in
+
+    Missing numbers become NaN. Values must already have HealthData's
+    types (validate with pydantic first).
+
+    Raises:
+        CohortValidationError: A required column is missing or lengths differ
+    """
+    missing = [name for name in REQUIRED_COLUMNS if columns.get(name) is None]
+    if missing:
+        raise CohortValidationError(f"Missing required columns: {', '.join(missing)}")
+    rows = len(columns["age"])
+
+    arrays: Dict[str, np.ndarray] = {}
+    for name, (kind, default) in COLUMNS.items():
+        values = columns.get(name)
+        if values is None:
+            values = [default] * rows
+        elif len(values) != rows:
+            raise CohortValidationError(f"Column {name} has {len(values)} values, expected {rows}")
+
+        if kind == "str":
+            arrays[name] = np.array([default if v is None else v for v in values], dtype=object)
+        elif kind == "bool":
+            arrays[name] = np.array([default if v is None else v for v in values], dtype=bool)
+        elif kind == "int":
+            arrays[name] = np.array(values, dtype=np.int64)
+        else:
+            arrays[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return arrays
+
+
+def _present(values: np.ndarray) -> np.ndarray:
+    """Python truthiness of an optional number: not None (NaN) and not 0"""
+    return ~np.isnan(values) & (values != 0)
+
+
+def round_like_python(values: np.ndarray, digits: int) -> np.ndarray:
+    """round(value, digits) for every element, bit-for-bit
+
+    np.round scales by 10**digits first, which can flip a value sitting on
+    a rounding half; those few elements are re-rounded with Python's round.
+    """
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(value, digits) for value in values[near_half].tolist()]
+    return rounded
+
+
+def score_bmi(height_cm: np.ndarray, weight_kg: np.ndarray, guidelines: Guidelines = GUIDELINES) -> Dict[str, np.ndarray]:
+    height_m = height_cm / 100
+    bmi = weight_kg / (height_m * height_m)
+    return {
+        "bmi_raw": bmi,
+        "bmi": round_like_python(bmi, 1),
+        "bmi_category": guidelines.bmi.lookup_array(bmi, "category")
+    }
+
+
+def score_findrisc(arrays: Dict[str, np.ndarray], bmi: np.ndarray, guidelines: Guidelines = GUIDELINES) -> Dict[str, np.ndarray]:
+    g = guidelines
+    score = g.findrisc_age.lookup_array(arrays["age"])
+    score = score + g.findrisc_bmi.lookup_array(bmi)
+
+    waist = arrays["waist_cm"]
+    waist_points = np.where(
+        arrays["gender"] == "male",
+        g.findrisc_waist["male"].lookup_array(waist),
+        g.findrisc_waist["female"].lookup_array(waist)
+    )
+    score = score + np.where(_present(waist), waist_points, 0)
+
+    score = score + g.findrisc_activity_array(arrays["physical_activity"])
+    score = score + np.where(arrays["daily_vegetables"], 0, g.findrisc_no_vegetables)
+    score = score + np.where(arrays["blood_pressure_medication"], g.findrisc_bp_medication, 0)
+    score = score + np.where(arrays["high_blood_glucose_history"], g.findrisc_glucose_history, 0)
+    score = score + np.where(arrays["family_diabetes"], g.findrisc_family, 0)
+
+    return {
+        "findrisc_score": score,
+        "findrisc_percentage": g.findrisc_risk.lookup_array(score, "percentage"),
+        "findrisc_level": g.findrisc_risk.lookup_array(score, "level")
+    }
+
+
+def _framingham_points(arrays: Dict[str, np.ndarray], sex: str, guidelines: Guidelines) -> np.ndarray:
+    tables = guidelines.framingham[sex]
+    points = tables.age.lookup_array(arrays["age"])
+    points = points + tables.total_cholesterol.lookup_array(arrays["total_cholesterol"])
+    points = points + tables.hdl_cholesterol.lookup_array(arrays["hdl_cholesterol"])
+    points = points + np.where(
+        arrays["on_bp_medication"],
+        tables.bp_treated.lookup_array(arrays["systolic_bp"]),
+        tables.bp_untreated.lookup_array(arrays["systolic_bp"])
+    )
+    points = points + np.where(arrays["currently_smoking"], tables.smoking, 0)
+    points = points + np.where(arrays["has_diabetes"], tables.diabetes, 0)
+    return points
+
+
+def score_framingham(arrays: Dict[str, np.ndarray], guidelines: Guidelines = GUIDELINES) -> Dict[str, np.ndarray]:
+    """Framingham points/percentage; `framingham_valid` is False where the scalar returns None"""
+    valid = _present(arrays["total_cholesterol"]) & _present(arrays["hdl_cholesterol"]) & _present(arrays["systolic_bp"])
+    male = arrays["gender"] == "male"
+
+    male_points = _framingham_points(arrays, "male", guidelines)
+    female_points = _framingham_points(arrays, "female", guidelines)
+    points = np.where(male, male_points, female_points)
+    percentage = np.where(
+        male,
+        guidelines.framingham["male"].risk_percentage.lookup_array(male_points),
+        guidelines.framingham["female"].risk_percentage.lookup_array(female_points)
+    )
+    return {
+        "framingham_valid": valid,
+        "framingham_points": points,
+        "framingham_percentage": percentage,
+        "framingham_level": guidelines.framingham_level.lookup_array(percentage)
+    }
+
+
+def overall_health_score(
+    arrays: Dict[str, np.ndarray],
+    bmi: np.ndarray,
+    findrisc_score: np.ndarray,
+    framingham_percentage: np.ndarray,
+    framingham_valid: np.ndarray
+) -> np.ndarray:
+    """Same deductions as /calculate-health-risks (bmi is the rounded value)"""
+    score = np.full(len(bmi), 100)
+    score -= np.select([bmi >= 30, bmi >= 25], [15, 10], 0)
+    score -= np.select([findrisc_score >= 15, findrisc_score >= 12, findrisc_score >= 7], [20, 15, 10], 0)
+    score -= np.where(framingham_valid, np.select([framingham_percentage >= 20, framingham_percentage >= 10], [25, 15], 0), 0)
+    score -= np.where(arrays["currently_smoking"], 20, 0)
+    score -= np.where(arrays["physical_activity"] == "low", 10, 0)
+    return np.maximum(score, 0)
+
+
+def score_cohort(
+    columns: Mapping[str, Optional[Sequence[Any]]],
+    guidelines: Guidelines = GUIDELINES
+) -> Dict[str, np.ndarray]:
+    """Score every row of columnar HealthData (optionally with other guideline tables)
+
+    Returns:
+        Arrays: bmi, bmi_category, findrisc_score, findrisc_percentage,
+        findrisc_level, framingham_valid, framingham_points,
+        framingham_percentage, framingham_level, overall_health_score
+    """
+    arrays = prepare_columns(columns)
+    bmi = score_bmi(arrays["height_cm"], arrays["weight_kg"], guidelines)
+    findrisc = score_findrisc(arrays, bmi["bmi_raw"], guidelines)
+    framingham = score_framingham(arrays, guidelines)
+    overall = overall_health_score(
+        arrays, bmi["bmi"], findrisc["findrisc_score"],
+        framingham["framingham_percentage"], framingham["framingham_valid"]
+    )
+    return {
+        "bmi": bmi["bmi"],
+        "bmi_category": bmi["bmi_category"],
+        **findrisc,
+        **framingham,
+        "overall_health_score": overall
+    }
+
+
+OUTPUT_COLUMNS = (
+    "bmi", "bmi_category", "findrisc_score", "findrisc_percentage", "findrisc_level",
+    "framingham_points", "framingham_percentage", "framingham_level", "overall_health_score"
+)
+
+
+def to_columns(scores: Dict[str, np.ndarray]) -> Dict[str, List[Any]]:
+    """JSON-ready columns; Framingham values are None where it can't be calculated"""
+    valid = scores["framingham_valid"]
+    columns = {}
+    for name in OUTPUT_COLUMNS:
+        values = scores[name].tolist()
+        if name.startswith("framingham_"):
+            values = [value if ok else None for value, ok in zip(values, valid.tolist())]
+        columns[name] = values
+    return columns
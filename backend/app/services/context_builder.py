@@ -0,0 +1,123 @@
+"""
+Context Builder - Token-budgeted conversation history for the LLM
+
+Instead of a fixed number of past messages, history is added from newest
+to oldest until the provider's token budget is used up. Prompt size (and
+with it prefill latency and cost) stays bounded and predictable.
+
+Token counts are estimated (~4 characters per token, plus per-message
+overhead) and cached per message id, since stored messages never change.
+"""
+
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+import math
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Message
+
+# Role markers / separators added around each message by the providers
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Rows fetched per query while walking history backwards
+PAGE_SIZE = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate for a message (no tokenizer dependency)"""
+    return math.ceil(len(text) / 4) + MESSAGE_OVERHEAD_TOKENS
+
+
+class TokenCountCache:
+    """Bounded LRU of token counts per message id"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+
+    def count(self, message: Message) -> int:
+        tokens = self._counts.get(message.id)
+        if tokens is not None:
+            self._counts.move_to_end(message.id)
+            return tokens
+
+        tokens = estimate_tokens(message.content)
+        self._counts[message.id] = tokens
+        if len(self._counts) > self.max_size:
+            self._counts.popitem(last=False)
+        return tokens
+
+
+token_counts = TokenCountCache(settings.CONTEXT_TOKEN_CACHE_SIZE)
+
+
+def get_context_budget(provider: str) -> int:
+    """Prompt token budget for a provider (system prompt + history + new message)"""
+    budgets = {
+        "ollama": settings.CONTEXT_TOKEN_BUDGET_OLLAMA,
+        "gemini": settings.CONTEXT_TOKEN_BUDGET_GEMINI,
+        "openrouter": settings.CONTEXT_TOKEN_BUDGET_OPENROUTER,
+    }
+    return budgets.get(provider, settings.CONTEXT_TOKEN_BUDGET_OPENROUTER)
+
+
+def build_context(
+    db: Session,
+    conversation_id: str,
+    system_prompt: str,
+    current_message: str,
+    budget: int
+) -> Tuple[List[Dict[str, str]], int]:
+    """Build LLM messages from a conversation within a token budget
+
+    The newest stored message is the current user message (already saved)
+    and is skipped in the history walk.
+
+    Args:
+        db: Database session
+        conversation_id: Conversation to load history from
+        system_prompt: System prompt (always included)
+        current_message: The new user message (always included)
+        budget: Max prompt tokens
+
+    Returns:
+        (messages, tokens_used)
+    """
+    used = estimate_tokens(system_prompt) + estimate_tokens(current_message)
+    history: List[Message] = []
+
+    offset = 1  # skip the current message
+    full = False
+    while not full:
+        page = db.query(Message).filter(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at.desc()).offset(offset).limit(PAGE_SIZE).all()
+
+        if not page:
+            break
+
+        for msg in page:
+            tokens = token_counts.count(msg)
+            if used + tokens > budget or len(history) >= settings.CONTEXT_MAX_HISTORY_MESSAGES:
+                full = True
+                break
+            used += tokens
+            history.append(msg)
+
+        offset += len(page)
+
+    messages = [{"role": "system", "content": system_prompt}]
+
+    # History was collected newest first - add it in chronological order
+    for msg in reversed(history):
+        messages.append({
+            "role": msg.role,
+            "content": msg.content
+        })
+
+    messages.append({
+        "role": "user",
+        "content": current_message
+    })
+
+    return messages, used
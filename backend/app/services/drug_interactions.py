@@ -0,0 +1,120 @@
+"""
+Drug Interactions - Local index of known medication pairs
+
+app/data/drug_interactions.json is a curated, versioned dataset of
+interactions between common medications, plus per-drug food and alcohol
+warnings. It is loaded once into a dict keyed by the canonical drug ID
+pair (see drug_normalizer), so a lookup is a single hash probe.
+
+Known pairs (including pairs known to have no significant interaction)
+are answered from the index. Only pairs missing from the dataset are sent
+to the LLM.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+import json
+import logging
+import os
+from app.services.drug_normalizer import canonical_drug_id
+
+logger = logging.getLogger(__name__)
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "drug_interactions.json")
+
+# Ordered from least to most serious; "none" = known, no significant interaction
+SEVERITIES = ("none", "minor", "moderate", "major", "contraindicated")
+
+# Worst severity -> DrugCheckResponse.overall_risk
+OVERALL_RISK = {
+    "none": "safe",
+    "minor": "monitor",
+    "moderate": "caution",
+    "major": "dangerous",
+    "contraindicated": "dangerous"
+}
+
+# DrugCheckResponse.overall_risk, from least to most serious
+RISK_LEVELS = ("safe", "monitor", "caution", "dangerous")
+
+
+def pair_key(drug1: str, drug2: str) -> Tuple[str, str]:
+    """Order-independent key for two canonical drug IDs"""
+    return (drug1, drug2) if drug1 <= drug2 else (drug2, drug1)
+
+
+@dataclass(frozen=True)
+class KnownInteraction:
+    drug1: str
+    drug2: str
+    severity: str  # One of SEVERITIES
+    description: str
+    recommendation: str
+
+
+@dataclass(frozen=True)
+class DrugInfo:
+    food_warnings: Tuple[str, ...]
+    alcohol_warning: Optional[str]
+
+
+class InteractionIndex:
+    """In-memory index of the bundled interaction dataset"""
+
+    def __init__(self, data: dict):
+        self.version = data.get("version", "")
+        self._pairs: Dict[Tuple[str, str], KnownInteraction] = {}
+        self._drugs: Dict[str, DrugInfo] = {}
+
+        for name, info in data.get("drugs", {}).items():
+            self._drugs[canonical_drug_id(name)] = DrugInfo(
+                tuple(info.get("food_warnings", [])), info.get("alcohol_warning")
+            )
+
+        for entry in data.get("interactions", []):
+            drug1, drug2 = (canonical_drug_id(name) for name in entry["drugs"])
+            if entry["severity"] not in SEVERITIES:
+                raise ValueError(f"Unknown severity {entry['severity']!r} for {drug1} + {drug2}")
+            self._pairs[pair_key(drug1, drug2)] = KnownInteraction(
+                drug1, drug2, entry["severity"], entry["description"], entry["recommendation"]
+            )
+
+        logger.info(f"✅ Drug interaction index loaded: {len(self._pairs)} pairs, version {self.version}")
+
+    @classmethod
+    def from_file(cls, path: str = DATASET_PATH) -> "InteractionIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def lookup(self, drug1: str, drug2: str) -> Optional[KnownInteraction]:
+        """Known interaction for two canonical drug IDs, or None if the pair is unknown"""
+        return self._pairs.get(pair_key(drug1, drug2))
+
+    def drug_info(self, drug: str) -> Optional[DrugInfo]:
+        """Food/alcohol warnings for a canonical drug ID, or None if not in the dataset"""
+        return self._drugs.get(drug)
+
+
+def worst_severity(severities: List[str]) -> str:
+    """Most serious severity in the list ("none" if empty)"""
+    return max(severities, key=SEVERITIES.index, default="none")
+
+
+def worse_risk(risk1: str, risk2: str) -> str:
+    """The more serious of two overall_risk values (unrecognized values rank lowest)"""
+    rank = lambda risk: RISK_LEVELS.index(risk) if risk in RISK_LEVELS else -1
+    return risk1 if rank(risk1) >= rank(risk2) else risk2
+
+
+_index: Optional[InteractionIndex] = None
+
+
+def get_interaction_index() -> InteractionIndex:
+    """Shared index, loaded from drug_interactions.json on first use (at startup)"""
+    global _index
+    if _index is None:
+        _index = InteractionIndex.from_file()
+    return _index
@@ -0,0 +1,201 @@
+"""
+Drug Normalizer - Free-text medication names to canonical drug IDs
+
+"Tylenol", "acetaminophen 500mg" and "Acetaminophen (Tylenol)" all mean
+the same drug. The normalizer maps them to one canonical ID (the lowercase
+generic name, e.g. "acetaminophen"). The interaction index and the
+interaction cache keys use those IDs, so equivalent medication lists
+share results.
+
+Terms (generic names plus the synonym table in app/data/drug_synonyms.json)
+are compiled into a trie. Only whole names are matched (after dropping the
+dose and dosage form words like "tablets"):
+1. Exact term
+2. A single typo over the trie ("sertaline" -> sertraline); ties between
+   different drugs are rejected rather than guessed
+Words inside a longer name are never matched on their own, so combination
+and different products ("Losartan HCTZ", "Advil PM", "Aspirin-free
+Excedrin") stay unknown instead of being mistaken for one of their words.
+Names in parentheses must agree with the main name. Results are memoized.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "drug_synonyms.json")
+
+MIN_FUZZY_LENGTH = 5  # Shorter names are too close to each other to correct typos
+CACHE_SIZE = 4096
+
+# Dosage form words that don't change which drug it is ("metformin er tablets" -> "metformin er")
+FORM_WORDS = frozenset({"tablet", "tablets", "tab", "tabs", "capsule", "capsules", "cap", "caps", "oral", "pill", "pills"})
+
+_PARENTHESES = re.compile(r"\((.*?)\)")
+_DOSAGE = re.compile(r"\b\d[\d.,]*\s*(?:mg|mcg|g|ml|units?|iu|%)?\b")
+_NON_ALPHA = re.compile(r"[^a-z]+")
+
+
+def clean_drug_name(name: str) -> str:
+    """Lowercase letters-only text without dosage ("Metformin 500mg" -> "metformin")"""
+    name = _DOSAGE.sub(" ", name.lower())
+    return _NON_ALPHA.sub(" ", name).strip()
+
+
+def strip_form_words(term: str) -> str:
+    """Drop dosage form words, keeping the term if nothing else is left"""
+    words = [word for word in term.split() if word not in FORM_WORDS]
+    return " ".join(words) if words else term
+
+
+def max_distance(term: str) -> int:
+    """Edit distance allowed for a term of this length
+
+    One typo at most: two edits already turn real drugs into each other
+    ("fosinopril" / "lisinopril", "citalopram" / "escitalopram").
+    """
+    return 1 if len(term) >= MIN_FUZZY_LENGTH else 0
+
+
+@dataclass(frozen=True)
+class DrugMatch:
+    canonical_id: str  # Generic name, or the cleaned input when unknown
+    method: str  # "exact", "fuzzy" or "unknown"
+    distance: int = 0
+
+    @property
+    def known(self) -> bool:
+        return self.method != "unknown"
+
+    @property
+    def exact(self) -> bool:
+        return self.method == "exact"
+
+
+class _TrieNode:
+    __slots__ = ("children", "drug_id")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.drug_id: Optional[str] = None  # Set on nodes that end a term
+
+
+class DrugNormalizer:
+    """Trie of generic names and synonyms with exact and fuzzy whole-name lookup"""
+
+    def __init__(self, synonyms: Dict[str, List[str]], version: str = ""):
+        self.version = version
+        self._root = _TrieNode()
+        self._terms: Dict[str, str] = {}
+
+        for generic, names in synonyms.items():
+            drug_id = clean_drug_name(generic)
+            for term in [generic, *names]:
+                self._add(clean_drug_name(term), drug_id)
+
+        self.normalize = lru_cache(maxsize=CACHE_SIZE)(self._normalize)
+        logger.info(f"✅ Drug normalizer compiled: {len(self._terms)} terms, version {self.version}")
+
+    @classmethod
+    def from_file(cls, path: str = SYNONYMS_PATH) -> "DrugNormalizer":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["synonyms"], data.get("version", ""))
+
+    def canonical_id(self, name: str) -> str:
+        """Canonical ID for a free-text name (the cleaned name itself when unknown)"""
+        return self.normalize(name).canonical_id
+
+    def _normalize(self, name: str) -> DrugMatch:
+        # "Ibuprofen (Advil, Motrin)" - the main name, then what's in parentheses
+        main = clean_drug_name(_PARENTHESES.sub(" ", name))
+        inner = [
+            clean_drug_name(part) for group in _PARENTHESES.findall(name) for part in group.split(",")
+        ]
+        candidates = [strip_form_words(candidate) for candidate in [main, *inner] if candidate]
+        if not candidates:
+            return DrugMatch("", "unknown")
+
+        unknown = DrugMatch(candidates[0], "unknown")
+        matches = [self._exact(candidate) or self._fuzzy(candidate) for candidate in candidates]
+        first = matches[0]
+        if first is None:
+            return unknown
+        # "Excedrin (aspirin, acetaminophen)" - names that disagree are a combination product
+        if any(match and match.canonical_id != first.canonical_id for match in matches[1:]):
+            return unknown
+        return first
+
+    def _add(self, term: str, drug_id: str) -> None:
+        if not term:
+            return
+        existing = self._terms.get(term)
+        if existing and existing != drug_id:
+            raise ValueError(f"Drug term {term!r} maps to both {existing} and {drug_id}")
+        self._terms[term] = drug_id
+
+        node = self._root
+        for char in term:
+            node = node.children.setdefault(char, _TrieNode())
+        node.drug_id = drug_id
+
+    def _exact(self, term: str) -> Optional[DrugMatch]:
+        drug_id = self._terms.get(term)
+        return DrugMatch(drug_id, "exact") if drug_id else None
+
+    def _fuzzy(self, term: str) -> Optional[DrugMatch]:
+        """Closest term within max_distance (Levenshtein rows carried down the trie)"""
+        limit = max_distance(term)
+        if not limit:
+            return None
+
+        best: Dict[str, int] = {}  # drug_id -> smallest distance
+        first_row = list(range(len(term) + 1))
+        stack: List[Tuple[_TrieNode, str, List[int]]] = [
+            (child, char, first_row) for char, child in self._root.children.items()
+        ]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for i in range(1, len(term) + 1):
+                row.append(min(
+                    row[i - 1] + 1,
+                    previous[i] + 1,
+                    previous[i - 1] + (term[i - 1] != char)
+                ))
+
+            if node.drug_id and row[-1] <= limit:
+                best[node.drug_id] = min(row[-1], best.get(node.drug_id, limit))
+            # No completion can get back under the limit once the whole row is over it
+            if min(row) <= limit:
+                stack.extend((child, next_char, row) for next_char, child in node.children.items())
+
+        if not best:
+            return None
+        distance = min(best.values())
+        closest = [drug_id for drug_id, value in best.items() if value == distance]
+        if len(closest) > 1:
+            return None
+        return DrugMatch(closest[0], "fuzzy", distance)
+
+
+_normalizer: Optional[DrugNormalizer] = None
+
+
+def get_drug_normalizer() -> DrugNormalizer:
+    """Shared normalizer, compiled from drug_synonyms.json on first use (at startup)"""
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = DrugNormalizer.from_file()
+    return _normalizer
+
+
+def canonical_drug_id(name: str) -> str:
+    """Canonical ID for a free-text medication name (memoized)"""
+    return get_drug_normalizer().canonical_id(name)
@@ -0,0 +1,161 @@
+"""
+Emergency Detector - Multi-pattern emergency screening (Aho-Corasick)
+
+Every emergency phrase from app/data/emergency_flags.json (canonical
+symptom, synonyms and common misspellings) is compiled once into an
+Aho-Corasick automaton. A scan is a single pass over the text, no matter
+how many phrases there are, so every chat message and symptom form can
+be screened inline.
+
+Text and phrases are normalized the same way: lowercase, accents and
+apostrophes removed ("can't" -> "cant"), anything else that is not a
+letter or digit becomes a single space. Phrases only match whole words;
+the last word also matches its plural ("heart attacks", "strokes",
+"severe head injuries").
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+from dataclasses import dataclass
+import json
+import logging
+import os
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+FLAGS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "emergency_flags.json")
+
+_APOSTROPHES = re.compile(r"['’‘`]")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def plurals(word: str) -> List[str]:
+    """English plural forms of a word ("injury" -> "injuries", "paralysis" -> "paralyses")"""
+    if not word.isalpha() or len(word) < 3:
+        return []
+    if word.endswith("is"):
+        return [word[:-2] + "es"]
+    if word.endswith(("s", "x", "z", "ch", "sh")):
+        return [word + "es"]
+    if word.endswith("y") and word[-2] not in "aeiou":
+        return [word[:-1] + "ies"]
+    return [word + "s"]
+
+
+def inflections(phrase: str) -> List[str]:
+    """Normalized phrase plus its variants with the last word pluralized"""
+    head, _, last = phrase.strip().rpartition(" ")
+    variants = [f"{head} {plural}" if head else plural for plural in plurals(last)]
+    return [phrase, *(f" {variant} " for variant in variants)]
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents/apostrophes, collapse separators, pad with spaces"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    text = _APOSTROPHES.sub("", text)
+    return f" {_NON_ALNUM.sub(' ', text).strip()} "
+
+
+@dataclass(frozen=True)
+class EmergencyFlag:
+    symptom: str
+    guideline: str
+
+
+@dataclass(frozen=True)
+class EmergencyMatch:
+    flag: EmergencyFlag
+    phrase: str  # Normalized phrase that matched
+
+
+class EmergencyDetector:
+    """Aho-Corasick automaton over all emergency phrases"""
+
+    def __init__(self, flags: Iterable[dict], version: str = ""):
+        self.version = version
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, EmergencyFlag]]] = [[]]
+
+        phrases = 0
+        seen = set()
+        for entry in flags:
+            flag = EmergencyFlag(entry["symptom"], entry.get("guideline", ""))
+            for phrase in [entry["symptom"], *entry.get("synonyms", []), *entry.get("misspellings", [])]:
+                normalized = normalize(phrase)
+                if normalized.strip():
+                    for variant in inflections(normalized):
+                        if variant not in seen:
+                            seen.add(variant)
+                            self._add(variant, flag)
+                    phrases += 1
+
+        self._build_failure_links()
+        self.phrase_count = phrases
+        logger.info(f"✅ Emergency detector compiled: {phrases} phrases, {len(self._goto)} states")
+
+    @classmethod
+    def from_file(cls, path: str = FLAGS_PATH) -> "EmergencyDetector":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["emergency_detection_data"]["critical_symptoms"], data.get("version", ""))
+
+    def scan(self, text: str) -> List[EmergencyMatch]:
+        """All emergency phrases in the text (one match per flag)"""
+        matches: Dict[str, EmergencyMatch] = {}
+        state = 0
+        for char in normalize(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for phrase, flag in self._output[state]:
+                matches.setdefault(flag.symptom, EmergencyMatch(flag, phrase.strip()))
+        return list(matches.values())
+
+    def detect(self, texts: Iterable[Optional[str]]) -> List[EmergencyMatch]:
+        """Scan several texts (e.g. symptom names and conditions), one match per flag"""
+        matches: Dict[str, EmergencyMatch] = {}
+        for text in texts:
+            if text:
+                for match in self.scan(text):
+                    matches.setdefault(match.flag.symptom, match)
+        return list(matches.values())
+
+    def _add(self, phrase: str, flag: EmergencyFlag) -> None:
+        state = 0
+        for char in phrase:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append((phrase, flag))
+
+    def _build_failure_links(self) -> None:
+        # Breadth-first: a state's failure link is the longest proper suffix
+        # that is also a prefix of some phrase (depth-1 states fail to the root)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+
+_detector: Optional[EmergencyDetector] = None
+
+
+def get_emergency_detector() -> EmergencyDetector:
+    """Shared detector, compiled from emergency_flags.json on first use (at startup)"""
+    global _detector
+    if _detector is None:
+        _detector = EmergencyDetector.from_file()
+    return _detector
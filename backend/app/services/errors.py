@@ -0,0 +1,45 @@
+"""
+LLM Errors - Conditions that are not provider failures
+
+These mean "no capacity right now" rather than "the provider is broken".
+They do not count against provider health, and the API maps them to a
+fast 503/429 response with a Retry-After header (see main.py).
+"""
+
+
+class LLMUnavailableError(Exception):
+    """No provider can take the request right now"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+class ProviderOverloaded(LLMUnavailableError):
+    """A provider's wait queue is full or the queue-time deadline passed"""
+
+    def __init__(self, provider: str, reason: str, retry_after: int = 5):
+        super().__init__(f"{provider} overloaded: {reason}", retry_after)
+        self.provider = provider
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """Every provider is at capacity"""
+
+
+class ProviderRateLimited(LLMUnavailableError):
+    """A provider's rate limit or daily quota is used up, or it answered 429"""
+
+    status_code = 429
+
+    def __init__(self, provider: str, reason: str, retry_after: float = 60):
+        super().__init__(f"{provider} rate limited: {reason}", int(retry_after + 0.999))
+        self.provider = provider
+
+
+class LLMRateLimitedError(LLMUnavailableError):
+    """Every provider is rate limited or out of quota"""
+
+    status_code = 429
@@ -3,9 +3,15 @@ Google Gemini Client - Free tier LLM integration
 
 Free tier: 1,500 requests per day
 Get API key: https://makersuite.google.com/app/apikey
+
+Uses the SDK's native async API, so a slow Gemini call never blocks the
+event loop. Calls are cancelled after GEMINI_TIMEOUT seconds, and streams
+when no chunk arrives for that long. In-flight calls are capped by
+LLMService admission control (GEMINI_MAX_CONCURRENCY, GEMINI_MAX_QUEUE).
 """
 
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator
+import asyncio
 import logging
 import google.generativeai as genai
 from app.core.config import settings
@@ -19,6 +25,7 @@ class GeminiClient:
     def __init__(self):
         genai.configure(api_key=settings.GEMINI_API_KEY)
         self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        self.timeout = settings.GEMINI_TIMEOUT
         
     async def generate(
         self,
@@ -46,20 +53,82 @@ class GeminiClient:
                 max_output_tokens=max_tokens,
             )
             
-            # Generate response
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
+            # Generate response without blocking the event loop. Cancelling
+            # the awaiting task (or hitting the timeout) cancels the RPC.
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config
+                ),
+                timeout=self.timeout
             )
             
             return response.text
             
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini timed out after {self.timeout}s")
+            raise Exception(f"Gemini timed out after {self.timeout}s")
         except Exception as e:
             logger.error(f"Gemini error: {str(e)}")
             if "API_KEY" in str(e):
                 raise Exception("Invalid Gemini API key. Get one at: https://makersuite.google.com/app/apikey")
             raise
     
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1500
+    ) -> AsyncIterator[str]:
+        """Stream response chunks from Gemini
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Creativity (0.0-1.0)
+            max_tokens: Max response length
+            
+        Yields:
+            Text chunks of the response
+            
+        Raises:
+            Exception: No response, or no next chunk, within GEMINI_TIMEOUT
+        """
+        prompt = self._format_messages(messages)
+        
+        generation_config = genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+        )
+        
+        try:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    stream=True
+                ),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini timed out after {self.timeout}s")
+            raise Exception(f"Gemini timed out after {self.timeout}s")
+        
+        # The timeout applies to every chunk, so a stalled stream gives up
+        # its admission slot instead of holding it forever
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                logger.error(f"Gemini stream stalled for {self.timeout}s")
+                raise Exception(f"Gemini stream stalled: no chunk for {self.timeout}s")
+            
+            # Chunks without parts (e.g. safety metadata only) carry no text
+            if chunk.parts:
+                yield chunk.text
+    
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """Convert OpenAI-style messages to Gemini prompt"""
         prompt_parts = []
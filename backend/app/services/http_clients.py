@@ -0,0 +1,84 @@
+"""
+Shared HTTP Clients - One pooled httpx.AsyncClient per LLM provider
+
+Clients are created at application startup and closed at shutdown
+(see the lifespan handler in main.py). Every request reuses the pool's
+keep-alive connections instead of paying a new TCP/TLS handshake.
+"""
+
+from typing import Dict
+import logging
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("ollama", "openrouter")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client(provider: str) -> httpx.AsyncClient:
+    """Create the pooled client for a provider from current settings"""
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+
+    if provider == "ollama":
+        # Local plain-HTTP server - HTTP/2 would not be negotiated anyway
+        return httpx.AsyncClient(
+            base_url=settings.OLLAMA_BASE_URL,
+            timeout=settings.OLLAMA_TIMEOUT,
+            limits=limits
+        )
+    elif provider == "openrouter":
+        return httpx.AsyncClient(
+            base_url=settings.OPENROUTER_BASE_URL,
+            timeout=settings.OPENROUTER_TIMEOUT,
+            limits=limits,
+            http2=settings.HTTP2_ENABLED and _http2_available(),
+            headers={
+                "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+                "Content-Type": "application/json"
+            }
+        )
+
+    raise ValueError(f"Unknown HTTP provider: {provider}")
+
+
+async def init_http_clients() -> None:
+    """Create the shared clients (called once at startup)"""
+    for provider in PROVIDERS:
+        if provider not in _clients or _clients[provider].is_closed:
+            _clients[provider] = _build_client(provider)
+    logger.info(f"✅ HTTP connection pools ready: {', '.join(PROVIDERS)}")
+
+
+async def close_http_clients() -> None:
+    """Close the shared clients and release pooled connections (called at shutdown)"""
+    for provider, client in list(_clients.items()):
+        await client.aclose()
+        del _clients[provider]
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """Get the shared client for a provider
+
+    Builds it on first use if the app lifespan has not run (e.g. scripts).
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _build_client(provider)
+        _clients[provider] = client
+    return client
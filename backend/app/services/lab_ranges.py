@@ -0,0 +1,248 @@
+"""
+Lab Reference Ranges - Deterministic classification of lab values
+
+app/data/lab_reference_ranges.json lists, per test, reference ranges
+(optionally sex- and age-specific) and critical thresholds. At load time
+each range is compiled into sorted threshold tuples, so classifying a
+value is two bisects:
+
+    critical | low | normal | high | critical
+       critical_low  low   high  critical_high
+
+A value is low/high when strictly outside [low, high] and critical when
+strictly beyond a critical threshold. Values reported as a bound ("<70",
+">500") get a status only when every value the bound allows has the same
+one. Tests, units or values the table doesn't cover return None and are
+left to the LLM.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+import json
+import logging
+import math
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+RANGES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "lab_reference_ranges.json")
+
+NORMAL = "normal"
+LOW = "low"
+HIGH = "high"
+CRITICAL = "critical"
+
+# Status per band: below critical_low, below low, within range, above high, above critical_high
+_BANDS = (CRITICAL, LOW, NORMAL, HIGH, CRITICAL)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_test_name(name: str) -> str:
+    """"Glucose (Fasting)" -> "glucose fasting" """
+    return _NON_ALNUM.sub(" ", name.lower()).strip()
+
+
+def normalize_unit(unit: str) -> str:
+    """Case/spacing-insensitive unit ("mg/dl", "μg/dL" == "ug/dl")"""
+    return unit.lower().replace("μ", "u").replace("µ", "u").replace(" ", "")
+
+
+def normalize_sex(gender: Optional[str]) -> Optional[str]:
+    """"male", "female" or None from free-text gender"""
+    if not gender:
+        return None
+    gender = gender.strip().lower()
+    if gender in ("f", "female", "woman", "girl"):
+        return "female"
+    if gender in ("m", "male", "man", "boy"):
+        return "male"
+    return None
+
+
+def _format_number(value: float) -> str:
+    return f"{value:,g}" if abs(value) >= 10000 else f"{value:g}"
+
+
+@dataclass(frozen=True)
+class ReferenceRange:
+    low: float  # -inf when there is no lower limit
+    high: float  # inf when there is no upper limit
+    sex: Optional[str] = None
+    age_min: Optional[int] = None
+    age_max: Optional[int] = None
+
+    def applies(self, age: Optional[int], sex: Optional[str]) -> bool:
+        if self.sex and sex and self.sex != sex:
+            return False
+        if age is None:
+            # Without an age, use the adult ranges
+            return self.age_max is None
+        return (self.age_min is None or age >= self.age_min) and (self.age_max is None or age <= self.age_max)
+
+
+@dataclass(frozen=True)
+class LabTest:
+    id: str
+    name: str
+    unit: str
+    ranges: Tuple[ReferenceRange, ...]
+    critical_low: float  # -inf when not defined
+    critical_high: float  # inf when not defined
+
+    def bounds(self) -> Tuple[float, float]:
+        """Lowest low and highest high over all ranges (any age or sex)"""
+        return min(r.low for r in self.ranges), max(r.high for r in self.ranges)
+
+    def reference_range(self, age: Optional[int], sex: Optional[str]) -> Optional[ReferenceRange]:
+        """The range for this patient; without a known sex, the widest matching range"""
+        matching = [r for r in self.ranges if r.applies(age, sex)]
+        if not matching:
+            return None
+        if len(matching) == 1:
+            return matching[0]
+        return ReferenceRange(min(r.low for r in matching), max(r.high for r in matching))
+
+
+@dataclass(frozen=True)
+class LabClassification:
+    test_id: str
+    test_name: str  # As entered
+    value: float
+    unit: str
+    status: str  # NORMAL, LOW, HIGH or CRITICAL
+    reference_range: str
+    critical: bool
+
+
+class ReferenceRangeEngine:
+    """Lookup table of lab tests (by name and alias) with compiled ranges"""
+
+    def __init__(self, data: dict):
+        self.version = data.get("version", "")
+        self._tests: Dict[str, LabTest] = {}
+        self._names: Dict[str, str] = {}
+
+        for test_id, entry in data["tests"].items():
+            test = LabTest(
+                id=test_id,
+                name=entry["name"],
+                unit=entry["unit"],
+                ranges=tuple(
+                    ReferenceRange(
+                        low=-math.inf if r.get("low") is None else r["low"],
+                        high=math.inf if r.get("high") is None else r["high"],
+                        sex=r.get("sex"),
+                        age_min=r.get("age_min"),
+                        age_max=r.get("age_max")
+                    )
+                    for r in entry["ranges"]
+                ),
+                critical_low=-math.inf if entry.get("critical_low") is None else entry["critical_low"],
+                critical_high=math.inf if entry.get("critical_high") is None else entry["critical_high"]
+            )
+            self._tests[test_id] = test
+            for name in [test_id, entry["name"], *entry.get("aliases", [])]:
+                self._names.setdefault(normalize_test_name(name), test_id)
+
+        logger.info(f"✅ Lab reference ranges loaded: {len(self._tests)} tests, version {self.version}")
+
+    @classmethod
+    def from_file(cls, path: str = RANGES_PATH) -> "ReferenceRangeEngine":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def resolve_test(self, test_name: str) -> Optional[LabTest]:
+        """Test for a name or alias, or None if not in the table"""
+        test_id = self._names.get(normalize_test_name(test_name))
+        return self._tests[test_id] if test_id else None
+
+    def classify(
+        self,
+        test_name: str,
+        value: float,
+        unit: Optional[str] = None,
+        age: Optional[int] = None,
+        sex: Optional[str] = None,
+        qualifier: Optional[str] = None
+    ) -> Optional[LabClassification]:
+        """Classify one value, or None if the test/unit isn't covered
+
+        qualifier ("<", ">", "≤", "≥") means the value is a bound; the status
+        is only given when it is the same for every value within the bound.
+        """
+        test = self.resolve_test(test_name)
+        if test is None or (unit and normalize_unit(unit) != normalize_unit(test.unit)):
+            return None
+        reference = test.reference_range(age, sex)
+        if reference is None:
+            return None
+
+        if qualifier in ("<", "≤"):
+            lowest = self._band(test, reference, -math.inf)
+            highest = self._band(test, reference, value if qualifier == "≤" else math.nextafter(value, -math.inf))
+        elif qualifier in (">", "≥"):
+            lowest = self._band(test, reference, value if qualifier == "≥" else math.nextafter(value, math.inf))
+            highest = self._band(test, reference, math.inf)
+        else:
+            lowest = highest = self._band(test, reference, value)
+        if lowest != highest:
+            # "<70" glucose could be low or critical - left to the LLM
+            return None
+        status = _BANDS[lowest]
+
+        return LabClassification(
+            test_id=test.id,
+            test_name=test_name,
+            value=value,
+            unit=test.unit,
+            status=status,
+            reference_range=self.describe(test, reference),
+            critical=status == CRITICAL
+        )
+
+    def classify_panel(
+        self,
+        values: Iterable[Tuple[str, Optional[float], Optional[str], Optional[str]]],
+        age: Optional[int] = None,
+        sex: Optional[str] = None
+    ) -> List[Optional[LabClassification]]:
+        """Classify (test_name, value, unit, qualifier) rows; None where not covered or the value is missing"""
+        return [
+            self.classify(test_name, value, unit, age, sex, qualifier) if value is not None else None
+            for test_name, value, unit, qualifier in values
+        ]
+
+    @staticmethod
+    def _band(test: LabTest, reference: ReferenceRange, value: float) -> int:
+        """Index into _BANDS for a value"""
+        # Lower thresholds exclude the threshold itself, upper ones include it:
+        # low = value < low, high = value > high
+        lower = bisect_right((test.critical_low, reference.low), value)
+        if lower < 2:
+            return lower
+        return 2 + bisect_left((reference.high, test.critical_high), value)
+
+    @staticmethod
+    def describe(test: LabTest, reference: ReferenceRange) -> str:
+        """Human-readable range, e.g. "70-100 mg/dL" or "≤199 mg/dL" """
+        if math.isinf(reference.low):
+            text = f"≤{_format_number(reference.high)}"
+        elif math.isinf(reference.high):
+            text = f"≥{_format_number(reference.low)}"
+        else:
+            text = f"{_format_number(reference.low)}-{_format_number(reference.high)}"
+        return f"{text} {test.unit}"
+
+
+_engine: Optional[ReferenceRangeEngine] = None
+
+
+def get_reference_ranges() -> ReferenceRangeEngine:
+    """Shared engine, loaded from lab_reference_ranges.json on first use (at startup)"""
+    global _engine
+    if _engine is None:
+        _engine = ReferenceRangeEngine.from_file()
+    return _engine
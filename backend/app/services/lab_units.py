@@ -0,0 +1,203 @@
+"""
+Lab Units - Normalize lab values to the reference table's units
+
+Lab values arrive as free text: "5.5" mmol/L glucose, "99 mg/dL", "<5",
+"1,200", "7,5". Before classification (and before building the LLM
+prompt) every value in a panel is parsed and converted to the unit the
+reference range table uses, so equivalent inputs classify and cache the
+same way.
+
+Values without a unit are assumed to be in the table unit, unless their
+magnitude says otherwise: platelets "250" is 250 x10^3/µL, not 250/µL.
+Such values are flagged (unit_mismatch) and left unclassified.
+
+app/data/lab_units.json holds unit aliases and per-test conversion
+factors; both are compiled into dicts at load time.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+import json
+import logging
+import math
+import os
+import re
+from app.services.lab_ranges import LabTest, ReferenceRangeEngine, get_reference_ranges
+
+logger = logging.getLogger(__name__)
+
+UNITS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "lab_units.json")
+
+SIGNIFICANT_DIGITS = 4  # Converted values are rounded to this precision
+MAGNITUDE_TOLERANCE = 2.0  # A unitless value this many times outside the reference range may be in another unit
+
+_VALUE = re.compile(r"^\s*(<=|>=|≤|≥|<|>)?\s*([-+]?\d[\d,]*(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*(.*?)\s*$")
+_THOUSANDS = re.compile(r"^[-+]?\d{1,3}(?:,\d{3})+(?:\.\d+)?$")
+_DECIMAL_COMMA = re.compile(r"^[-+]?\d+,\d+$")
+_QUALIFIERS = {"<=": "≤", ">=": "≥"}
+
+
+def unit_key(unit: str) -> str:
+    """Lookup form of a unit: lowercase, μ/µ -> u, mcg -> ug, no spaces or "x" prefix"""
+    unit = unit.strip().lower().replace("μ", "u").replace("µ", "u").replace("mcg", "ug")
+    unit = unit.replace("²", "2").replace("×", "x").replace(" ", "")
+    if unit.startswith("x10"):
+        unit = unit[1:]
+    return unit
+
+
+@dataclass(frozen=True)
+class ParsedValue:
+    value: float
+    qualifier: Optional[str] = None  # "<", ">", "≤" or "≥" for values reported as a bound
+    unit: Optional[str] = None  # Unit written after the number ("5.5 mmol/L")
+
+
+def parse_value(value: Any) -> Optional[ParsedValue]:
+    """Number from a lab value ("<5", "1,200", "7,5", "5.5 mmol/L"), or None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return ParsedValue(float(value))
+
+    match = _VALUE.match(str(value))
+    if not match:
+        return None
+    qualifier, number, unit = match.groups()
+
+    if "," in number:
+        if _THOUSANDS.match(number):
+            number = number.replace(",", "")
+        elif _DECIMAL_COMMA.match(number):
+            number = number.replace(",", ".")
+        else:
+            return None
+    try:
+        parsed = float(number)
+    except ValueError:
+        return None
+    return ParsedValue(parsed, _QUALIFIERS.get(qualifier, qualifier), unit or None)
+
+
+@dataclass(frozen=True)
+class NormalizedLabValue:
+    test_name: str  # As entered
+    test_id: Optional[str]  # Reference table test, None if unknown
+    value: Optional[float]  # In `unit`; None if the value isn't numeric
+    unit: Optional[str]  # Reference table unit when known/converted, else the unit as entered
+    qualifier: Optional[str] = None
+    converted: bool = False
+    raw_value: str = ""
+    unit_mismatch: bool = False  # No unit given and the magnitude doesn't fit the table unit
+
+    @property
+    def display_value(self) -> str:
+        if self.value is None:
+            return self.raw_value
+        return f"{self.qualifier or ''}{self.value:g}"
+
+
+class LabUnitRegistry:
+    """Unit aliases and per-test conversion factors into reference table units"""
+
+    def __init__(self, data: dict, ranges: ReferenceRangeEngine):
+        self.version = data.get("version", "")
+        self._ranges = ranges
+        self._units: Dict[str, str] = {}
+        self._conversions: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._test_conversions: Dict[str, List[Tuple[float, float]]] = {}
+
+        for canonical, aliases in data["units"].items():
+            for alias in [canonical, *aliases]:
+                self._units.setdefault(unit_key(alias), canonical)
+
+        for test_id, factors in data["conversions"].items():
+            for unit, factor in factors.items():
+                if isinstance(factor, dict):
+                    scale, offset = factor["scale"], factor.get("offset", 0.0)
+                else:
+                    scale, offset = factor, 0.0
+                self._conversions[(test_id, self.canonical_unit(unit))] = (scale, offset)
+                self._test_conversions.setdefault(test_id, []).append((scale, offset))
+
+        logger.info(
+            f"✅ Lab unit registry loaded: {len(self._units)} unit aliases, "
+            f"{len(self._conversions)} conversions, version {self.version}"
+        )
+
+    @classmethod
+    def from_file(cls, path: str = UNITS_PATH, ranges: Optional[ReferenceRangeEngine] = None) -> "LabUnitRegistry":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), ranges or get_reference_ranges())
+
+    def canonical_unit(self, unit: str) -> str:
+        """Canonical spelling of a unit alias (the input itself if unknown)"""
+        return self._units.get(unit_key(unit), unit.strip())
+
+    def normalize(self, test_name: str, value: Any, unit: Optional[str] = None) -> NormalizedLabValue:
+        """Parse a value and convert it to the reference table unit for its test"""
+        raw_value = str(value).strip()
+        test = self._ranges.resolve_test(test_name)
+        parsed = parse_value(value)
+        if parsed is None:
+            return NormalizedLabValue(test_name, test.id if test else None, None, unit, raw_value=raw_value)
+
+        unit = unit or parsed.unit
+        if test is None:
+            return NormalizedLabValue(
+                test_name, None, parsed.value, self.canonical_unit(unit) if unit else None,
+                parsed.qualifier, raw_value=raw_value
+            )
+
+        # No unit given - assume the table's unit if the magnitude fits it
+        if not unit and not self.fits_table_unit(test, parsed.value):
+            return NormalizedLabValue(
+                test_name, test.id, parsed.value, None, parsed.qualifier, raw_value=raw_value, unit_mismatch=True
+            )
+        source = self.canonical_unit(unit) if unit else self.canonical_unit(test.unit)
+        if source == self.canonical_unit(test.unit):
+            return NormalizedLabValue(test_name, test.id, parsed.value, test.unit, parsed.qualifier, raw_value=raw_value)
+
+        conversion = self._conversions.get((test.id, source))
+        if conversion is None:
+            # Unit the registry can't convert - leave it as entered (not classified locally)
+            return NormalizedLabValue(test_name, test.id, parsed.value, source, parsed.qualifier, raw_value=raw_value)
+
+        scale, offset = conversion
+        converted = float(f"{parsed.value * scale + offset:.{SIGNIFICANT_DIGITS}g}")
+        return NormalizedLabValue(test_name, test.id, converted, test.unit, parsed.qualifier, True, raw_value)
+
+    def fits_table_unit(self, test: LabTest, value: float) -> bool:
+        """False when a unitless value is far outside the reference range and
+        one of the test's other units would explain it better"""
+        low, high = test.bounds()
+
+        def outside(v: float) -> float:
+            # How many times outside [low, high] (1.0 within it)
+            if v > high:
+                return v / high if high > 0 else math.inf
+            if v < low:
+                return low / v if v > 0 else math.inf
+            return 1.0
+
+        off = outside(value)
+        if off <= MAGNITUDE_TOLERANCE:
+            return True
+        return not any(
+            outside(value * scale + offset) < off for scale, offset in self._test_conversions.get(test.id, [])
+        )
+
+    def normalize_panel(self, rows: Iterable[Tuple[str, Any, Optional[str]]]) -> List[NormalizedLabValue]:
+        """Normalize (test_name, value, unit) rows"""
+        return [self.normalize(test_name, value, unit) for test_name, value, unit in rows]
+
+
+_registry: Optional[LabUnitRegistry] = None
+
+
+def get_lab_units() -> LabUnitRegistry:
+    """Shared registry, loaded from lab_units.json on first use (at startup)"""
+    global _registry
+    if _registry is None:
+        _registry = LabUnitRegistry.from_file()
+    return _registry
@@ -5,31 +5,215 @@ Supports:
 - Ollama (local, free)
 - Google Gemini (free tier: 1,500 req/day)
 - OpenRouter (paid, fallback)
+
+A single LLMService lives for the whole process (see get_llm_service).
+Provider clients are built lazily on first use and reused afterwards.
+Provider order adapts to measured health (see provider_health).
+Concurrent generations per provider are capped (see admission), and
+rate limits / daily quotas are tracked across restarts (see quota).
+Endpoints can pass a ProviderPolicy to restrict and order providers.
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any, AsyncIterator
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-from app.core.config import settings
+import math
+import time
+from app.core.config import settings, reload_settings
 from app.services.ollama_client import OllamaClient
 from app.services.gemini_client import GeminiClient
-import httpx
+from app.services.openrouter_client import OpenRouterClient
+from app.services.http_clients import init_http_clients, close_http_clients
+from app.services.provider_health import ProviderHealthTracker
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from app.services.admission import AdmissionController
+from app.services.quota import QuotaTracker, rate_limit_retry_after
+from app.services.provider_policy import ProviderPolicy
+from app.services.errors import (
+    LLMOverloadedError, LLMRateLimitedError, LLMUnavailableError, ProviderRateLimited
+)
 
 logger = logging.getLogger(__name__)
 
+PROVIDER_CLASSES = {
+    "ollama": OllamaClient,
+    "gemini": GeminiClient,
+    "openrouter": OpenRouterClient,
+}
+
+PROVIDER_MODEL_SETTINGS = {
+    "ollama": "OLLAMA_MODEL",
+    "gemini": "GEMINI_MODEL",
+    "openrouter": "OPENROUTER_MODEL",
+}
+
+
+def model_id(providers: List[str]) -> str:
+    """Cache key identity of the providers (and configured models) that may answer a request
+
+    Read from settings on every call, so after a model change or
+    reload_settings() completions from the old configuration aren't served.
+    """
+    return ",".join(f"{name}:{getattr(settings, PROVIDER_MODEL_SETTINGS.get(name, ''), '')}" for name in providers)
+
 
 class LLMService:
     """Main LLM service with fallback support"""
     
-    def __init__(self):
-        self.ollama = OllamaClient()
-        self.gemini = GeminiClient()
+    def __init__(self, providers: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            providers: Optional provider clients by name (e.g. fakes in tests).
+                They take precedence over the lazily built real clients.
+        """
+        self._overrides: Dict[str, Any] = dict(providers or {})
+        self._providers: Dict[str, Any] = {}
         self.primary_provider = settings.PRIMARY_LLM_PROVIDER
+        self.health = ProviderHealthTracker()
+        self.hedge_stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0}
+        self.single_flight = SingleFlight()
+        self._admission: Dict[str, AdmissionController] = {}
+        self.quota = QuotaTracker()
+    
+    def get_provider(self, name: str) -> Any:
+        """Get a provider client, building it on first use"""
+        if name in self._overrides:
+            return self._overrides[name]
+        
+        if name not in self._providers:
+            if name not in PROVIDER_CLASSES:
+                raise ValueError(f"Unknown LLM provider: {name}")
+            logger.info(f"Initializing LLM provider: {name}")
+            self._providers[name] = PROVIDER_CLASSES[name]()
+        
+        return self._providers[name]
+    
+    def set_provider(self, name: str, client: Any) -> None:
+        """Swap in a provider client (e.g. a fake in tests)"""
+        self._overrides[name] = client
+    
+    @property
+    def ollama(self) -> OllamaClient:
+        return self.get_provider("ollama")
+    
+    @property
+    def gemini(self) -> GeminiClient:
+        return self.get_provider("gemini")
+    
+    @property
+    def openrouter(self) -> OpenRouterClient:
+        return self.get_provider("openrouter")
+    
+    async def reload(self, reload_env: bool = True) -> None:
+        """Hot-reload settings and rebuild providers on next use
+        
+        Args:
+            reload_env: Re-read environment variables and .env first
+        """
+        if reload_env:
+            reload_settings()
         
+        # Pooled clients hold base URLs and API keys - rebuild them too
+        await close_http_clients()
+        await init_http_clients()
+        
+        self._providers.clear()
+        self._admission.clear()
+        self.primary_provider = settings.PRIMARY_LLM_PROVIDER
+        logger.info(f"🔄 LLM service reloaded (primary: {self.primary_provider})")
+        
+    def start_health_probes(self) -> None:
+        """Start background probes for providers with a cheap availability check"""
+        self.health.start_probes({
+            "ollama": lambda: self.ollama.is_available()
+        })
+    
+    async def stop_health_probes(self) -> None:
+        await self.health.stop_probes()
+    
+    async def start_quota_sync(self) -> None:
+        """Load persisted quota state and start writing it back in batches"""
+        await self.quota.load(list(PROVIDER_CLASSES))
+        self.quota.start_flushing()
+    
+    async def stop_quota_sync(self) -> None:
+        await self.quota.stop_flushing()
+    
+    def model_id(self, providers: Optional[List[str]] = None) -> str:
+        """model_id() for these providers, or the default provider order"""
+        return model_id(providers or self._get_provider_order())
+    
+    def admission(self, name: str) -> AdmissionController:
+        """Concurrency limit and wait queue for a provider"""
+        if name not in self._admission:
+            limits = {
+                "ollama": (settings.OLLAMA_MAX_CONCURRENT_REQUESTS, settings.OLLAMA_MAX_QUEUE),
+                "gemini": (settings.GEMINI_MAX_CONCURRENCY, settings.GEMINI_MAX_QUEUE),
+                "openrouter": (settings.OPENROUTER_MAX_CONCURRENT_REQUESTS, settings.OPENROUTER_MAX_QUEUE),
+            }
+            max_concurrency, max_queue = limits.get(name, limits["openrouter"])
+            self._admission[name] = AdmissionController(
+                name, max_concurrency, max_queue, settings.LLM_QUEUE_TIMEOUT
+            )
+        return self._admission[name]
+    
+    def retry_after(self, name: str) -> int:
+        """Estimated seconds until a provider's queue drains enough to admit one more"""
+        admission = self.admission(name)
+        latency = self.health.get(name).ewma_latency or settings.LLM_QUEUE_TIMEOUT
+        return max(1, math.ceil(latency * (admission.waiting + 1) / admission.max_concurrency))
+    
+    def admission_snapshot(self) -> Dict[str, dict]:
+        """Queue depth and wait-time metrics for the admin endpoint"""
+        return {name: admission.snapshot() for name, admission in self._admission.items()}
+    
+    def quota_snapshot(self) -> Dict[str, dict]:
+        """Rate-limit and daily quota usage for the admin endpoint"""
+        return self.quota.snapshot(self._get_provider_order())
+    
+    @asynccontextmanager
+    async def provider_slot(self, name: str) -> AsyncIterator[None]:
+        """Admission slot and quota for one call to a provider
+        
+        Also used by endpoints that call a provider's API directly.
+        
+        Raises:
+            ProviderOverloaded: No slot freed up in time
+            ProviderRateLimited: Out of quota, or the call got a 429
+        """
+        async with self.admission(name).slot(self.retry_after(name)):
+            self.quota.acquire(name)
+            try:
+                yield
+            except Exception as e:
+                retry_after = rate_limit_retry_after(e)
+                if retry_after is None:
+                    raise
+                self.quota.record_rate_limited(name, retry_after)
+                raise ProviderRateLimited(name, "429 from provider", retry_after) from e
+    
+    def provider_order(self, preferred: Optional[List[str]] = None) -> List[str]:
+        """Providers to try, in order, adapted to current health and quotas
+        
+        Args:
+            preferred: Candidate providers in preference order
+                (defaults to the order from PRIMARY_LLM_PROVIDER)
+        """
+        return self.quota.order(self.health.order(preferred or self._get_provider_order()))
+    
     async def generate_response(
         self, 
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        max_tokens: int = 1500
+        max_tokens: int = 1500,
+        hedge: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
+        conversation_id: Optional[str] = None,
+        json_mode: bool = False,
+        providers: Optional[List[str]] = None,
+        policy: Optional[ProviderPolicy] = None
     ) -> Dict[str, any]:
         """Generate AI response with automatic fallback
         
@@ -37,42 +221,401 @@ class LLMService:
             messages: List of message dicts with 'role' and 'content'
             temperature: Creativity (0.0-1.0)
             max_tokens: Max response length
+            hedge: Start a backup provider if the first one is slow
+                (defaults to LLM_HEDGING_ENABLED)
+            coalesce: Share one upstream call between identical in-flight
+                requests (defaults to LLM_SINGLE_FLIGHT_ENABLED)
+            conversation_id: Lets providers that support it (Ollama) reuse
+                per-conversation state instead of re-reading the transcript
+            json_mode: Use the provider's native JSON output mode where it
+                has one (Ollama, OpenRouter)
+            providers: Only try these providers (in this preference order)
+            policy: Endpoint policy - picks the providers (local only for
+                small requests), caps max_tokens and enforces its latency SLO
             
         Returns:
             Dict with 'content', 'provider', 'success'
         """
+        latency_slo = None
+        if policy is not None:
+            if providers is None:
+                providers = policy.candidates(messages)
+            max_tokens = min(max_tokens, policy.max_tokens)
+            latency_slo = policy.latency_slo or None
         
-        # Try providers in order based on primary setting
-        providers = self._get_provider_order()
+        if coalesce is None:
+            coalesce = settings.LLM_SINGLE_FLIGHT_ENABLED
+        if not coalesce:
+            return await self._generate(
+                messages, temperature, max_tokens, hedge, conversation_id, json_mode, providers, latency_slo
+            )
         
-        for provider_name in providers:
+        key = ResponseCache.make_key(
+            self.model_id(providers), messages, temperature=temperature, max_tokens=max_tokens,
+            hedge=hedge, conversation_id=conversation_id, json_mode=json_mode, providers=providers,
+            latency_slo=latency_slo
+        )
+        result = await self.single_flight.do(
+            key, lambda: self._generate(
+                messages, temperature, max_tokens, hedge, conversation_id, json_mode, providers, latency_slo
+            )
+        )
+        return dict(result)
+    
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        hedge: Optional[bool],
+        conversation_id: Optional[str] = None,
+        json_mode: bool = False,
+        candidates: Optional[List[str]] = None,
+        latency_slo: Optional[float] = None
+    ) -> Dict[str, any]:
+        """Provider fallback (or hedging) for one generate_response call"""
+        # Try providers in order based on primary setting and health
+        candidates = candidates or self._get_provider_order()
+        providers = self.provider_order(candidates)
+        if latency_slo:
+            providers = self._order_by_slo(providers, latency_slo)
+        
+        # Providers left out for their quotas count as skipped, to say when to come back
+        unavailable: List[LLMUnavailableError] = self.quota.blocked(
+            [name for name in candidates if name not in providers]
+        )
+        
+        if hedge is None:
+            hedge = settings.LLM_HEDGING_ENABLED
+        if hedge and len(providers) > 1:
+            race = self._generate_hedged(
+                providers, messages, temperature, max_tokens, conversation_id, json_mode,
+                candidates=candidates, unavailable=unavailable
+            )
+            if not latency_slo:
+                return await race
+            # The whole race is held to the SLO; cancelling it cancels every running provider
             try:
-                logger.info(f"Attempting LLM provider: {provider_name}")
-                
-                if provider_name == "ollama":
-                    response = await self.ollama.generate(messages, temperature, max_tokens)
-                elif provider_name == "gemini":
-                    response = await self.gemini.generate(messages, temperature, max_tokens)
-                elif provider_name == "openrouter":
-                    response = await self._openrouter_generate(messages, temperature, max_tokens)
-                else:
-                    continue
-                
-                logger.info(f"✅ Success with {provider_name}")
+                return await asyncio.wait_for(race, latency_slo)
+            except asyncio.TimeoutError:
+                logger.warning(f"⏱️ Hedged request cut off at the {latency_slo:.0f}s latency SLO")
+                raise Exception(f"No response within the {latency_slo:.0f}s latency SLO")
+        
+        for index, provider_name in enumerate(providers):
+            health = self.health.get(provider_name)
+            if not health.allow_request():
+                logger.info(f"⏭️ Skipping {provider_name} (circuit {health.state})")
+                continue
+            
+            # Cut slow attempts off at the SLO - except the last, so something answers
+            timeout = latency_slo if index < len(providers) - 1 else None
+            try:
+                response = await self._call_provider(
+                    provider_name, messages, temperature, max_tokens, conversation_id, json_mode, timeout
+                )
                 return {
                     "content": response,
                     "provider": provider_name,
                     "success": True
                 }
                 
+            except LLMUnavailableError as e:
+                # At capacity or rate limited - spill over to the next provider
+                logger.info(f"⏳ {str(e)}, trying next provider")
+                unavailable.append(e)
+                continue
+            except Exception:
+                continue
+        
+        self._raise_if_unavailable(unavailable, candidates)
+        
+        # All providers failed
+        logger.error("All LLM providers failed!")
+        raise Exception("Unable to generate AI response. All providers failed.")
+    
+    def _order_by_slo(self, providers: List[str], latency_slo: float) -> List[str]:
+        """Move providers whose measured latency exceeds the SLO to the back"""
+        def too_slow(name: str) -> bool:
+            latency = self.health.get(name).ewma_latency
+            return latency is not None and latency > latency_slo
+        
+        fast = [name for name in providers if not too_slow(name)]
+        return fast + [name for name in providers if name not in fast]
+    
+    def _raise_if_unavailable(self, unavailable: List[LLMUnavailableError], candidates: List[str]) -> None:
+        """Fail fast with a Retry-After hint when providers were busy or rate limited, not broken
+        
+        Only when every candidate was skipped for its quota or admission limit -
+        if any of them actually failed (or its circuit is open), the caller
+        raises the normal provider failure instead.
+        """
+        skipped = {getattr(e, "provider", None) for e in unavailable}
+        if not unavailable or not set(candidates) <= skipped:
+            return
+        retry_after = min(e.retry_after for e in unavailable)
+        if all(isinstance(e, ProviderRateLimited) for e in unavailable):
+            logger.warning(f"🚫 LLM providers rate limited, retry after {retry_after}s")
+            raise LLMRateLimitedError(
+                "All LLM providers are rate limited. Please retry later.", retry_after
+            )
+        logger.warning(f"🚦 LLM providers at capacity, retry after {retry_after}s")
+        raise LLMOverloadedError(
+            "All LLM providers are at capacity. Please retry shortly.", retry_after
+        )
+    
+    async def _call_provider(
+        self,
+        provider_name: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        conversation_id: Optional[str] = None,
+        json_mode: bool = False,
+        timeout: Optional[float] = None
+    ) -> str:
+        """Call one provider within its admission limit and quota, recording its latency or failure
+        
+        Raises:
+            LLMUnavailableError: No slot or quota left, or a 429 (not counted as a failure)
+        """
+        health = self.health.get(provider_name)
+        async with self.provider_slot(provider_name):
+            started_at = time.perf_counter()
+            try:
+                logger.info(f"Attempting LLM provider: {provider_name}")
+                
+                provider = self.get_provider(provider_name)
+                options = {}
+                if conversation_id and getattr(provider, "supports_conversation_context", False):
+                    options["conversation_id"] = conversation_id
+                if json_mode and getattr(provider, "supports_json_mode", False):
+                    options["json_mode"] = True
+                call = provider.generate(messages, temperature, max_tokens, **options)
+                if timeout:
+                    try:
+                        response = await asyncio.wait_for(call, timeout)
+                    except asyncio.TimeoutError:
+                        raise Exception(f"No response within the {timeout:.0f}s latency SLO")
+                else:
+                    response = await call
+                
+                health.record_success(time.perf_counter() - started_at)
+                logger.info(f"✅ Success with {provider_name}")
+                return response
+                
             except Exception as e:
+                if rate_limit_retry_after(e) is None:
+                    health.record_failure(str(e))
+                    logger.warning(f"❌ {provider_name} failed: {str(e)}")
+                raise
+    
+    async def _generate_hedged(
+        self,
+        providers: List[str],
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        conversation_id: Optional[str] = None,
+        json_mode: bool = False,
+        candidates: Optional[List[str]] = None,
+        unavailable: Optional[List[LLMUnavailableError]] = None
+    ) -> Dict[str, any]:
+        """Hedged generation across providers
+        
+        The first provider runs alone until its hedge delay (a latency
+        percentile of its recent successes) passes. Then one backup provider
+        starts in parallel. The first success wins and the other is cancelled.
+        When every running provider has failed, the next one starts right away.
+        Providers still running when the race ends (or is cancelled, e.g. at
+        the latency SLO) are cancelled.
+        """
+        remaining = list(providers)
+        pending: Dict[asyncio.Task, str] = {}
+        hedge_task: Optional[asyncio.Task] = None
+        unavailable = list(unavailable or [])
+        self.hedge_stats["requests"] += 1
+        
+        def launch() -> Optional[asyncio.Task]:
+            while remaining:
+                name = remaining.pop(0)
+                if not self.health.get(name).allow_request():
+                    logger.info(f"⏭️ Skipping {name} (circuit {self.health.get(name).state})")
+                    continue
+                task = asyncio.create_task(
+                    self._call_provider(
+                        name, messages, temperature, max_tokens, conversation_id, json_mode
+                    )
+                )
+                pending[task] = name
+                return task
+            return None
+        
+        primary_task = launch()
+        primary_started = time.perf_counter()
+        
+        try:
+            while pending:
+                timeout = None
+                if hedge_task is None and remaining and len(pending) == 1:
+                    delay = self.hedge_delay(pending[primary_task])
+                    timeout = max(0.0, delay - (time.perf_counter() - primary_started))
+                
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    # Primary is slower than usual - start the hedge in parallel
+                    hedge_task = launch()
+                    if hedge_task is not None:
+                        self.hedge_stats["hedged"] += 1
+                        logger.info(f"⏱️ Hedging {pending[primary_task]} with {pending[hedge_task]}")
+                    continue
+                
+                for task in done:
+                    name = pending.pop(task)
+                    if isinstance(task.exception(), LLMUnavailableError):
+                        unavailable.append(task.exception())
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            self.hedge_stats["hedge_wins"] += 1
+                        else:
+                            self.hedge_stats["primary_wins"] += 1
+                        return {
+                            "content": task.result(),
+                            "provider": name,
+                            "success": True
+                        }
+                
+                # Every finished task failed - replace them with the next provider
+                if not pending:
+                    primary_task = launch()
+                    primary_started = time.perf_counter()
+                    hedge_task = None
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        self._raise_if_unavailable(unavailable, candidates or providers)
+        
+        # All providers failed
+        logger.error("All LLM providers failed!")
+        raise Exception("Unable to generate AI response. All providers failed.")
+    
+    def hedge_delay(self, provider_name: str) -> float:
+        """Seconds to wait on a provider before hedging with the next one"""
+        latencies = sorted(self.health.get(provider_name).latencies)
+        if len(latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        
+        # Nearest-rank percentile of recent successful latencies
+        rank = math.ceil(settings.LLM_HEDGE_PERCENTILE / 100 * len(latencies))
+        return max(settings.LLM_HEDGE_MIN_DELAY, latencies[max(rank, 1) - 1])
+    
+    def hedge_snapshot(self) -> Dict[str, any]:
+        """Hedging statistics for the admin endpoint"""
+        requests = self.hedge_stats["requests"]
+        hedged = self.hedge_stats["hedged"]
+        return {
+            **self.hedge_stats,
+            "hedge_rate": round(hedged / requests, 3) if requests else 0.0,
+            "hedge_win_rate": round(self.hedge_stats["hedge_wins"] / hedged, 3) if hedged else 0.0
+        }
+    
+    async def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, str]]:
+        """Stream AI response chunks with fallback before the first token
+        
+        A provider that fails before producing any output is skipped in
+        favour of the next one. Once tokens have been sent, a failure is
+        raised to the caller (the answer cannot switch providers midway).
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Creativity (0.0-1.0)
+            max_tokens: Max response length
+            conversation_id: Lets providers that support it (Ollama) reuse
+                per-conversation state
+            
+        Yields:
+            Dicts with 'content' (text chunk) and 'provider'
+        """
+        candidates = self._get_provider_order()
+        providers = self.provider_order(candidates)
+        unavailable: List[LLMUnavailableError] = self.quota.blocked(
+            [name for name in candidates if name not in providers]
+        )
+        
+        for provider_name in providers:
+            health = self.health.get(provider_name)
+            if not health.allow_request():
+                logger.info(f"⏭️ Skipping {provider_name} (circuit {health.state})")
+                continue
+            
+            started = False
+            try:
+                # The slot is held until the stream ends or the client goes away
+                async with self.provider_slot(provider_name):
+                    started_at = time.perf_counter()
+                    logger.info(f"Attempting LLM provider (stream): {provider_name}")
+                    
+                    provider = self.get_provider(provider_name)
+                    if conversation_id and getattr(provider, "supports_conversation_context", False):
+                        chunks = provider.generate_stream(
+                            messages, temperature, max_tokens, conversation_id=conversation_id
+                        )
+                    elif hasattr(provider, "generate_stream"):
+                        chunks = provider.generate_stream(messages, temperature, max_tokens)
+                    else:
+                        chunks = self._single_chunk(provider, messages, temperature, max_tokens)
+                    
+                    async for chunk in chunks:
+                        if not started:
+                            # Time-to-first-token is the latency that matters here
+                            health.record_success(time.perf_counter() - started_at)
+                            started = True
+                        yield {"content": chunk, "provider": provider_name}
+                
+                if started:
+                    logger.info(f"✅ Streamed with {provider_name}")
+                    return
+                raise Exception("Empty response")
+                
+            except LLMUnavailableError as e:
+                if started:
+                    raise
+                logger.info(f"⏳ {str(e)}, trying next provider")
+                unavailable.append(e)
+                continue
+            except Exception as e:
+                if started:
+                    logger.error(f"❌ {provider_name} failed mid-stream: {str(e)}")
+                    raise
+                health.record_failure(str(e))
                 logger.warning(f"❌ {provider_name} failed: {str(e)}")
                 continue
         
+        self._raise_if_unavailable(unavailable, candidates)
+        
         # All providers failed
         logger.error("All LLM providers failed!")
         raise Exception("Unable to generate AI response. All providers failed.")
     
+    async def _single_chunk(
+        self,
+        provider: Any,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Adapt a provider without streaming support to a one-chunk stream"""
+        yield await provider.generate(messages, temperature, max_tokens)
+    
     def _get_provider_order(self) -> List[str]:
         """Get provider order based on primary setting"""
         if self.primary_provider == "ollama":
@@ -81,31 +624,18 @@ class LLMService:
             return ["gemini", "ollama", "openrouter"]
         else:  # openrouter
             return ["openrouter", "gemini", "ollama"]
+
+
+_llm_service: Optional[LLMService] = None
+
+
+def get_llm_service() -> LLMService:
+    """
+    LLM service dependency for FastAPI - one shared instance per process
     
-    async def _openrouter_generate(
-        self,
-        messages: List[Dict[str, str]],
-        temperature: float,
-        max_tokens: int
-    ) -> str:
-        """OpenRouter API call (existing implementation)"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{settings.OPENROUTER_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:5173",
-                    "X-Title": "MediAI"
-                },
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens
-                }
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
+    Override in tests with app.dependency_overrides[get_llm_service].
+    """
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = LLMService()
+    return _llm_service
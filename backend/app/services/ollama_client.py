@@ -5,10 +5,17 @@ Runs LLMs locally on your machine (FREE!)
 Supports: Llama 3.2, Mistral, and other Ollama models
 """
 
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator, Optional, Tuple
+import json
 import httpx
 import logging
 from app.core.config import settings
+from app.services.http_clients import get_http_client
+from app.services.ollama_context import (
+    OllamaContextStore,
+    context_fingerprint,
+    transcript_fingerprint
+)
 
 logger = logging.getLogger(__name__)
 
@@ -16,15 +23,26 @@ logger = logging.getLogger(__name__)
 class OllamaClient:
     """Client for Ollama local LLM"""
     
+    # LLMService passes conversation_id so turns can reuse the KV context
+    supports_conversation_context = True
+    # ...and json_mode for structured (JSON) completions
+    supports_json_mode = True
+    
     def __init__(self):
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
+        self.contexts = OllamaContextStore(
+            max_conversations=settings.OLLAMA_CONTEXT_MAX_CONVERSATIONS,
+            max_total_tokens=settings.OLLAMA_CONTEXT_MAX_TOTAL_TOKENS
+        )
         
     async def generate(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        max_tokens: int = 1500
+        max_tokens: int = 1500,
+        conversation_id: Optional[str] = None,
+        json_mode: bool = False
     ) -> str:
         """Generate response using Ollama
         
@@ -32,32 +50,40 @@ class OllamaClient:
             messages: List of message dicts with 'role' and 'content'
             temperature: Creativity (0.0-1.0)
             max_tokens: Max response length
+            conversation_id: Reuse this conversation's stored KV context
+                and send only the new user message when possible
+            json_mode: Constrain the output to valid JSON (format: json)
             
         Returns:
             Generated text response
         """
         try:
-            # Convert messages to Ollama format
-            prompt = self._format_messages(messages)
+            payload, reused = self._build_payload(
+                messages, temperature, max_tokens, conversation_id, stream=False
+            )
+            if json_mode:
+                payload["format"] = "json"
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": temperature,
-                            "num_predict": max_tokens
-                        }
-                    }
+            client = get_http_client("ollama")
+            try:
+                response = await client.post("/api/generate", json=payload)
+                response.raise_for_status()
+            except httpx.HTTPStatusError:
+                if not reused:
+                    raise
+                # Stored context rejected (e.g. model reloaded) - resend everything
+                payload, _ = self._fall_back_to_full(
+                    messages, temperature, max_tokens, conversation_id, stream=False
                 )
-                
+                if json_mode:
+                    payload["format"] = "json"
+                response = await client.post("/api/generate", json=payload)
                 response.raise_for_status()
-                data = response.json()
-                return data["response"]
-                
+            
+            data = response.json()
+            self._remember(conversation_id, messages, data["response"], data.get("context"))
+            return data["response"]
+            
         except httpx.ConnectError:
             logger.error("Cannot connect to Ollama. Is it running?")
             raise Exception("Ollama not available. Install from: https://ollama.ai")
@@ -65,6 +91,132 @@ class OllamaClient:
             logger.error(f"Ollama error: {str(e)}")
             raise
     
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream response tokens from Ollama as they are generated
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Creativity (0.0-1.0)
+            max_tokens: Max response length
+            conversation_id: Reuse this conversation's stored KV context
+            
+        Yields:
+            Text chunks of the response
+        """
+        try:
+            payload, reused = self._build_payload(
+                messages, temperature, max_tokens, conversation_id, stream=True
+            )
+            
+            client = get_http_client("ollama")
+            while True:
+                parts = []
+                try:
+                    async with client.stream("POST", "/api/generate", json=payload) as response:
+                        response.raise_for_status()
+                        
+                        # Ollama streams one JSON object per line
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            data = json.loads(line)
+                            if data.get("error"):
+                                raise Exception(data["error"])
+                            if data.get("response"):
+                                parts.append(data["response"])
+                                yield data["response"]
+                            if data.get("done"):
+                                self._remember(conversation_id, messages, "".join(parts), data.get("context"))
+                                break
+                    return
+                    
+                except httpx.HTTPStatusError:
+                    if not reused or parts:
+                        raise
+                    # Stored context rejected - resend everything once
+                    payload, reused = self._fall_back_to_full(
+                        messages, temperature, max_tokens, conversation_id, stream=True
+                    )
+                        
+        except httpx.ConnectError:
+            logger.error("Cannot connect to Ollama. Is it running?")
+            raise Exception("Ollama not available. Install from: https://ollama.ai")
+    
+    def _build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        conversation_id: Optional[str],
+        stream: bool
+    ) -> Tuple[Dict, bool]:
+        """Build the /api/generate body, using a stored context when it matches
+        
+        Returns:
+            (payload, whether a stored context is reused)
+        """
+        payload = {
+            "model": self.model,
+            "stream": stream,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        
+        context = None
+        if conversation_id and settings.OLLAMA_CONTEXT_REUSE:
+            context = self.contexts.get(
+                conversation_id, transcript_fingerprint(self.model, messages)
+            )
+        
+        if context is not None:
+            # The context already holds the transcript - send only the new turn
+            payload["prompt"] = self._format_messages(messages[-1:])
+            payload["context"] = context
+        else:
+            # Convert messages to Ollama format
+            payload["prompt"] = self._format_messages(messages)
+        
+        return payload, context is not None
+    
+    def _fall_back_to_full(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        conversation_id: str,
+        stream: bool
+    ) -> Tuple[Dict, bool]:
+        logger.warning("Ollama rejected stored context - resending full transcript")
+        self.contexts.discard(conversation_id)
+        self.contexts.stats["fallbacks"] += 1
+        return self._build_payload(messages, temperature, max_tokens, None, stream)
+    
+    def _remember(
+        self,
+        conversation_id: Optional[str],
+        messages: List[Dict[str, str]],
+        reply: str,
+        context: Optional[List[int]]
+    ) -> None:
+        """Store the context returned for this turn for the next one"""
+        if not conversation_id or not context or not settings.OLLAMA_CONTEXT_REUSE:
+            return
+        system_prompt = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        self.contexts.put(
+            conversation_id,
+            context_fingerprint(self.model, system_prompt, reply),
+            context
+        )
+    
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """Convert OpenAI-style messages to Ollama prompt"""
         prompt_parts = []
@@ -86,8 +238,8 @@ class OllamaClient:
     async def is_available(self) -> bool:
         """Check if Ollama is running and accessible"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
+            client = get_http_client("ollama")
+            response = await client.get("/api/tags", timeout=5.0)
+            return response.status_code == 200
         except:
             return False
@@ -0,0 +1,86 @@
+"""
+Ollama Context Store - Reuse Ollama's KV context per conversation
+
+/api/generate returns a `context` (the encoded conversation so far). When
+that context is sent back with the next turn, Ollama only has to prefill
+the new user message instead of the whole transcript.
+
+A stored context is only reused when it matches the transcript: its
+fingerprint (model + system prompt + the assistant reply that produced
+it) must equal the latest assistant message being sent. Otherwise the
+client falls back to a full resend.
+"""
+
+from typing import Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+
+
+def context_fingerprint(model: str, system_prompt: str, assistant_reply: str) -> str:
+    """Identify the transcript state a context was produced for"""
+    digest = hashlib.sha256()
+    for part in (model, system_prompt, assistant_reply):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def transcript_fingerprint(model: str, messages: List[Dict[str, str]]) -> Optional[str]:
+    """Fingerprint of the history preceding the new user message, if any"""
+    if len(messages) < 2 or messages[-1]["role"] != "user":
+        return None
+
+    system_prompt = messages[0]["content"] if messages[0]["role"] == "system" else ""
+    for msg in reversed(messages[:-1]):
+        if msg["role"] == "assistant":
+            return context_fingerprint(model, system_prompt, msg["content"])
+    return None
+
+
+class OllamaContextStore:
+    """LRU of Ollama contexts per conversation, bounded by count and total tokens"""
+
+    def __init__(self, max_conversations: int = 200, max_total_tokens: int = 1_000_000):
+        self.max_conversations = max_conversations
+        self.max_total_tokens = max_total_tokens
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # conversation_id -> (fingerprint, context)
+        self._total_tokens = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "fallbacks": 0}
+
+    def get(self, conversation_id: str, fingerprint: Optional[str]) -> Optional[List[int]]:
+        """Stored context for the conversation if it matches the transcript"""
+        entry = self._entries.get(conversation_id)
+        if entry is None or fingerprint is None or entry[0] != fingerprint:
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(conversation_id)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, conversation_id: str, fingerprint: str, context: List[int]) -> None:
+        if len(context) > self.max_total_tokens:
+            self.discard(conversation_id)
+            return
+
+        self.discard(conversation_id)
+        self._entries[conversation_id] = (fingerprint, context)
+        self._total_tokens += len(context)
+
+        # Evict least recently used conversations when over budget
+        while len(self._entries) > self.max_conversations or self._total_tokens > self.max_total_tokens:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._total_tokens -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def discard(self, conversation_id: str) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._total_tokens -= len(entry[1])
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "conversations": len(self._entries),
+            "total_tokens": self._total_tokens
+        }
@@ -0,0 +1,116 @@
+"""
+OpenRouter Client - Paid fallback LLM integration
+
+OpenAI-compatible chat completions API
+Docs: https://openrouter.ai/docs
+"""
+
+from typing import List, Dict, AsyncIterator
+import json
+import logging
+from app.core.config import settings
+from app.services.http_clients import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class OpenRouterClient:
+    """Client for OpenRouter API"""
+
+    # LLMService passes json_mode for structured (JSON) completions
+    supports_json_mode = True
+
+    def __init__(self):
+        self.model = settings.OPENROUTER_MODEL
+
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        json_mode: bool = False
+    ) -> str:
+        """Generate response using OpenRouter
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Creativity (0.0-1.0)
+            max_tokens: Max response length
+            json_mode: Ask the model for a single JSON object
+
+        Returns:
+            Generated text response
+        """
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if json_mode:
+            body["response_format"] = {"type": "json_object"}
+
+        client = get_http_client("openrouter")
+        response = await client.post(
+            "/chat/completions",
+            headers={
+                "HTTP-Referer": "http://localhost:5173",
+                "X-Title": "MediAI"
+            },
+            json=body
+        )
+
+        response.raise_for_status()
+        data = response.json()
+        return data["choices"][0]["message"]["content"]
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1500
+    ) -> AsyncIterator[str]:
+        """Stream response tokens from OpenRouter (server-sent events)
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Creativity (0.0-1.0)
+            max_tokens: Max response length
+
+        Yields:
+            Text chunks of the response
+        """
+        client = get_http_client("openrouter")
+        async with client.stream(
+            "POST",
+            "/chat/completions",
+            headers={
+                "HTTP-Referer": "http://localhost:5173",
+                "X-Title": "MediAI"
+            },
+            json={
+                "model": self.model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            }
+        ) as response:
+            response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                # Skip keep-alive comments (": OPENROUTER PROCESSING") and blanks
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                data = json.loads(payload)
+                if data.get("error"):
+                    raise Exception(data["error"].get("message", str(data["error"])))
+                choices = data.get("choices") or []
+                if not choices:
+                    continue
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
@@ -0,0 +1,263 @@
+"""
+Plan Cache - Personalized health plans shared by everyone with the same risk profile
+
+The personalized plan prompt only uses coarse facts: an age band, gender,
+BMI category, diabetes and heart risk levels, smoking, activity and family
+history. Each person is quantized to a RiskProfile and the prompt is built
+from the profile alone, so everyone in the same bucket gets the same prompt
+and the same cached plan.
+
+Plans live in their own ResponseCache (bounded LRU + TTL, optional SQLite
+tier) so they never evict the analysis endpoints' completions. Requested
+profiles are counted; a background task regenerates the most requested
+ones that are missing from the cache, at startup (seeded from saved
+health_plans) and then every HEALTH_PLAN_WARM_INTERVAL_SECONDS.
+"""
+
+from typing import Dict, List, Optional
+from collections import Counter
+from dataclasses import dataclass
+import asyncio
+import logging
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import HealthPlan
+from app.services import provider_policy
+from app.services.response_cache import ResponseCache
+from app.services.llm_service import model_id
+
+logger = logging.getLogger(__name__)
+
+PLAN_SYSTEM_PROMPT = "You are a preventive medicine specialist. Create a personalized, actionable health improvement plan based on the patient's risk profile. Be specific, encouraging, and evidence-based. Keep it under 200 words."
+PLAN_TEMPERATURE = 0.7
+PLAN_MAX_TOKENS = 300
+
+MAX_TRACKED_PROFILES = 10000  # Popularity counter is trimmed to half when it grows past this
+
+
+def age_band(age: int) -> str:
+    """Decade band: 47 -> "40-49", 80 and over -> "80+" """
+    if age >= 80:
+        return "80+"
+    start = max(age, 0) // 10 * 10
+    return f"{start}-{start + 9}"
+
+
+@dataclass(frozen=True)
+class RiskProfile:
+    age_band: str
+    gender: str  # "male", "female" or "other"
+    bmi_category: str
+    diabetes_risk: str  # FINDRISC level
+    heart_risk: str  # Framingham level, "Not calculated" without cholesterol/BP
+    smoking: bool
+    physical_activity: str
+    family_diabetes: bool
+
+    @classmethod
+    def from_assessment(
+        cls,
+        age: int,
+        gender: str,
+        bmi_category: str,
+        diabetes_risk: str,
+        heart_risk: Optional[str],
+        smoking: bool,
+        physical_activity: str,
+        family_diabetes: bool
+    ) -> "RiskProfile":
+        gender = gender.strip().lower()
+        return cls(
+            age_band=age_band(age),
+            gender=gender if gender in ("male", "female") else "other",
+            bmi_category=bmi_category,
+            diabetes_risk=diabetes_risk,
+            heart_risk=heart_risk or "Not calculated",
+            smoking=bool(smoking),
+            physical_activity=physical_activity.strip().lower(),
+            family_diabetes=bool(family_diabetes)
+        )
+
+    @property
+    def key(self) -> str:
+        """Stable text form, e.g. "40-49|male|Overweight|Moderate|Low|0|moderate|1" """
+        return "|".join([
+            self.age_band, self.gender, self.bmi_category, self.diabetes_risk, self.heart_risk,
+            "1" if self.smoking else "0", self.physical_activity, "1" if self.family_diabetes else "0"
+        ])
+
+    @classmethod
+    def from_key(cls, key: str) -> "RiskProfile":
+        age, gender, bmi, diabetes, heart, smoking, activity, family = key.split("|")
+        return cls(age, gender, bmi, diabetes, heart, smoking == "1", activity, family == "1")
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Plan prompt - built from the profile only, so it is shared by the whole bucket"""
+        context = f"""
+Patient Profile:
+- Age: {self.age_band}, Gender: {self.gender}
+- BMI category: {self.bmi_category}
+- Diabetes Risk (10 years): {self.diabetes_risk}
+- Heart Disease Risk (10 years): {self.heart_risk}
+
+Key Risk Factors:
+- Smoking: {'Yes' if self.smoking else 'No'}
+- Physical Activity: {self.physical_activity}
+- Family diabetes history: {'Yes' if self.family_diabetes else 'No'}
+"""
+        return [
+            {"role": "system", "content": PLAN_SYSTEM_PROMPT},
+            {"role": "user", "content": context}
+        ]
+
+
+class PlanCache:
+    """Plans per risk profile, with request counts and background warming"""
+
+    def __init__(self, cache: ResponseCache, enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+        self._popularity: "Counter[str]" = Counter()
+        self._warm_task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "generated": 0, "warmed": 0, "warm_failures": 0}
+
+    def cache_key(self, profile: RiskProfile) -> str:
+        messages = profile.messages()
+        return self.cache.make_key(
+            model_id(provider_policy.HEALTH_PLAN.candidates(messages)), messages,
+            plan="health-plan", temperature=PLAN_TEMPERATURE, max_tokens=PLAN_MAX_TOKENS
+        )
+
+    async def get(self, profile: RiskProfile) -> Optional[str]:
+        """Cached plan for a profile, or None; counts the request towards warming"""
+        if not self.enabled:
+            return None
+        self._record(profile.key)
+        plan = await self.cache.get(self.cache_key(profile))
+        self.stats["hits" if plan is not None else "misses"] += 1
+        return plan
+
+    async def generate(self, llm_service, profile: RiskProfile) -> str:
+        """Generate (and cache) the plan for a profile
+
+        Concurrent requests for the same profile share one LLM call
+        (LLMService single-flight). Errors are raised and nothing is cached.
+        """
+        result = await llm_service.generate_response(
+            messages=profile.messages(),
+            temperature=PLAN_TEMPERATURE,
+            max_tokens=PLAN_MAX_TOKENS,
+            policy=provider_policy.HEALTH_PLAN
+        )
+        plan = result["content"]
+        self.stats["generated"] += 1
+        if self.enabled and plan.strip():
+            self.cache.set(self.cache_key(profile), plan)
+        return plan
+
+    async def seed_from_saved_plans(self, limit: int) -> None:
+        """Count the most common profiles of saved plans (popularity before any traffic)
+
+        The query runs in a worker thread; the counts are updated on the event loop.
+        """
+        rows = await asyncio.get_running_loop().run_in_executor(None, self._saved_profile_counts, limit)
+        for key, count in rows:
+            self._popularity[key] = max(self._popularity[key], count)
+
+    async def warm(self, llm_service, top_n: int) -> int:
+        """Generate missing plans for the top_n most requested profiles; returns how many"""
+        warmed = 0
+        for key, _ in self._popularity.most_common(top_n):
+            try:
+                profile = RiskProfile.from_key(key)
+            except ValueError:
+                continue
+            if await self.cache.contains(self.cache_key(profile)):
+                continue
+            try:
+                await self.generate(llm_service, profile)
+            except Exception as e:
+                # Providers busy or down - try again on the next round
+                logger.warning(f"Plan cache warm-up failed for {key}: {str(e)}")
+                self.stats["warm_failures"] += 1
+                break
+            warmed += 1
+            self.stats["warmed"] += 1
+        return warmed
+
+    def start_warming(self, llm_service) -> None:
+        """Start the background warm-up loop (no-op if disabled or running)"""
+        interval = settings.HEALTH_PLAN_WARM_INTERVAL_SECONDS
+        if not self.enabled or interval <= 0 or settings.HEALTH_PLAN_WARM_TOP_N <= 0 or self._warm_task is not None:
+            return
+        self._warm_task = asyncio.create_task(self._warm_loop(llm_service, interval))
+
+    async def stop_warming(self) -> None:
+        if self._warm_task is None:
+            return
+        self._warm_task.cancel()
+        try:
+            await self._warm_task
+        except asyncio.CancelledError:
+            pass
+        self._warm_task = None
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "tracked_profiles": len(self._popularity),
+            "top_profiles": [
+                {"profile": key, "requests": count} for key, count in self._popularity.most_common(10)
+            ],
+            "cache": self.cache.snapshot()
+        }
+
+    async def _warm_loop(self, llm_service, interval: float) -> None:
+        top_n = settings.HEALTH_PLAN_WARM_TOP_N
+        try:
+            await self.seed_from_saved_plans(top_n)
+        except Exception as e:
+            logger.warning(f"Could not read saved plan profiles: {str(e)}")
+        while True:
+            warmed = await self.warm(llm_service, top_n)
+            if warmed:
+                logger.info(f"✅ Plan cache warmed {warmed} profile(s)")
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    def _saved_profile_counts(limit: int) -> List[tuple]:
+        db = SessionLocal()
+        try:
+            return db.query(HealthPlan.profile_key, func.count(HealthPlan.id)).filter(
+                HealthPlan.profile_key.isnot(None)
+            ).group_by(HealthPlan.profile_key).order_by(func.count(HealthPlan.id).desc()).limit(limit).all()
+        finally:
+            db.close()
+
+    def _record(self, key: str) -> None:
+        self._popularity[key] += 1
+        if len(self._popularity) > MAX_TRACKED_PROFILES:
+            self._popularity = Counter(dict(self._popularity.most_common(MAX_TRACKED_PROFILES // 2)))
+
+
+_plan_cache: Optional[PlanCache] = None
+
+
+def get_plan_cache() -> PlanCache:
+    """Shared plan cache, built from settings on first use"""
+    global _plan_cache
+    if _plan_cache is None:
+        _plan_cache = PlanCache(
+            ResponseCache(
+                max_entries=settings.HEALTH_PLAN_CACHE_MAX_ENTRIES,
+                max_bytes=settings.HEALTH_PLAN_CACHE_MAX_BYTES,
+                ttl_seconds=settings.HEALTH_PLAN_CACHE_TTL_SECONDS,
+                disk_path=settings.HEALTH_PLAN_CACHE_DISK_PATH
+            ),
+            enabled=settings.HEALTH_PLAN_CACHE_ENABLED
+        )
+    return _plan_cache
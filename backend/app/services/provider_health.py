@@ -0,0 +1,243 @@
+"""
+Provider Health - Latency tracking and circuit breakers for LLM providers
+
+Each provider keeps:
+- EWMA latency and EWMA error rate (decaying over time, so a provider
+  demoted for errors is promoted again even if it gets no traffic)
+- A circuit breaker (closed -> open -> half-open -> closed)
+
+The tracker reorders the configured provider list so that providers with
+an open circuit are skipped right away and clearly slow or failing ones
+are tried last, instead of every request waiting on a dead provider.
+"""
+
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+from collections import deque
+from datetime import datetime
+import asyncio
+import logging
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Health state and circuit breaker for one provider"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.ewma_latency: Optional[float] = None  # seconds
+        self.latencies: Deque[float] = deque(maxlen=settings.LLM_LATENCY_SAMPLE_SIZE)  # recent successes
+        self._error_rate = 0.0  # EWMA of failures (0.0-1.0) as of _error_rate_at
+        self._error_rate_at = time.monotonic()
+        self.consecutive_failures = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[datetime] = None
+        self.opened_at: Optional[float] = None  # monotonic time
+        self.last_probe_ok: Optional[bool] = None
+        self._trial_started_at: Optional[float] = None  # half-open trial in flight
+
+    @property
+    def error_rate(self) -> float:
+        """EWMA of failures, halved every LLM_HEALTH_ERROR_HALF_LIFE seconds since the last update"""
+        half_life = settings.LLM_HEALTH_ERROR_HALF_LIFE
+        if half_life <= 0:
+            return self._error_rate
+        elapsed = time.monotonic() - self._error_rate_at
+        return self._error_rate * 0.5 ** (elapsed / half_life)
+
+    @error_rate.setter
+    def error_rate(self, value: float) -> None:
+        self._error_rate = value
+        self._error_rate_at = time.monotonic()
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now (moves open -> half-open when due)"""
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < settings.LLM_CIRCUIT_OPEN_SECONDS:
+                return False
+            self.state = HALF_OPEN
+            self._trial_started_at = None
+
+        # Half-open: let exactly one trial request through
+        if self._trial_pending():
+            return False
+        self._trial_started_at = time.monotonic()
+        return True
+
+    def _trial_pending(self) -> bool:
+        """A half-open trial is in flight (abandoned trials expire after the cool-down)"""
+        if self._trial_started_at is None:
+            return False
+        return time.monotonic() - self._trial_started_at < settings.LLM_CIRCUIT_OPEN_SECONDS
+
+    def is_available(self) -> bool:
+        """Whether the provider would accept a request, without claiming a trial"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= settings.LLM_CIRCUIT_OPEN_SECONDS
+        return not self._trial_pending()
+
+    def record_success(self, latency: float) -> None:
+        """Record a successful call and its latency in seconds"""
+        alpha = settings.LLM_HEALTH_EWMA_ALPHA
+        self.total_requests += 1
+        self.consecutive_failures = 0
+        self.error_rate = (1 - alpha) * self.error_rate
+        self.ewma_latency = latency if self.ewma_latency is None else (
+            alpha * latency + (1 - alpha) * self.ewma_latency
+        )
+        self.latencies.append(latency)
+        self.last_success_at = datetime.utcnow()
+
+        if self.state != CLOSED:
+            logger.info(f"🟢 Circuit closed for {self.name}")
+        self.state = CLOSED
+        self.opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self, error: str) -> None:
+        """Record a failed call, opening the circuit when failures pile up"""
+        alpha = settings.LLM_HEALTH_EWMA_ALPHA
+        self.total_requests += 1
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.error_rate = alpha + (1 - alpha) * self.error_rate
+        self.last_error = error
+
+        if self.state == HALF_OPEN or self.consecutive_failures >= settings.LLM_CIRCUIT_FAILURE_THRESHOLD:
+            self.open()
+
+    def open(self) -> None:
+        """Open the circuit - requests skip this provider until the cool-down ends"""
+        if self.state != OPEN:
+            logger.warning(f"🔴 Circuit opened for {self.name}")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._trial_started_at = None
+
+    def half_open(self) -> None:
+        """Allow a single trial request before fully closing the circuit"""
+        self.state = HALF_OPEN
+        self._trial_started_at = None
+
+    def is_degraded(self, best_latency: Optional[float]) -> bool:
+        """Slow relative to the fastest provider, or failing often"""
+        if self.error_rate >= 0.5:
+            return True
+        if self.ewma_latency is None or not best_latency:
+            return False
+        return self.ewma_latency > best_latency * settings.LLM_SLOW_PROVIDER_FACTOR
+
+    def snapshot(self) -> dict:
+        """Serializable view for the admin endpoint"""
+        retry_in = None
+        if self.state == OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            retry_in = round(max(0.0, settings.LLM_CIRCUIT_OPEN_SECONDS - elapsed), 1)
+
+        return {
+            "state": self.state,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at.isoformat() if self.last_success_at else None,
+            "last_probe_ok": self.last_probe_ok,
+            "retry_in_seconds": retry_in
+        }
+
+
+class ProviderHealthTracker:
+    """Tracks health for all providers and computes the adaptive order"""
+
+    def __init__(self):
+        self._health: Dict[str, ProviderHealth] = {}
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def get(self, name: str) -> ProviderHealth:
+        if name not in self._health:
+            self._health[name] = ProviderHealth(name)
+        return self._health[name]
+
+    def record_success(self, name: str, latency: float) -> None:
+        self.get(name).record_success(latency)
+
+    def record_failure(self, name: str, error: str) -> None:
+        self.get(name).record_failure(error)
+
+    def order(self, preferred: List[str]) -> List[str]:
+        """Reorder providers by health, keeping the configured preference otherwise
+
+        - Providers with an open circuit are dropped (fail fast, no timeouts)
+        - Degraded providers (slow or error-prone) move behind healthy ones
+        """
+        available = [name for name in preferred if self.get(name).is_available()]
+
+        latencies = [
+            self.get(name).ewma_latency for name in available
+            if self.get(name).ewma_latency is not None
+        ]
+        best_latency = min(latencies) if latencies else None
+
+        healthy = [name for name in available if not self.get(name).is_degraded(best_latency)]
+        degraded = [name for name in available if name not in healthy]
+        return healthy + degraded
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: health.snapshot() for name, health in self._health.items()}
+
+    def start_probes(self, probes: Dict[str, Callable[[], Awaitable[bool]]]) -> None:
+        """Start background availability probes (no-op if disabled or running)
+
+        Args:
+            probes: Provider name -> async callable returning True when reachable
+        """
+        interval = settings.LLM_HEALTH_PROBE_INTERVAL
+        if interval <= 0 or not probes or self._probe_task is not None:
+            return
+        self._probe_task = asyncio.create_task(self._probe_loop(probes, interval))
+
+    async def stop_probes(self) -> None:
+        if self._probe_task is None:
+            return
+        self._probe_task.cancel()
+        try:
+            await self._probe_task
+        except asyncio.CancelledError:
+            pass
+        self._probe_task = None
+
+    async def _probe_loop(self, probes: Dict[str, Callable[[], Awaitable[bool]]], interval: float) -> None:
+        while True:
+            for name, probe in probes.items():
+                try:
+                    ok = await probe()
+                except Exception:
+                    ok = False
+
+                health = self.get(name)
+                health.last_probe_ok = ok
+                if not ok and health.state != OPEN:
+                    # Unreachable - stop sending traffic without waiting for timeouts
+                    health.last_error = "Health probe failed"
+                    health.open()
+                elif ok and health.state == OPEN:
+                    # Reachable again - let the next request through as a trial
+                    health.half_open()
+
+            await asyncio.sleep(interval)
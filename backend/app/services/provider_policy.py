@@ -0,0 +1,78 @@
+"""
+Provider Policies - Per-endpoint rules for which LLM serves a request
+
+Each analysis endpoint declares a ProviderPolicy. LLMService enforces it:
+- Only the policy's providers are tried, in its preference order
+  (then adapted to health and quotas as usual)
+- The local model (Ollama) is used only when allowed and the request is
+  small enough to be "simple"; then it goes first since it costs nothing.
+  Bigger requests go straight to the remote models.
+- Providers measured slower than the latency SLO are tried last, and
+  every attempt but the last is cut off at the SLO
+- max_tokens is capped at the policy's limit
+"""
+
+from typing import Dict, List, Tuple
+from dataclasses import dataclass
+from app.services.context_builder import estimate_tokens
+
+LOCAL_PROVIDERS = ("ollama",)
+
+
+@dataclass(frozen=True)
+class ProviderPolicy:
+    name: str
+    preferred_providers: Tuple[str, ...]
+    latency_slo: float  # seconds, 0 disables
+    max_tokens: int
+    allow_local: bool = False
+    local_max_prompt_tokens: int = 0  # Larger (non-system) prompts skip the local model
+
+    def candidates(self, messages: List[Dict[str, str]]) -> List[str]:
+        """Providers this request may use, in preference order"""
+        remote = [name for name in self.preferred_providers if name not in LOCAL_PROVIDERS]
+        local = [name for name in self.preferred_providers if name in LOCAL_PROVIDERS]
+        if not self.allow_local or not local:
+            return remote
+
+        prompt_tokens = sum(estimate_tokens(msg["content"]) for msg in messages if msg["role"] != "system")
+        if prompt_tokens > self.local_max_prompt_tokens:
+            return remote
+        return local + remote
+
+
+SYMPTOM_CHECK = ProviderPolicy(
+    name="symptom_check",
+    preferred_providers=("openrouter", "gemini", "ollama"),
+    latency_slo=20.0,
+    max_tokens=2000,
+    allow_local=True,
+    local_max_prompt_tokens=150  # One or two symptoms without history
+)
+
+# Interaction misses are dangerous - always use a large remote model
+DRUG_INTERACTIONS = ProviderPolicy(
+    name="drug_interactions",
+    preferred_providers=("openrouter", "gemini"),
+    latency_slo=25.0,
+    max_tokens=2500
+)
+
+LAB_INTERPRETATION = ProviderPolicy(
+    name="lab_interpretation",
+    preferred_providers=("openrouter", "gemini", "ollama"),
+    latency_slo=25.0,
+    max_tokens=3000,
+    allow_local=True,
+    local_max_prompt_tokens=120  # A couple of values
+)
+
+# Short motivational plan with a static fallback - local is good enough
+HEALTH_PLAN = ProviderPolicy(
+    name="health_plan",
+    preferred_providers=("ollama", "gemini", "openrouter"),
+    latency_slo=15.0,
+    max_tokens=300,
+    allow_local=True,
+    local_max_prompt_tokens=1000
+)
@@ -0,0 +1,296 @@
+"""
+Provider Quotas - Persistent rate limits and daily budgets per LLM provider
+
+Each provider can have:
+- A token bucket (requests per minute, refilled continuously)
+- A daily request quota (e.g. Gemini free tier: 1,500/day, UTC days)
+- A block window set from a 429 response and its Retry-After header
+
+State lives in memory and is persisted to the provider_quotas table, so a
+restart does not reset today's usage. The database is never touched on
+the request path: rows are loaded at startup and changed providers are
+written back in batches every LLM_QUOTA_FLUSH_INTERVAL seconds (and at
+shutdown), in a worker thread. Exhausted or rate-limited providers are
+skipped without a round trip. Providers using their daily quota faster than the day passes
+are tried after the others so the budget lasts until the reset.
+"""
+
+from typing import Callable, Dict, List, Optional, Set
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import asyncio
+import logging
+import httpx
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import ProviderQuota
+from app.services.errors import ProviderRateLimited
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QuotaLimits:
+    """Limits for one provider (0 disables a limit)"""
+    requests_per_minute: int = 0
+    daily_quota: int = 0
+
+
+def get_quota_limits(provider: str) -> QuotaLimits:
+    limits = {
+        "gemini": QuotaLimits(settings.GEMINI_REQUESTS_PER_MINUTE, settings.GEMINI_DAILY_QUOTA),
+        "openrouter": QuotaLimits(settings.OPENROUTER_REQUESTS_PER_MINUTE, settings.OPENROUTER_DAILY_QUOTA),
+    }
+    return limits.get(provider, QuotaLimits())  # Ollama is local - no quota
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is not None:
+        retry_at = retry_at.replace(tzinfo=None) - retry_at.utcoffset()
+    return max(0.0, (retry_at - datetime.utcnow()).total_seconds())
+
+
+def rate_limit_retry_after(error: Exception) -> Optional[float]:
+    """Retry-After seconds if the error is a 429 from a provider, else None"""
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        retry_after = parse_retry_after(error.response.headers.get("Retry-After"))
+        return retry_after if retry_after is not None else settings.LLM_RATE_LIMIT_DEFAULT_RETRY
+
+    # google.api_core ResourceExhausted (Gemini) carries the HTTP code
+    if getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted":
+        return settings.LLM_RATE_LIMIT_DEFAULT_RETRY
+    return None
+
+
+class QuotaTracker:
+    """Token buckets, daily counters and 429 blocks, persisted per provider"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._state: Dict[str, ProviderQuota] = {}  # detached rows, loaded at startup or on first use
+        self._dirty: Set[str] = set()  # Providers changed since the last flush
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def load(self, providers: List[str]) -> None:
+        """Read the persisted state for these providers in a worker thread"""
+        loop = asyncio.get_running_loop()
+        for provider in providers:
+            if provider not in self._state:
+                state = await loop.run_in_executor(None, self._read, provider)
+                if provider not in self._state:
+                    self._state[provider] = state or self._new_state(provider)
+
+    def start_flushing(self) -> None:
+        """Start writing changed state back in batches (no-op if disabled or running)"""
+        interval = settings.LLM_QUOTA_FLUSH_INTERVAL
+        if interval <= 0 or self._flush_task is not None:
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop_flushing(self) -> None:
+        """Stop the flush loop and write whatever is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write changed providers to the database in a worker thread"""
+        if not self._dirty:
+            return
+        # Copies taken on the event loop, so the thread never sees a half-updated row
+        rows = [self._copy(self._state[provider]) for provider in self._dirty]
+        self._dirty.clear()
+        if not await asyncio.get_running_loop().run_in_executor(None, self._write, rows):
+            # Usage is still enforced in memory - retry on the next flush
+            self._dirty.update(row.provider for row in rows)
+
+    def wait_time(self, provider: str) -> Optional[float]:
+        """Seconds until the provider may be called again, or None if it may be now"""
+        if not settings.LLM_QUOTA_ENABLED:
+            return None
+
+        state = self._load(provider)
+        limits = get_quota_limits(provider)
+        now = datetime.utcnow()
+
+        waits = []
+        if state.blocked_until is not None and state.blocked_until > now:
+            waits.append((state.blocked_until - now).total_seconds())
+        if limits.daily_quota and state.requests_today >= limits.daily_quota:
+            waits.append(self._seconds_until_reset(now))
+        if limits.requests_per_minute and self._bucket_level(state, limits, now) < 1:
+            refill_per_second = limits.requests_per_minute / 60
+            waits.append((1 - self._bucket_level(state, limits, now)) / refill_per_second)
+
+        return max(waits) if waits else None
+
+    def acquire(self, provider: str) -> None:
+        """Count one request against the provider's limits
+
+        Raises:
+            ProviderRateLimited: The bucket is empty, the daily quota is used
+                up, or the provider asked us to back off
+        """
+        wait = self.wait_time(provider)
+        if wait is not None:
+            raise ProviderRateLimited(provider, "quota exhausted", wait)
+        if not settings.LLM_QUOTA_ENABLED:
+            return
+
+        state = self._load(provider)
+        limits = get_quota_limits(provider)
+        now = datetime.utcnow()
+        if limits.requests_per_minute:
+            state.bucket_tokens = self._bucket_level(state, limits, now) - 1
+            state.bucket_updated_at = now
+        state.requests_today += 1
+        self._save(state)
+
+    def record_rate_limited(self, provider: str, retry_after: float) -> None:
+        """Honor a 429: skip the provider until Retry-After has passed"""
+        state = self._load(provider)
+        state.blocked_until = datetime.utcnow() + timedelta(seconds=retry_after)
+        logger.warning(f"🚫 {provider} rate limited, backing off for {retry_after:.0f}s")
+        self._save(state)
+
+    def order(self, providers: List[str]) -> List[str]:
+        """Drop providers that cannot be called now, pace the ones ahead of their daily budget"""
+        available = [name for name in providers if self.wait_time(name) is None]
+        if not settings.LLM_QUOTA_PACING:
+            return available
+
+        paced = [name for name in available if not self._ahead_of_pace(name)]
+        return paced + [name for name in available if name not in paced]
+
+    def blocked(self, providers: List[str]) -> List[ProviderRateLimited]:
+        """Errors for the providers currently skipped because of quotas"""
+        errors = []
+        for name in providers:
+            wait = self.wait_time(name)
+            if wait is not None:
+                errors.append(ProviderRateLimited(name, "quota exhausted", wait))
+        return errors
+
+    def snapshot(self, providers: List[str]) -> Dict[str, dict]:
+        """Usage and limits for the admin endpoint"""
+        now = datetime.utcnow()
+        result = {}
+        for name in providers:
+            state = self._load(name)
+            limits = get_quota_limits(name)
+            wait = self.wait_time(name)
+            result[name] = {
+                "requests_today": state.requests_today,
+                "daily_quota": limits.daily_quota or None,
+                "requests_per_minute": limits.requests_per_minute or None,
+                "bucket_tokens": round(self._bucket_level(state, limits, now), 2) if limits.requests_per_minute else None,
+                "blocked_until": state.blocked_until.isoformat() if state.blocked_until and state.blocked_until > now else None,
+                "retry_in_seconds": round(wait, 1) if wait is not None else None
+            }
+        return result
+
+    def _ahead_of_pace(self, provider: str) -> bool:
+        """Used a larger share of today's quota than of the day itself"""
+        limits = get_quota_limits(provider)
+        if not limits.daily_quota:
+            return False
+        now = datetime.utcnow()
+        day_elapsed = 1 - self._seconds_until_reset(now) / 86400
+        used = self._load(provider).requests_today / limits.daily_quota
+        return used > day_elapsed + settings.LLM_QUOTA_PACING_MARGIN
+
+    def _bucket_level(self, state: ProviderQuota, limits: QuotaLimits, now: datetime) -> float:
+        capacity = float(limits.requests_per_minute)
+        if state.bucket_tokens is None or state.bucket_updated_at is None:
+            return capacity
+        elapsed = max(0.0, (now - state.bucket_updated_at).total_seconds())
+        return min(capacity, state.bucket_tokens + elapsed * limits.requests_per_minute / 60)
+
+    @staticmethod
+    def _seconds_until_reset(now: datetime) -> float:
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (tomorrow - now).total_seconds()
+
+    def _load(self, provider: str) -> ProviderQuota:
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        state = self._state.get(provider)
+
+        if state is None:
+            # Not loaded at startup (e.g. a provider added by a reload) - read it once
+            state = self._read(provider) or self._new_state(provider)
+            self._state[provider] = state
+
+        if state.quota_date != today:
+            # New day - the daily quota starts over
+            state.quota_date = today
+            state.requests_today = 0
+        return state
+
+    def _save(self, state: ProviderQuota) -> None:
+        # Written by the next flush
+        self._dirty.add(state.provider)
+
+    @staticmethod
+    def _new_state(provider: str) -> ProviderQuota:
+        return ProviderQuota(provider=provider, quota_date=datetime.utcnow().strftime("%Y-%m-%d"), requests_today=0)
+
+    @staticmethod
+    def _copy(state: ProviderQuota) -> ProviderQuota:
+        return ProviderQuota(
+            provider=state.provider,
+            quota_date=state.quota_date,
+            requests_today=state.requests_today,
+            bucket_tokens=state.bucket_tokens,
+            bucket_updated_at=state.bucket_updated_at,
+            blocked_until=state.blocked_until
+        )
+
+    def _read(self, provider: str) -> Optional[ProviderQuota]:
+        db = self._session_factory()
+        try:
+            state = db.query(ProviderQuota).filter(ProviderQuota.provider == provider).first()
+            if state is not None:
+                db.expunge(state)
+            return state
+        except Exception as e:
+            logger.warning(f"Could not load quota state for {provider}: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def _write(self, rows: List[ProviderQuota]) -> bool:
+        db = self._session_factory()
+        try:
+            for row in rows:
+                db.merge(row)
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Could not persist quota state: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
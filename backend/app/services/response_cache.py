@@ -0,0 +1,274 @@
+"""
+Response Cache - Reuse deterministic LLM completions
+
+Low-temperature analysis prompts (symptoms, drug interactions, lab panels)
+repeat often for common inputs. Completions are cached under a hash of the
+canonicalized model, messages and generation parameters.
+
+Tiers:
+- Memory: LRU with TTL, bounded by entry count and total size
+- Disk (optional): SQLite file that survives restarts (LLM_CACHE_DISK_PATH),
+  read and written only in worker threads
+"""
+
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional SQLite) cache of LLM completions
+
+    The memory tier is used on the event loop. The disk tier only ever runs
+    in worker threads: lookups that miss memory read SQLite through
+    run_in_executor, and writes are queued and flushed in batches
+    (start_flushing), so a slow disk never stalls a request.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 50_000_000,
+        ttl_seconds: float = 86400,
+        disk_path: str = ""
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+        self._db: Optional[sqlite3.Connection] = None  # opened on first use, in a worker thread
+        self._db_lock = threading.Lock()
+        self._pending: Dict[str, tuple] = {}  # key -> (value, expires_at), not yet written to disk
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], **params: Any) -> str:
+        """Canonical cache key for a completion request
+
+        Args:
+            model: Model identifier (e.g. settings.OPENROUTER_MODEL)
+            messages: List of message dicts with 'role' and 'content'
+            **params: Generation parameters (temperature, max_tokens, ...)
+        """
+        canonical = json.dumps(
+            {
+                "model": model,
+                "messages": [
+                    {"role": msg["role"], "content": msg["content"].strip()}
+                    for msg in messages
+                ],
+                "params": params
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached completion, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+
+        if self.disk_path:
+            row = await asyncio.get_running_loop().run_in_executor(None, self._read_disk, key)
+            if row is not None and row[1] > now:
+                with self._lock:
+                    # Promote to the memory tier
+                    self._store(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                return row[0]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    async def contains(self, key: str) -> bool:
+        """Whether an unexpired entry exists (no LRU update, not counted in the metrics)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return True
+            pending = self._pending.get(key)
+            if pending is not None and pending[1] > now:
+                return True
+        if not self.disk_path:
+            return False
+        row = await asyncio.get_running_loop().run_in_executor(None, self._read_disk, key)
+        return row is not None and row[1] > now
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        """Cache a completion (the disk write is queued for the next flush)"""
+        expires_at = time.time() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            self._store(key, value, expires_at)
+            self.stats["sets"] += 1
+            if self.disk_path:
+                self._pending[key] = (value, expires_at)
+
+    def clear(self) -> None:
+        """Drop every cached completion (both tiers); blocks on the disk, call from a worker thread"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._pending.clear()
+        if self.disk_path:
+            with self._db_lock:
+                db = self._connection()
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def start_flushing(self) -> None:
+        """Start writing queued entries to the disk tier in batches (no-op without one, or if running)"""
+        interval = settings.LLM_CACHE_FLUSH_INTERVAL
+        if not self.disk_path or interval <= 0 or self._flush_task is not None:
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop_flushing(self) -> None:
+        """Stop the flush loop and write whatever is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write queued entries to the disk tier in a worker thread"""
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [(key, value, expires_at) for key, (value, expires_at) in self._pending.items()]
+            self._pending.clear()
+        if not await asyncio.get_running_loop().run_in_executor(None, self._write_disk, rows):
+            # Still served from memory - retry on the next flush unless replaced meanwhile
+            with self._lock:
+                for key, value, expires_at in rows:
+                    self._pending.setdefault(key, (value, expires_at))
+
+    def snapshot(self) -> dict:
+        """Hit/miss metrics for the admin endpoint"""
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "disk_tier": bool(self.disk_path),
+            "disk_pending": len(self._pending)
+        }
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return value
+            self._remove(key)
+            self.stats["expired"] += 1
+        # Evicted from memory before its disk write
+        pending = self._pending.get(key)
+        if pending is not None and pending[1] > now:
+            return pending[0]
+        return None
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+
+        # Evict least recently used entries beyond the size limits
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds _db_lock
+        if self._db is None:
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+            logger.info(f"✅ LLM response cache disk tier: {self.disk_path}")
+        return self._db
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        try:
+            with self._db_lock:
+                return self._connection().execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk read failed: {str(e)}")
+            return None
+
+    def _write_disk(self, rows: List[tuple]) -> bool:
+        try:
+            with self._db_lock:
+                db = self._connection()
+                db.executemany("INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", rows)
+                db.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write LLM cache entries to disk: {str(e)}")
+            return False
+
+    async def _flush_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Shared response cache, built from settings on first use"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            disk_path=settings.LLM_CACHE_DISK_PATH
+        )
+    return _response_cache
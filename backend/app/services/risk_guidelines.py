@@ -0,0 +1,235 @@
+"""
+Risk Guidelines - Declarative breakpoint tables for the health-risk calculators
+
+BMI, waist-to-hip, FINDRISC, Framingham and cancer screening rules live in
+app/data/risk_guidelines.json. At import they are compiled into sorted
+edge arrays: the scalar calculators look a value up with bisect, the
+cohort engine looks a whole column up with np.searchsorted, so both always
+use the same tables. Cancer screenings are precomputed per (age, gender).
+
+A new guideline version is a data change. Compare it with the current
+tables before shipping:
+
+    python -m app.services.risk_guidelines path/to/new_guidelines.json
+
+That the vectorized cohort engine matches the scalar calculators is
+checked by tests/test_cohort_scoring.py.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bisect import bisect_right
+import copy
+import json
+import os
+import numpy as np
+
+GUIDELINES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "risk_guidelines.json")
+
+
+def sex_key(gender: str) -> str:
+    """Table key used by the calculators: "male", anything else is "female" """
+    return "male" if gender == "male" else "female"
+
+
+class BreakpointTable:
+    """Sorted edges and one value per band (value == edge falls in the band above)"""
+
+    __slots__ = ("edges", "values", "_edges", "_columns")
+
+    def __init__(self, edges: Sequence[float], values: Sequence[Any]):
+        if len(values) != len(edges) + 1:
+            raise ValueError(f"{len(edges)} edges need {len(edges) + 1} values, got {len(values)}")
+        if list(edges) != sorted(edges):
+            raise ValueError(f"Edges must be sorted: {list(edges)}")
+        self.edges = tuple(edges)
+        self.values = tuple(values)
+        self._edges = np.array(edges, dtype=np.float64)
+        self._columns: Dict[Optional[str], np.ndarray] = {}
+
+    def index(self, value: float) -> int:
+        return bisect_right(self.edges, value)
+
+    def lookup(self, value: float) -> Any:
+        return self.values[bisect_right(self.edges, value)]
+
+    def indices(self, values: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self._edges, values, side="right")
+
+    def lookup_array(self, values: np.ndarray, field: Optional[str] = None) -> np.ndarray:
+        """Band value (or one field of dict-valued bands) for every element"""
+        column = self._columns.get(field)
+        if column is None:
+            items = self.values if field is None else [band[field] for band in self.values]
+            column = np.array(items, dtype=object if isinstance(items[0], str) else None)
+            self._columns[field] = column
+        return column[self.indices(values)]
+
+
+class PointsTable:
+    """Framingham points -> risk percentage, with flat defaults outside the table"""
+
+    MIN_POINTS = -20  # Below/above every possible total
+    MAX_POINTS = 40
+
+    def __init__(self, spec: dict):
+        self.points = {int(points): percentage for points, percentage in spec["points"].items()}
+        self.above = spec["above"]
+        self.below = spec["below"]
+        self.threshold = spec["threshold"]
+        self._table = np.array([self.lookup(points) for points in range(self.MIN_POINTS, self.MAX_POINTS + 1)])
+
+    def lookup(self, points: int) -> int:
+        return self.points.get(points, self.above if points > self.threshold else self.below)
+
+    def lookup_array(self, points: np.ndarray) -> np.ndarray:
+        return self._table[np.clip(points, self.MIN_POINTS, self.MAX_POINTS) - self.MIN_POINTS]
+
+
+class FraminghamTables:
+    def __init__(self, spec: dict):
+        self.age = BreakpointTable(spec["age"]["edges"], spec["age"]["points"])
+        self.total_cholesterol = BreakpointTable(spec["total_cholesterol"]["edges"], spec["total_cholesterol"]["points"])
+        self.hdl_cholesterol = BreakpointTable(spec["hdl_cholesterol"]["edges"], spec["hdl_cholesterol"]["points"])
+        self.bp_untreated = BreakpointTable(spec["systolic_bp"]["edges"], spec["systolic_bp"]["untreated"])
+        self.bp_treated = BreakpointTable(spec["systolic_bp"]["edges"], spec["systolic_bp"]["treated"])
+        self.smoking = spec["smoking"]
+        self.diabetes = spec["diabetes"]
+        self.risk_percentage = PointsTable(spec["risk_percentage"])
+
+
+class Guidelines:
+    """One compiled version of risk_guidelines.json"""
+
+    def __init__(self, data: dict):
+        self.version = data.get("version", "")
+
+        self.bmi = BreakpointTable(data["bmi"]["edges"], data["bmi"]["bands"])
+        self.bmi_healthy_range = data["bmi"]["healthy_range"]
+        self.waist_hip_ratio = {
+            sex: BreakpointTable(spec["edges"], spec["bands"])
+            for sex, spec in data["waist_hip_ratio"].items() if sex in ("male", "female")
+        }
+
+        findrisc = data["findrisc"]
+        self.findrisc_age = BreakpointTable(findrisc["age"]["edges"], findrisc["age"]["points"])
+        self.findrisc_bmi = BreakpointTable(findrisc["bmi"]["edges"], findrisc["bmi"]["points"])
+        self.findrisc_waist = {
+            sex: BreakpointTable(spec["edges"], spec["points"]) for sex, spec in findrisc["waist"].items()
+        }
+        self.findrisc_activity = dict(findrisc["physical_activity"]["points"])
+        self.findrisc_activity_default = findrisc["physical_activity"]["default"]
+        self.findrisc_no_vegetables = findrisc["no_daily_vegetables"]
+        self.findrisc_bp_medication = findrisc["blood_pressure_medication"]
+        self.findrisc_glucose_history = findrisc["high_blood_glucose_history"]
+        self.findrisc_family = findrisc["family_diabetes"]
+        self.findrisc_max_score = findrisc["max_score"]
+        self.findrisc_risk = BreakpointTable(findrisc["risk"]["edges"], findrisc["risk"]["bands"])
+
+        framingham = data["framingham"]
+        self.framingham = {sex: FraminghamTables(framingham[sex]) for sex in ("male", "female")}
+        self.framingham_level = BreakpointTable(framingham["risk_level"]["edges"], framingham["risk_level"]["levels"])
+
+        screening = data["cancer_screening"]
+        self._screening_rules = screening["rules"]
+        self._screening_max_age = screening["max_age"]
+        self._screenings: Dict[Tuple[int, Optional[str]], Tuple[dict, ...]] = {
+            (age, gender): self._match_screenings(age, gender)
+            for age in range(self._screening_max_age + 1)
+            for gender in ("male", "female", None)
+        }
+
+    @classmethod
+    def from_file(cls, path: str = GUIDELINES_PATH) -> "Guidelines":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def findrisc_activity_points(self, physical_activity: str) -> int:
+        return self.findrisc_activity.get(physical_activity, self.findrisc_activity_default)
+
+    def findrisc_activity_array(self, physical_activity: np.ndarray) -> np.ndarray:
+        points = np.full(len(physical_activity), self.findrisc_activity_default)
+        for activity, value in self.findrisc_activity.items():
+            points[physical_activity == activity] = value
+        return points
+
+    def cancer_screenings(self, age: int, gender: str) -> List[dict]:
+        """Screenings for an age and gender (fresh copies, precomputed for common ages)"""
+        gender_key = gender if gender in ("male", "female") else None
+        screenings = self._screenings.get((age, gender_key))
+        if screenings is None:
+            screenings = self._match_screenings(age, gender_key)
+        return copy.deepcopy(list(screenings))
+
+    def _match_screenings(self, age: int, gender: Optional[str]) -> Tuple[dict, ...]:
+        matches = []
+        for rule in self._screening_rules:
+            if rule["gender"] is not None and rule["gender"] != gender:
+                continue
+            if rule["age_min"] is not None and age < rule["age_min"]:
+                continue
+            if rule["age_max"] is not None and age > rule["age_max"]:
+                continue
+            matches.append({
+                "cancer_type": rule["cancer_type"],
+                "recommendation": rule["recommendation"],
+                "urgency": rule["urgency"],
+                "evidence": rule["evidence"]
+            })
+        return tuple(matches)
+
+
+# Compiled once at import
+GUIDELINES = Guidelines.from_file()
+
+
+def _grid() -> Dict[str, list]:
+    """Deterministic cohort covering every band edge of the calculators"""
+    rng = np.random.default_rng(2026)
+    rows = 20000
+    return {
+        "age": rng.integers(18, 100, rows).tolist(),
+        "gender": rng.choice(["male", "female", "other"], rows).tolist(),
+        "height_cm": rng.choice([150.0, 160.0, 170.0, 180.0, 190.0], rows).tolist(),
+        "weight_kg": rng.uniform(40, 160, rows).round(1).tolist(),
+        "waist_cm": rng.choice([None, 0.0, 79.0, 80.0, 88.0, 94.0, 101.0, 102.0, 120.0], rows).tolist(),
+        "family_diabetes": rng.choice([True, False], rows).tolist(),
+        "physical_activity": rng.choice(["low", "moderate", "high"], rows).tolist(),
+        "daily_vegetables": rng.choice([True, False], rows).tolist(),
+        "blood_pressure_medication": rng.choice([True, False], rows).tolist(),
+        "high_blood_glucose_history": rng.choice([True, False], rows).tolist(),
+        "total_cholesterol": rng.choice([None, 150.0, 160.0, 199.0, 200.0, 240.0, 279.0, 280.0, 320.0], rows).tolist(),
+        "hdl_cholesterol": rng.choice([None, 35.0, 40.0, 49.0, 50.0, 59.0, 60.0, 75.0], rows).tolist(),
+        "systolic_bp": rng.choice([None, 110, 120, 129, 130, 140, 159, 160, 180], rows).tolist(),
+        "currently_smoking": rng.choice([True, False], rows).tolist(),
+        "has_diabetes": rng.choice([True, False], rows).tolist(),
+        "on_bp_medication": rng.choice([True, False], rows).tolist()
+    }
+
+
+def compare_versions(candidate: Guidelines, current: Guidelines = GUIDELINES) -> Dict[str, int]:
+    """Number of grid rows whose output changes under the candidate tables, per output"""
+    from app.services.cohort_scoring import OUTPUT_COLUMNS, score_cohort, to_columns
+
+    grid = _grid()
+    before = to_columns(score_cohort(grid, current))
+    after = to_columns(score_cohort(grid, candidate))
+    changes = {name: sum(a != b for a, b in zip(before[name], after[name])) for name in OUTPUT_COLUMNS}
+
+    screening_changes = 0
+    for age in range(current._screening_max_age + 1):
+        for gender in ("male", "female", "other"):
+            if current.cancer_screenings(age, gender) != candidate.cancer_screenings(age, gender):
+                screening_changes += 1
+    changes["cancer_screening (age, gender)"] = screening_changes
+    return changes
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m app.services.risk_guidelines path/to/new_guidelines.json")
+    candidate = Guidelines.from_file(sys.argv[1])
+    print(f"Comparing guidelines {GUIDELINES.version} -> {candidate.version}")
+    for name, count in compare_versions(candidate).items():
+        print(f"  {name}: {count} changed")
@@ -0,0 +1,73 @@
+"""
+Single Flight - Coalesce identical in-flight requests
+
+When several callers ask for the same key at the same time, only the first
+starts the upstream call. The rest wait for its result. Errors reach every
+waiter. A cancelled waiter leaves the shared call running for the others,
+and the call is only cancelled once nobody is waiting for it anymore.
+"""
+
+from typing import Awaitable, Callable, Dict, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One shared in-flight call and the number of callers waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per key at a time and share its result
+
+        Args:
+            key: Canonical request key (e.g. ResponseCache.make_key)
+            fn: Zero-argument coroutine function making the upstream call
+
+        Returns:
+            The result of the shared call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.stats["calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+            logger.info("🔗 Coalesced with identical in-flight request")
+
+        call.waiters += 1
+        try:
+            # shield: cancelling one waiter must not cancel the shared call
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last waiter gave up - stop the upstream call
+                self._forget(key, call)
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": self.in_flight()}
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,225 @@
+"""
+Structured Completion - JSON answers from LLMService, validated against a schema
+
+Pipeline for the analysis endpoints (symptoms, drugs, labs):
+1. Response cache and single-flight (repeat / concurrent identical inputs)
+2. Generation in the provider's native JSON mode (Ollama format: json,
+   OpenRouter response_format)
+3. Tolerant parsing: markdown fences, text around the JSON, trailing
+   commas and truncated output (unterminated strings, missing brackets)
+4. Pydantic validation against the endpoint's response model
+5. If that still fails, one cheap repair call that only has to fix the
+   JSON (temperature 0, errors included) instead of re-running the analysis
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+from dataclasses import dataclass
+import json
+import logging
+import re
+from pydantic import BaseModel
+from app.core.config import settings
+from app.services.response_cache import get_response_cache
+from app.services.provider_policy import ProviderPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# Counters for the admin endpoint
+stats = {"requests": 0, "cache_hits": 0, "clean": 0, "tolerant_fixes": 0, "repairs": 0, "failures": 0}
+
+
+class StructuredCompletionError(ValueError):
+    """The model's reply could not be turned into JSON matching the schema"""
+
+
+@dataclass
+class StructuredResult:
+    data: BaseModel
+    provider: str
+    repaired: bool = False
+    cached: bool = False
+
+
+def parse_json_tolerant(text: str) -> Tuple[Any, bool]:
+    """Parse JSON from an LLM reply, fixing common damage
+
+    Returns:
+        (parsed value, whether any fix was needed)
+
+    Raises:
+        ValueError: Nothing JSON-like could be recovered
+    """
+    text = text.strip()
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    # Markdown code fence (possibly never closed)
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+
+    # Drop prose before the first bracket (and, failing that, after the last one)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object found in model output")
+    text = text[min(starts):]
+    candidates = [text]
+    end = max(text.rfind("}"), text.rfind("]"))
+    if end != -1:
+        candidates.append(text[:end + 1])
+
+    for candidate in candidates:
+        for fixed in (candidate, _TRAILING_COMMA.sub(r"\1", candidate), _close_truncated(candidate)):
+            try:
+                return json.loads(fixed), True
+            except json.JSONDecodeError:
+                continue
+
+    raise ValueError("Model output is not valid JSON")
+
+
+def _close_truncated(text: str) -> str:
+    """Close an unterminated string and any open brackets (cut-off output)"""
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(":"):
+        text += " null"
+    text = text.rstrip(",")
+    return _TRAILING_COMMA.sub(r"\1", text + "".join(reversed(stack)))
+
+
+def validate(text: str, schema: Type[T]) -> Tuple[T, bool]:
+    """Parse tolerantly and validate against the schema
+
+    Raises:
+        ValueError: Not JSON, or does not match the schema (pydantic's
+            ValidationError is a ValueError)
+    """
+    data, fixed = parse_json_tolerant(text)
+    return schema.model_validate(data), fixed
+
+
+def _repair_messages(raw: str, schema: Type[BaseModel], error: Exception) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "You repair malformed JSON. Output ONLY a valid JSON object that matches "
+                       "the schema. Keep the original content; do not add new analysis."
+        },
+        {
+            "role": "user",
+            "content": f"JSON schema:\n{json.dumps(schema.model_json_schema())}\n\n"
+                       f"Problem: {str(error)[:1000]}\n\n"
+                       f"Output to repair:\n{raw}"
+        }
+    ]
+
+
+async def complete_structured(
+    llm_service: Any,
+    messages: List[Dict[str, str]],
+    schema: Type[T],
+    temperature: float = 0.2,
+    max_tokens: int = 2000,
+    policy: Optional[ProviderPolicy] = None,
+    cache_key_data: Any = None
+) -> StructuredResult:
+    """Get a schema-validated JSON completion through LLMService
+
+    Args:
+        llm_service: The shared LLMService
+        messages: List of message dicts with 'role' and 'content'
+        schema: Pydantic model the JSON must match
+        temperature: Creativity (0.0-1.0)
+        max_tokens: Max response length
+        policy: Endpoint provider policy (see provider_policy)
+        cache_key_data: JSON-serializable canonical form of the request. When
+            given it replaces the user turns in the cache/single-flight key, so
+            prompts worded differently for the same request share one entry
+
+    Returns:
+        StructuredResult with the validated model instance
+
+    Raises:
+        StructuredCompletionError: Still invalid after the repair attempt
+    """
+    stats["requests"] += 1
+    cache = get_response_cache()
+    key_messages = messages if cache_key_data is None else [m for m in messages if m["role"] == "system"]
+    cache_key = cache.make_key(
+        llm_service.model_id(policy.candidates(messages) if policy else None), key_messages,
+        schema=schema.__name__, temperature=temperature, max_tokens=max_tokens, policy=policy.name if policy else None,
+        request=cache_key_data
+    )
+
+    cached = await cache.get(cache_key) if settings.LLM_CACHE_ENABLED else None
+    if cached is not None:
+        stats["cache_hits"] += 1
+        entry = json.loads(cached)
+        return StructuredResult(schema.model_validate(entry["data"]), entry["provider"], cached=True)
+
+    async def run() -> StructuredResult:
+        result = await llm_service.generate_response(
+            messages, temperature, max_tokens,
+            coalesce=False, json_mode=True, policy=policy
+        )
+        try:
+            data, fixed = validate(result["content"], schema)
+            stats["tolerant_fixes" if fixed else "clean"] += 1
+            return StructuredResult(data, result["provider"])
+        except ValueError as e:
+            logger.warning(f"🔧 Invalid {schema.__name__} JSON from {result['provider']}, repairing: {str(e)[:200]}")
+            error = e
+
+        # Cheap targeted repair - only fix the JSON, don't redo the analysis
+        stats["repairs"] += 1
+        repair = await llm_service.generate_response(
+            _repair_messages(result["content"], schema, error), 0.0, max_tokens,
+            coalesce=False, json_mode=True, policy=policy
+        )
+        try:
+            data, _ = validate(repair["content"], schema)
+        except ValueError as e:
+            stats["failures"] += 1
+            raise StructuredCompletionError(f"Invalid {schema.__name__} from model: {str(e)[:500]}") from e
+        return StructuredResult(data, repair["provider"], repaired=True)
+
+    # Identical requests already in flight share one upstream call
+    if settings.LLM_SINGLE_FLIGHT_ENABLED:
+        structured = await llm_service.single_flight.do(cache_key, run)
+    else:
+        structured = await run()
+
+    # Only validated output is cached
+    if settings.LLM_CACHE_ENABLED:
+        cache.set(cache_key, json.dumps({
+            "data": structured.data.model_dump(mode="json"),
+            "provider": structured.provider
+        }))
+    return structured
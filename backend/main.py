@@ -1,21 +1,69 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
-from app.api import chat, health, auth, symptom_checker, drug_checker, lab_interpreter, health_risk
+from app.api import chat, health, auth, symptom_checker, drug_checker, lab_interpreter, health_risk, admin
 from app.core.config import settings
 from app.core.database import init_db
+from app.services.http_clients import init_http_clients, close_http_clients
+from app.services.llm_service import get_llm_service
+from app.services.errors import LLMUnavailableError
+from app.services.background_jobs import get_job_registry
+from app.services.emergency_detector import get_emergency_detector
+from app.services.drug_interactions import get_interaction_index
+from app.services.lab_units import get_lab_units
+from app.services.plan_cache import get_plan_cache
+from app.services.response_cache import get_response_cache
 import os
 
 # Initialize database tables (only in development)
 if os.getenv("ENVIRONMENT") != "production":
     init_db()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: shared, pooled HTTP clients for the LLM providers
+    await init_http_clients()
+    # Startup: compile the emergency detector before the first request
+    get_emergency_detector()
+    # Startup: load the local drug interaction index
+    get_interaction_index()
+    # Startup: load the lab reference range table and unit registry
+    get_lab_units()
+    # Startup: background provider health probes
+    get_llm_service().start_health_probes()
+    # Startup: persisted provider quotas (written back in batches, off the event loop)
+    await get_llm_service().start_quota_sync()
+    # Startup: write response cache entries to the disk tier in batches
+    get_response_cache().start_flushing()
+    # Startup: keep plans for the most common risk profiles cached
+    get_plan_cache().start_warming(get_llm_service())
+    yield
+    # Shutdown: stop probes, flush quotas, stop warm-up, flush the response cache, stop background jobs, release pooled connections
+    await get_llm_service().stop_health_probes()
+    await get_llm_service().stop_quota_sync()
+    await get_plan_cache().stop_warming()
+    await get_response_cache().stop_flushing()
+    await get_job_registry().shutdown()
+    await close_http_clients()
+
 app = FastAPI(
     title="MediAI Backend",
     description="Medical AI Assistant API with Authentication",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailableError):
+    # Providers are at capacity or rate limited - tell clients when to come back
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -31,6 +79,7 @@ app.include_router(symptom_checker.router, prefix="/api", tags=["symptoms"])
 app.include_router(drug_checker.router, prefix="/api", tags=["drugs"])
 app.include_router(lab_interpreter.router, prefix="/api", tags=["labs"])
 app.include_router(health_risk.router, prefix="/api", tags=["health-risk"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/")
 def root():
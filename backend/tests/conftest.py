@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Settings are required at import time; tests never touch a real database
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/mediai-tests.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,118 @@
+import asyncio
+import math
+
+import pytest
+
+from app.core.config import settings
+from app.services.admission import AdmissionController
+from app.services.errors import LLMOverloadedError, ProviderOverloaded
+from app.services.llm_service import LLMService
+from main import llm_unavailable_handler
+
+MESSAGES = [{"role": "user", "content": "Is 130/85 high blood pressure?"}]
+
+
+class SlowProvider:
+    def __init__(self, name="ollama", delay=0.1):
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, messages, temperature, max_tokens, **options):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"answer from {self.name}"
+
+
+@pytest.fixture(autouse=True)
+def one_ollama_slot(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_QUOTA_ENABLED", False)
+    monkeypatch.setattr(settings, "OLLAMA_MAX_CONCURRENT_REQUESTS", 1)
+    monkeypatch.setattr(settings, "OLLAMA_MAX_QUEUE", 0)
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    admission = AdmissionController("ollama", max_concurrency=1, max_queue=0, queue_timeout=1.0)
+
+    async def run():
+        async with admission.slot():
+            with pytest.raises(ProviderOverloaded) as error:
+                async with admission.slot(retry_after=7):
+                    pass
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.retry_after == 7
+    assert admission.stats["rejected"] == 1
+
+
+def test_queued_request_times_out():
+    admission = AdmissionController("ollama", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        async with admission.slot():
+            with pytest.raises(ProviderOverloaded, match="queued over"):
+                async with admission.slot():
+                    pass
+
+    asyncio.run(run())
+    assert admission.stats["timed_out"] == 1
+    assert admission.waiting == 0
+
+
+def test_queued_request_is_admitted_when_a_slot_frees_up():
+    admission = AdmissionController("ollama", max_concurrency=1, max_queue=1, queue_timeout=1.0)
+
+    async def hold():
+        async with admission.slot():
+            await asyncio.sleep(0.02)
+
+    async def run():
+        await asyncio.gather(hold(), hold())
+
+    asyncio.run(run())
+    assert admission.stats == {"admitted": 2, "queued": 1, "rejected": 0, "timed_out": 0}
+
+
+def test_overflow_returns_503_with_retry_after():
+    provider = SlowProvider()
+    service = LLMService(providers={"ollama": provider})
+
+    async def run():
+        busy = asyncio.create_task(
+            service.generate_response(MESSAGES, hedge=False, coalesce=False, providers=["ollama"])
+        )
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMOverloadedError) as error:
+            await service.generate_response(MESSAGES, hedge=False, coalesce=False, providers=["ollama"])
+        await busy
+        return error.value
+
+    error = asyncio.run(run())
+    assert provider.calls == 1
+    assert error.status_code == 503
+    assert error.retry_after == math.ceil(settings.LLM_QUEUE_TIMEOUT)
+
+    response = asyncio.run(llm_unavailable_handler(None, error))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(error.retry_after)
+
+
+def test_overflow_spills_to_the_next_provider():
+    ollama, gemini = SlowProvider("ollama"), SlowProvider("gemini", delay=0)
+    service = LLMService(providers={"ollama": ollama, "gemini": gemini})
+
+    async def run():
+        busy = asyncio.create_task(
+            service.generate_response(MESSAGES, hedge=False, coalesce=False, providers=["ollama"])
+        )
+        await asyncio.sleep(0.01)
+        result = await service.generate_response(
+            MESSAGES, hedge=False, coalesce=False, providers=["ollama", "gemini"]
+        )
+        await busy
+        return result
+
+    assert asyncio.run(run())["provider"] == "gemini"
+    assert ollama.calls == 1
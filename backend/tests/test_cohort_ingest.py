@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from app.services.cohort_ingest import CohortIngestor, ingest_file, validate_records
+
+GOOD = {"age": 45, "gender": "male", "height_cm": 180, "weight_kg": 82}
+
+
+def ingest(text, input_format="csv", chunk_rows=None):
+    output = io.StringIO()
+    stats = ingest_file(io.BytesIO(text.encode()), output, input_format, "ndjson", chunk_rows)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[-1] == {"summary": stats}
+    return lines[:-1], stats
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("age", "99999999999999999999999", "age: Input should be a 64-bit integer"),
+    ("systolic_bp", "-99999999999999999999999", "systolic_bp: Input should be a 64-bit integer"),
+    ("height_cm", "nan", "height_cm: Input should be a finite number"),
+    ("weight_kg", "inf", "weight_kg: Input should be a finite number"),
+    ("waist_cm", "1e400", "waist_cm: Input should be a finite number"),
+    ("weight_kg", "0", "weight_kg: must be greater than 0"),
+    ("height_cm", "-170", "height_cm: must be greater than 0"),
+])
+def test_bad_row_is_reported_and_good_rows_are_scored(field, value, message):
+    header = "id,age,gender,height_cm,weight_kg,systolic_bp,waist_cm"
+    good = "{},45,male,180,82,,"
+    bad = dict(zip(header.split(","), good.format("bad").split(",")))
+    bad[field] = value
+    text = "\n".join([header, good.format("a"), ",".join(bad.values()), good.format("c")]) + "\n"
+
+    rows, stats = ingest(text)
+    assert [row["id"] for row in rows] == ["a", "bad", "c"]
+    assert rows[1] == {"row": 2, "id": "bad", "errors": [message]}
+    assert rows[0]["bmi"] == rows[2]["bmi"] == 25.3
+    assert stats["scored"] == 2 and stats["invalid"] == 1
+
+
+def test_ndjson_bad_values_are_row_errors():
+    records = [GOOD, {**GOOD, "age": 10 ** 30}, {**GOOD, "weight_kg": 1e309}, "not json", GOOD]
+    text = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in records) + "\n"
+    rows, stats = ingest(text, "ndjson", chunk_rows=2)
+    assert ["errors" in row for row in rows] == [False, True, True, True, False]
+    assert stats == {**stats, "rows": 5, "scored": 2, "invalid": 3}
+
+
+def test_validate_records_keeps_only_valid_rows():
+    chunk = validate_records([GOOD, {**GOOD, "age": "1" * 30}, {**GOOD, "gender": None}])
+    assert chunk.valid == [True, False, False]
+    assert chunk.columns["age"] == [45]
+    assert set(chunk.errors) == {1, 2}
+
+
+def test_ingestor_accepts_byte_pieces():
+    text = "age,gender,height_cm,weight_kg\n45,male,180,82\n99999999999999999999999,female,160,60\n"
+    ingestor = CohortIngestor("csv", "ndjson")
+    output = "".join(ingestor.feed(bytes([byte])) for byte in text.encode()) + ingestor.finish()
+    lines = [json.loads(line) for line in output.splitlines()]
+    assert "bmi" in lines[0] and "errors" in lines[1]
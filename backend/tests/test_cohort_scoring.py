@@ -0,0 +1,120 @@
+"""Vectorized cohort scores must match the scalar /calculate-health-risks calculators exactly"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.api.health_risk import HealthData, calculate_health_risks
+from app.services.cohort_scoring import COLUMNS, OUTPUT_COLUMNS, score_cohort, to_columns
+from app.services.risk_guidelines import GUIDELINES
+
+BASE = {"age": 50, "gender": "male", "height_cm": 175.0, "weight_kg": 75.0}
+
+
+def random_cohort(rows=2000, seed=7):
+    rng = np.random.default_rng(seed)
+
+    def optional(values, missing=0.15):
+        # None and 0 both count as missing in the scalar calculators
+        values = values.tolist()
+        holes = rng.random(rows)
+        return [None if h < missing / 2 else (0.0 if h < missing else v) for v, h in zip(values, holes)]
+
+    columns = {
+        "age": rng.integers(18, 100, rows).tolist(),
+        "gender": rng.choice(["male", "female", "other", "Male"], rows).tolist(),
+        "height_cm": rng.uniform(140, 210, rows).round(1).tolist(),
+        "weight_kg": rng.uniform(35, 180, rows).round(1).tolist(),
+        "waist_cm": optional(rng.uniform(60, 140, rows).round(1)),
+        "family_diabetes": rng.choice([True, False], rows).tolist(),
+        "physical_activity": rng.choice(["low", "moderate", "high", "unknown"], rows).tolist(),
+        "daily_vegetables": rng.choice([True, False], rows).tolist(),
+        "blood_pressure_medication": rng.choice([True, False], rows).tolist(),
+        "high_blood_glucose_history": rng.choice([True, False], rows).tolist(),
+        "total_cholesterol": optional(rng.uniform(120, 340, rows).round(0)),
+        "hdl_cholesterol": optional(rng.uniform(25, 90, rows).round(0)),
+        "systolic_bp": [None if v < 100 else v for v in rng.integers(90, 200, rows).tolist()],
+        "currently_smoking": rng.choice([True, False], rows).tolist(),
+        "has_diabetes": rng.choice([True, False], rows).tolist(),
+        "on_bp_medication": rng.choice([True, False], rows).tolist()
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def around(edges, step):
+    return sorted({value for edge in edges for value in (edge - step, edge, edge + step)})
+
+
+def boundary_rows():
+    """Rows just below, at and just above every breakpoint of every table"""
+    rows = []
+    ages = around(
+        [*GUIDELINES.findrisc_age.edges,
+         *(edge for sex in ("male", "female") for edge in GUIDELINES.framingham[sex].age.edges)], 1
+    )
+    for age in ages:
+        for gender in ("male", "female"):
+            rows.append({**BASE, "age": int(age), "gender": gender,
+                         "total_cholesterol": 200.0, "hdl_cholesterol": 50.0, "systolic_bp": 130})
+
+    # Height 100 cm makes BMI equal to the weight
+    for bmi in around([*GUIDELINES.bmi.edges, *GUIDELINES.findrisc_bmi.edges], 0.1):
+        if bmi > 0:
+            rows.append({**BASE, "height_cm": 100.0, "weight_kg": round(bmi, 1)})
+
+    for sex in ("male", "female"):
+        tables = GUIDELINES.framingham[sex]
+        for waist in around(GUIDELINES.findrisc_waist[sex].edges, 1):
+            rows.append({**BASE, "gender": sex, "waist_cm": float(waist)})
+        for cholesterol in around(tables.total_cholesterol.edges, 1):
+            rows.append({**BASE, "gender": sex, "total_cholesterol": float(cholesterol),
+                         "hdl_cholesterol": 50.0, "systolic_bp": 120})
+        for hdl in around(tables.hdl_cholesterol.edges, 1):
+            rows.append({**BASE, "gender": sex, "total_cholesterol": 220.0,
+                         "hdl_cholesterol": float(hdl), "systolic_bp": 120})
+        for sbp in around(tables.bp_untreated.edges, 1):
+            for treated in (True, False):
+                rows.append({**BASE, "gender": sex, "total_cholesterol": 220.0, "hdl_cholesterol": 45.0,
+                             "systolic_bp": int(sbp), "on_bp_medication": treated, "currently_smoking": True})
+    return rows
+
+
+async def scalar_scores(rows):
+    results = []
+    for row in rows:
+        data = HealthData(**{name: value for name, value in row.items() if value is not None})
+        response = await calculate_health_risks(data, include_plan=False)
+        heart = response.heart_disease_risk
+        results.append({
+            "bmi": response.bmi["value"],
+            "bmi_category": response.bmi["category"],
+            "findrisc_score": response.diabetes_risk.score,
+            "findrisc_percentage": response.diabetes_risk.percentage,
+            "findrisc_level": response.diabetes_risk.risk_level,
+            "framingham_points": heart.score if heart else None,
+            "framingham_percentage": heart.percentage if heart else None,
+            "framingham_level": heart.risk_level if heart else None,
+            "overall_health_score": response.overall_health_score
+        })
+    return results
+
+
+def vectorized_scores(rows):
+    columns = {name: [row.get(name) for row in rows] for name in COLUMNS}
+    scores = to_columns(score_cohort(columns))
+    return [{name: scores[name][i] for name in OUTPUT_COLUMNS} for i in range(len(rows))]
+
+
+@pytest.mark.parametrize("rows", [random_cohort(), boundary_rows()], ids=["random", "boundaries"])
+def test_vectorized_scores_match_scalar(rows):
+    expected = asyncio.run(scalar_scores(rows))
+    actual = vectorized_scores(rows)
+    mismatches = [(row, e, a) for row, e, a in zip(rows, expected, actual) if e != a]
+    assert not mismatches, mismatches[:3]
+
+
+def test_boundary_rows_cover_every_table():
+    rows = boundary_rows()
+    assert len(rows) > 100
+    assert {row["gender"] for row in rows} == {"male", "female"}
@@ -0,0 +1,37 @@
+import pytest
+
+from app.services.drug_normalizer import get_drug_normalizer
+
+
+@pytest.fixture(scope="module")
+def normalizer():
+    return get_drug_normalizer()
+
+
+@pytest.mark.parametrize("name, canonical_id, method", [
+    ("Tylenol", "acetaminophen", "exact"),
+    ("acetaminophen 500mg", "acetaminophen", "exact"),
+    ("Acetaminophen (Tylenol)", "acetaminophen", "exact"),
+    ("Ibuprofen (Advil, Motrin)", "ibuprofen", "exact"),
+    ("Metformin ER 500mg tablets", "metformin", "exact"),
+    ("Losartan potassium 50 mg", "losartan", "exact"),
+    ("sertaline", "sertraline", "fuzzy"),
+])
+def test_known_names(normalizer, name, canonical_id, method):
+    match = normalizer.normalize(name)
+    assert (match.canonical_id, match.method) == (canonical_id, method)
+
+
+@pytest.mark.parametrize("name", [
+    "Losartan HCTZ",  # combination product - not losartan alone
+    "Advil PM",  # ibuprofen + diphenhydramine
+    "Aspirin-free Excedrin",  # a word of the name is a known drug
+    "Fosinopril",  # two edits from lisinopril
+    "Citalopram",  # contained in escitalopram
+    "Excedrin (aspirin, acetaminophen)",
+    "atorva",  # partial names are not completed
+])
+def test_different_or_combination_products_are_unknown(normalizer, name):
+    match = normalizer.normalize(name)
+    assert not match.known
+    assert not match.exact
@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.emergency_detector import get_emergency_detector
+
+# Keywords the symptom checker matched before the detector was compiled
+BASELINE_KEYWORDS = [
+    "chest pain", "can't breathe", "difficulty breathing", "severe bleeding",
+    "loss of consciousness", "stroke", "heart attack", "suicide", "overdose",
+    "severe head injury", "paralysis", "seizure", "can't speak"
+]
+
+PLURALS = [
+    "chest pains", "strokes", "heart attacks", "suicides", "overdoses",
+    "severe head injuries", "seizures", "paralyses"
+]
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return get_emergency_detector()
+
+
+@pytest.mark.parametrize("phrase", BASELINE_KEYWORDS + PLURALS)
+def test_baseline_phrases_and_plurals(detector, phrase):
+    assert detector.scan(phrase)
+    assert detector.scan(f"My father has had {phrase.upper()} before, and it is happening again.")
+
+
+@pytest.mark.parametrize("text, symptom", [
+    ("I think I'm having heart attacks", "heart attack"),
+    ("history of strokes", "stroke symptoms"),
+    ("Severe head injuries from a fall", "severe head injury"),
+])
+def test_plural_matches_the_flag(detector, text, symptom):
+    assert [match.flag.symptom for match in detector.scan(text)] == [symptom]
+
+
+@pytest.mark.parametrize("text", [
+    "I watched a documentary about strokers",
+    "mild headache and a runny nose",
+])
+def test_whole_words_only(detector, text):
+    assert detector.scan(text) == []
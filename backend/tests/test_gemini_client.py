@@ -0,0 +1,69 @@
+import asyncio
+import types
+
+import pytest
+
+from app.core.config import settings
+from app.services.gemini_client import GeminiClient
+from app.services.llm_service import LLMService
+
+MESSAGES = [{"role": "user", "content": "Summarize my cholesterol results."}]
+
+
+class StallingModel:
+    """Stands in for genai.GenerativeModel: streams some chunks, then stops sending"""
+
+    def __init__(self, chunks, stall=False):
+        self.chunks = chunks
+        self.stall = stall
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        async def stream():
+            for text in self.chunks:
+                yield types.SimpleNamespace(parts=[text], text=text)
+            if self.stall:
+                await asyncio.sleep(3600)
+        return stream()
+
+
+def gemini(model, timeout=0.05):
+    client = GeminiClient.__new__(GeminiClient)  # no API key or SDK configuration
+    client.model = model
+    client.timeout = timeout
+    return client
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_stream_yields_every_chunk():
+    client = gemini(StallingModel(["Your ", "LDL ", "is high."]))
+    assert asyncio.run(collect(client.generate_stream(MESSAGES))) == ["Your ", "LDL ", "is high."]
+
+
+def test_stalled_stream_times_out():
+    client = gemini(StallingModel(["Your "], stall=True))
+    received = []
+
+    async def run():
+        async for chunk in client.generate_stream(MESSAGES):
+            received.append(chunk)
+
+    with pytest.raises(Exception, match="stalled"):
+        asyncio.run(asyncio.wait_for(run(), timeout=2))
+    assert received == ["Your "]
+
+
+def test_stalled_stream_releases_its_admission_slot(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_QUOTA_ENABLED", False)
+    monkeypatch.setattr(settings, "PRIMARY_LLM_PROVIDER", "gemini")
+    service = LLMService(providers={"gemini": gemini(StallingModel(["Your "], stall=True))})
+
+    async def run():
+        async for _ in service.stream_response(MESSAGES):
+            pass
+
+    with pytest.raises(Exception, match="stalled"):
+        asyncio.run(asyncio.wait_for(run(), timeout=2))
+    assert service.admission("gemini").in_flight == 0
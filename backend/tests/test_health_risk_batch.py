@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.auth import get_current_user
+from main import app
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_current_user] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_current_user, None)
+
+
+def cohort(**overrides):
+    columns = {
+        "age": [45, 60, 30],
+        "gender": ["male", "female", "female"],
+        "height_cm": [180, 165, 170],
+        "weight_kg": [82, 70, 55]
+    }
+    for name, (index, value) in overrides.items():
+        columns[name][index] = value
+    return columns
+
+
+def test_json_cohort_is_scored(client):
+    response = client.post("/api/calculate-health-risks/batch", json=cohort())
+    assert response.status_code == 200
+    assert response.json()["rows"] == 3
+    assert response.json()["columns"]["bmi"] == [25.3, 25.7, 19.0]
+
+
+def test_csv_cohort_is_scored(client):
+    body = "id,age,gender,height_cm,weight_kg\na,45,male,180,82\nb,60,female,165,70\n"
+    response = client.post(
+        "/api/calculate-health-risks/batch?format=csv", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,")
+    assert lines[1].startswith("a,") and lines[2].startswith("b,")
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"age": (1, 99999999999999999999999)}, "index 1: age: Input should be a 64-bit integer"),
+    ({"weight_kg": (2, 0)}, "index 2: weight_kg: must be greater than 0"),
+    ({"height_cm": (0, -180)}, "index 0: height_cm: must be greater than 0"),
+])
+def test_json_bad_values_name_the_index(client, overrides, message):
+    response = client.post("/api/calculate-health-risks/batch", json=cohort(**overrides))
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
+
+@pytest.mark.parametrize("row, message", [
+    ("45,male,nan,82", "index 1: height_cm: Input should be a finite number"),
+    ("45,male,180,inf", "index 1: weight_kg: Input should be a finite number"),
+    ("99999999999999999999999,male,180,82", "index 1: age: Input should be a 64-bit integer"),
+])
+def test_csv_bad_values_name_the_index(client, row, message):
+    body = f"age,gender,height_cm,weight_kg\n30,female,170,55\n{row}\n"
+    response = client.post(
+        "/api/calculate-health-risks/batch", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
+
+def test_mismatched_columns(client):
+    columns = cohort()
+    columns["waist_cm"] = [90]
+    response = client.post("/api/calculate-health-risks/batch", json=columns)
+    assert response.status_code == 400
+    assert "waist_cm" in response.json()["detail"]
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import LLMService
+from app.services.provider_policy import ProviderPolicy
+
+MESSAGES = [{"role": "user", "content": "What does a high LDL mean?"}]
+
+
+class Provider:
+    def __init__(self, delay):
+        self.delay = delay
+        self.cancelled = False
+
+    async def generate(self, messages, temperature, max_tokens, **options):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return f"answer after {self.delay}s"
+
+
+@pytest.fixture(autouse=True)
+def fast_hedge(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_QUOTA_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DEFAULT_DELAY", 0.02)
+
+
+def policy(latency_slo):
+    return ProviderPolicy("test", ("openrouter", "gemini"), latency_slo=latency_slo, max_tokens=500)
+
+
+def test_backup_provider_wins_and_the_primary_is_cancelled():
+    slow, fast = Provider(5), Provider(0.01)
+    service = LLMService(providers={"openrouter": slow, "gemini": fast})
+
+    result = asyncio.run(service.generate_response(MESSAGES, hedge=True, coalesce=False, policy=policy(0)))
+    assert result["provider"] == "gemini"
+    assert slow.cancelled
+    assert service.hedge_stats["hedge_wins"] == 1
+
+
+def test_hedged_race_is_cut_off_at_the_latency_slo():
+    providers = {"openrouter": Provider(5), "gemini": Provider(5)}
+    service = LLMService(providers=providers)
+
+    started = time.perf_counter()
+    with pytest.raises(Exception, match="latency SLO"):
+        asyncio.run(service.generate_response(MESSAGES, hedge=True, coalesce=False, policy=policy(0.1)))
+    assert time.perf_counter() - started < 1
+    assert all(provider.cancelled for provider in providers.values())
+    assert all(service.admission(name).in_flight == 0 for name in providers)
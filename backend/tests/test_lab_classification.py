@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.lab_ranges import get_reference_ranges
+from app.services.lab_units import get_lab_units
+
+
+def classify(test_name, value, unit=None, age=None, sex=None):
+    lab = get_lab_units().normalize(test_name, value, unit)
+    if lab.unit_mismatch:
+        return None
+    return get_reference_ranges().classify(lab.test_name, lab.value, lab.unit, age, sex, lab.qualifier)
+
+
+def status(*args, **kwargs):
+    classification = classify(*args, **kwargs)
+    return classification.status if classification else None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("99", "normal"),
+    ("65", "low"),
+    ("30", "critical"),
+    ("510", "critical"),
+    ("5.5 mmol/L", "normal"),
+])
+def test_plain_values(value, expected):
+    assert status("Glucose (Fasting)", value) == expected
+
+
+@pytest.mark.parametrize("test_name, value, expected", [
+    ("Glucose (Fasting)", "<70", None),  # Low or critical
+    ("Glucose (Fasting)", "<40", "critical"),
+    ("Glucose (Fasting)", ">500", "critical"),
+    ("Glucose (Fasting)", "≥500", None),  # 500 itself is only high
+    ("Glucose (Fasting)", ">120", None),
+    ("LDL", "<50", "normal"),
+    ("HbA1c", ">6.5", "high"),
+])
+def test_bounded_values_are_classified_conservatively(test_name, value, expected):
+    assert status(test_name, value) == expected
+
+
+@pytest.mark.parametrize("test_name, value", [
+    ("Platelets", "250"),  # x10^3/µL
+    ("WBC", "7.5"),  # x10^3/µL
+    ("Glucose (Fasting)", "5.5"),  # mmol/L
+    ("Calcium", "2.4"),  # mmol/L
+])
+def test_unitless_values_in_another_unit_are_flagged(test_name, value):
+    lab = get_lab_units().normalize(test_name, value)
+    assert lab.unit_mismatch
+    assert lab.unit is None
+    assert classify(test_name, value) is None
+
+
+@pytest.mark.parametrize("test_name, value, unit, expected", [
+    ("Platelets", "250000", None, "normal"),
+    ("Platelets", "15000", None, "critical"),
+    ("Platelets", "250", "10^3/µL", "normal"),
+    ("WBC", "7500", None, "normal"),
+    ("WBC", "7.5", "K/µL", "normal"),
+    ("Hemoglobin", "9", None, "low"),
+])
+def test_values_that_fit_the_table_unit(test_name, value, unit, expected):
+    assert not get_lab_units().normalize(test_name, value, unit).unit_mismatch
+    assert status(test_name, value, unit, age=40, sex="female") == expected
@@ -0,0 +1,58 @@
+import pytest
+
+from app.core.config import settings
+from app.services import provider_health
+from app.services.provider_health import ProviderHealthTracker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(provider_health.time, "monotonic", clock)
+    return clock
+
+
+def test_demoted_provider_recovers_without_traffic(clock):
+    tracker = ProviderHealthTracker()
+    tracker.record_success("gemini", 0.5)
+    tracker.record_failure("ollama", "timeout")
+    tracker.record_failure("ollama", "timeout")
+    assert tracker.get("ollama").error_rate > 0.5
+    assert tracker.order(["ollama", "gemini"]) == ["gemini", "ollama"]
+
+    # Only gemini is used while ollama is demoted; ollama's errors decay anyway
+    clock.now += settings.LLM_HEALTH_ERROR_HALF_LIFE
+    tracker.record_success("gemini", 0.5)
+    assert tracker.get("ollama").error_rate < 0.5
+    assert tracker.order(["ollama", "gemini"]) == ["ollama", "gemini"]
+
+
+def test_error_rate_keeps_failures_since_last_update(clock):
+    tracker = ProviderHealthTracker()
+    tracker.record_failure("openrouter", "500")
+    first = tracker.get("openrouter").error_rate
+    clock.now += settings.LLM_HEALTH_ERROR_HALF_LIFE
+    tracker.record_failure("openrouter", "500")
+    alpha = settings.LLM_HEALTH_EWMA_ALPHA
+    assert tracker.get("openrouter").error_rate == pytest.approx(alpha + (1 - alpha) * first / 2)
+
+
+def test_open_circuit_recovers_after_trial(clock):
+    tracker = ProviderHealthTracker()
+    for _ in range(settings.LLM_CIRCUIT_FAILURE_THRESHOLD):
+        tracker.record_failure("ollama", "connection refused")
+    assert tracker.order(["ollama", "gemini"]) == ["gemini"]
+
+    clock.now += settings.LLM_CIRCUIT_OPEN_SECONDS
+    assert tracker.get("ollama").allow_request()
+    tracker.record_success("ollama", 0.4)
+    clock.now += settings.LLM_HEALTH_ERROR_HALF_LIFE
+    assert tracker.order(["ollama", "gemini"]) == ["ollama", "gemini"]
@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.models.models import Base
+from app.services import quota
+from app.services.errors import LLMRateLimitedError, ProviderRateLimited
+from app.services.llm_service import LLMService
+from app.services.quota import QuotaTracker, parse_retry_after, rate_limit_retry_after
+
+MESSAGES = [{"role": "user", "content": "Can I take ibuprofen with lisinopril?"}]
+
+
+class Clock:
+    """Stands in for quota.datetime so bucket refills and day resets need no sleeping"""
+
+    now = datetime(2026, 3, 10, 12, 0, 0)
+
+    @classmethod
+    def advance(cls, seconds: float) -> None:
+        cls.now += timedelta(seconds=seconds)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return Clock.now
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(Clock, "now", datetime(2026, 3, 10, 12, 0, 0))
+    monkeypatch.setattr(quota, "datetime", FrozenDatetime)
+    return Clock
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    def set_limits(requests_per_minute=0, daily_quota=0):
+        monkeypatch.setattr(settings, "GEMINI_REQUESTS_PER_MINUTE", requests_per_minute)
+        monkeypatch.setattr(settings, "GEMINI_DAILY_QUOTA", daily_quota)
+    return set_limits
+
+
+def rate_limited(retry_after=None):
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+    return httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, headers=headers, request=request))
+
+
+def test_bucket_refills_over_time(session_factory, limits, clock):
+    limits(requests_per_minute=2)
+    tracker = QuotaTracker(session_factory)
+    tracker.acquire("gemini")
+    tracker.acquire("gemini")
+
+    with pytest.raises(ProviderRateLimited) as error:
+        tracker.acquire("gemini")
+    # One token refills every 30 seconds
+    assert error.value.status_code == 429
+    assert error.value.retry_after == 30
+
+    clock.advance(29)
+    assert tracker.wait_time("gemini") == pytest.approx(1.0)
+    clock.advance(1)
+    tracker.acquire("gemini")
+
+
+def test_daily_quota_resets_at_utc_midnight(session_factory, limits, clock):
+    limits(daily_quota=2)
+    tracker = QuotaTracker(session_factory)
+    tracker.acquire("gemini")
+    tracker.acquire("gemini")
+
+    with pytest.raises(ProviderRateLimited) as error:
+        tracker.acquire("gemini")
+    assert error.value.retry_after == 12 * 3600
+
+    clock.advance(12 * 3600)
+    tracker.acquire("gemini")
+    assert tracker.snapshot(["gemini"])["gemini"]["requests_today"] == 1
+
+
+def test_rate_limit_blocks_until_retry_after(session_factory, limits, clock):
+    limits()
+    tracker = QuotaTracker(session_factory)
+    tracker.record_rate_limited("gemini", 45)
+    assert tracker.order(["gemini", "openrouter"]) == ["openrouter"]
+    assert tracker.blocked(["gemini"])[0].retry_after == 45
+
+    clock.advance(45)
+    assert tracker.order(["gemini", "openrouter"]) == ["gemini", "openrouter"]
+
+
+def test_usage_survives_a_restart(session_factory, limits):
+    limits(daily_quota=100)
+    tracker = QuotaTracker(session_factory)
+    for _ in range(3):
+        tracker.acquire("gemini")
+    asyncio.run(tracker.flush())
+
+    restarted = QuotaTracker(session_factory)
+    asyncio.run(restarted.load(["gemini"]))
+    assert restarted.snapshot(["gemini"])["gemini"]["requests_today"] == 3
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("120", 120),
+    ("0", 0),
+    ("-5", 0),
+    ("Tue, 10 Mar 2026 12:01:30 GMT", 90),
+    ("soon", None),
+    (None, None),
+])
+def test_parse_retry_after(value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_rate_limit_retry_after():
+    assert rate_limit_retry_after(rate_limited("12")) == 12
+    assert rate_limit_retry_after(rate_limited()) == settings.LLM_RATE_LIMIT_DEFAULT_RETRY
+    assert rate_limit_retry_after(RuntimeError("timeout")) is None
+
+
+def test_provider_429_returns_429_and_skips_the_provider(session_factory, limits):
+    limits()
+
+    class RateLimitedProvider:
+        calls = 0
+
+        async def generate(self, messages, temperature, max_tokens, **options):
+            self.calls += 1
+            raise rate_limited("30")
+
+    provider = RateLimitedProvider()
+    service = LLMService(providers={"gemini": provider})
+    service.quota = QuotaTracker(session_factory)
+
+    for _ in range(2):
+        with pytest.raises(LLMRateLimitedError) as error:
+            asyncio.run(service.generate_response(MESSAGES, hedge=False, coalesce=False, providers=["gemini"]))
+        assert error.value.status_code == 429
+        assert error.value.retry_after == 30
+
+    # The second request never reached the provider
+    assert provider.calls == 1
+    assert service.health.get("gemini").consecutive_failures == 0
@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.response_cache import ResponseCache
+
+
+def test_disk_writes_are_queued_until_flush(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def run():
+        cache = ResponseCache(max_entries=1, disk_path=path)
+        cache.set("a", "first")
+        cache.set("b", "second")  # evicts "a" from memory before any disk write
+        assert cache.snapshot()["disk_pending"] == 2
+        assert await cache.get("a") == "first"
+
+        await cache.flush()
+        assert cache.snapshot()["disk_pending"] == 0
+
+        restarted = ResponseCache(disk_path=path)
+        assert await restarted.get("a") == "first"
+        assert await restarted.contains("b")
+        assert not await restarted.contains("missing")
+        assert restarted.stats["disk_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    async def run():
+        cache = ResponseCache(disk_path=str(tmp_path / "cache.db"))
+        cache.set("a", "stale", ttl_seconds=-1)
+        await cache.flush()
+        assert await cache.get("a") is None
+        assert not await cache.contains("a")
+
+    asyncio.run(run())
+
+
+def test_plan_keys_change_with_the_configured_model(monkeypatch):
+    from app.core.config import settings
+    from app.services.plan_cache import PlanCache, RiskProfile
+
+    profile = RiskProfile("40-49", "male", "overweight", "moderate", "low", False, "moderate", True)
+    plans = PlanCache(ResponseCache())
+    before = plans.cache_key(profile)
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "llama3.3")
+    assert plans.cache_key(profile) != before
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import LLMService
+from app.services.single_flight import SingleFlight
+
+MESSAGES = [{"role": "user", "content": "What is a normal resting heart rate?"}]
+
+
+class SlowProvider:
+    """Answers after a short delay, counting the calls it gets"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, messages, temperature, max_tokens, **options):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return f"answer {self.calls}"
+
+
+@pytest.fixture(autouse=True)
+def no_quota(monkeypatch):
+    # Quota state lives in the database; these tests only exercise coalescing
+    monkeypatch.setattr(settings, "LLM_QUOTA_ENABLED", False)
+
+
+def test_identical_concurrent_calls_share_one_provider_call():
+    provider = SlowProvider()
+    service = LLMService(providers={"ollama": provider})
+
+    async def run():
+        return await asyncio.gather(*[
+            service.generate_response(MESSAGES, 0.2, 100, hedge=False, coalesce=True, providers=["ollama"])
+            for _ in range(10)
+        ])
+
+    results = asyncio.run(run())
+    assert provider.calls == 1
+    assert {result["content"] for result in results} == {"answer 1"}
+    assert service.single_flight.stats == {"calls": 1, "coalesced": 9}
+    assert service.single_flight.in_flight() == 0
+
+
+def test_different_requests_are_not_coalesced():
+    provider = SlowProvider()
+    service = LLMService(providers={"ollama": provider})
+
+    async def run():
+        await asyncio.gather(
+            service.generate_response(MESSAGES, 0.2, 100, hedge=False, coalesce=True, providers=["ollama"]),
+            service.generate_response(MESSAGES, 0.7, 100, hedge=False, coalesce=True, providers=["ollama"])
+        )
+
+    asyncio.run(run())
+    assert provider.calls == 2
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", fail) for _ in range(5)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_waiter_leaves_the_shared_call_running():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flight.do("key", slow))
+        second = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("done", True)
@@ -0,0 +1,117 @@
+import asyncio
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.llm_service import LLMService
+from app.services.structured_completion import (
+    StructuredCompletionError, complete_structured, parse_json_tolerant, validate
+)
+
+MESSAGES = [
+    {"role": "system", "content": "You are a clinical pharmacist. Answer in JSON."},
+    {"role": "user", "content": "warfarin, aspirin"}
+]
+
+
+class Interaction(BaseModel):
+    drug1: str
+    drug2: str
+    severity: str
+    description: str = ""
+
+
+class Report(BaseModel):
+    interactions: List[Interaction]
+    overall_risk: str = "unknown"
+
+
+class ScriptedProvider:
+    """Returns the given replies in order"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def generate(self, messages, temperature, max_tokens, **options):
+        self.calls.append((messages, temperature, options))
+        return self.replies.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_QUOTA_ENABLED", False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```json\n{"a": 1}', {"a": 1}),
+    ('Here is the analysis:\n{"a": [1, 2]}\nLet me know if you need more.', {"a": [1, 2]}),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ('{"a": "unterminated', {"a": "unterminated"}),
+    ('{"a": "escaped \\" quote', {"a": 'escaped " quote'}),
+    ('{"a": 1, "b":', {"a": 1, "b": None}),
+    ('{"a": 1,', {"a": 1}),
+])
+def test_parse_json_tolerant(text, expected):
+    assert parse_json_tolerant(text)[0] == expected
+
+
+def test_clean_json_needs_no_fix():
+    assert parse_json_tolerant('  {"a": 1}  ') == ({"a": 1}, False)
+
+
+@pytest.mark.parametrize("text", ["I cannot help with that.", ""])
+def test_no_json_is_rejected(text):
+    with pytest.raises(ValueError):
+        parse_json_tolerant(text)
+
+
+def test_truncated_reply_is_closed_and_validates():
+    truncated = (
+        '{"interactions": [{"drug1": "warfarin", "drug2": "aspirin", "severity": "major", '
+        '"description": "Increased bleeding ri'
+    )
+    report, fixed = validate(truncated, Report)
+    assert fixed
+    assert report.interactions[0].description == "Increased bleeding ri"
+    assert report.overall_risk == "unknown"
+
+
+def test_truncated_reply_needs_no_repair_call():
+    provider = ScriptedProvider('{"interactions": [{"drug1": "warfarin", "drug2": "aspirin", "severity": "major"')
+    service = LLMService(providers={"ollama": provider})
+
+    result = asyncio.run(complete_structured(service, MESSAGES, Report))
+    assert result.data.interactions[0].severity == "major"
+    assert not result.repaired
+    assert len(provider.calls) == 1
+
+
+def test_invalid_reply_gets_one_repair_call():
+    provider = ScriptedProvider(
+        '{"interactions": [{"drug1": "warfarin", "drug2": "aspirin"}]}',
+        '{"interactions": [{"drug1": "warfarin", "drug2": "aspirin", "severity": "major"}]}'
+    )
+    service = LLMService(providers={"ollama": provider})
+
+    result = asyncio.run(complete_structured(service, MESSAGES, Report))
+    assert result.repaired
+    assert result.data.interactions[0].severity == "major"
+    repair_messages, repair_temperature, _ = provider.calls[1]
+    assert repair_temperature == 0.0
+    assert "severity" in repair_messages[1]["content"]
+
+
+def test_still_invalid_after_repair_raises():
+    provider = ScriptedProvider("Sorry, I can't answer that.", "Still not JSON.")
+    service = LLMService(providers={"ollama": provider})
+
+    with pytest.raises(StructuredCompletionError):
+        asyncio.run(complete_structured(service, MESSAGES, Report))
+    assert len(provider.calls) == 2